@@ -2,47 +2,118 @@
 :mod:`esda` --- Exploratory Spatial Data Analysis
 =================================================
 
+Submodules and the public names below are imported on first access
+(:pep:`562`), so that ``import esda`` does not pull in geopandas, scikit-learn,
+numba or joblib until a statistic that needs them is used.
 """
 
 import contextlib
+import importlib
+import sys
+import types
 from importlib.metadata import PackageNotFoundError, version
 
-from . import adbscan, shape
-from .correlogram import correlogram
-from .gamma import Gamma
-from .geary import Geary
-from .geary_local import Geary_Local
-from .geary_local_mv import Geary_Local_MV
-from .getisord import G, G_Local
-from .join_counts import Join_Counts
-from .join_counts_local import Join_Counts_Local
-from .join_counts_local_bv import Join_Counts_Local_BV
-from .join_counts_local_mv import Join_Counts_Local_MV
-from .lee import Spatial_Pearson, Spatial_Pearson_Local
-from .losh import LOSH
-from .map_comparison import (
-    areal_entropy,
-    completeness,
-    external_entropy,
-    homogeneity,
-    overlay_entropy,
+_SUBMODULES = (
+    "adbscan",
+    "correlogram",
+    "crand",
+    "gamma",
+    "geary",
+    "geary_local",
+    "geary_local_mv",
+    "getisord",
+    "join_counts",
+    "join_counts_local",
+    "join_counts_local_bv",
+    "join_counts_local_mv",
+    "lee",
+    "losh",
+    "map_comparison",
+    "mixture_smoothing",
+    "moran",
+    "moran_local_mv",
+    "shape",
+    "significance",
+    "silhouettes",
+    "smaup",
+    "smoothing",
+    "tabular",
+    "topo",
+    "util",
 )
-from .mixture_smoothing import NP_Mixture_Smoother
-from .moran import (
-    Moran,
-    Moran_BV,
-    Moran_BV_matrix,
-    Moran_Local,
-    Moran_Local_BV,
-    Moran_Local_Rate,
-    Moran_Rate,
-    plot_moran_facet,
-)
-from .moran_local_mv import MoranLocalConditional, MoranLocalPartial
-from .silhouettes import boundary_silhouette, path_silhouette
-from .smaup import Smaup
-from .topo import isolation, prominence
-from .util import fdr
+
+# public name -> submodule it is defined in
+_ATTRIBUTES = {
+    "correlogram": "correlogram",
+    "warmup": "crand",
+    "Gamma": "gamma",
+    "Geary": "geary",
+    "Geary_Local": "geary_local",
+    "Geary_Local_MV": "geary_local_mv",
+    "G": "getisord",
+    "G_Local": "getisord",
+    "Join_Counts": "join_counts",
+    "Join_Counts_Local": "join_counts_local",
+    "Join_Counts_Local_BV": "join_counts_local_bv",
+    "Join_Counts_Local_MV": "join_counts_local_mv",
+    "Spatial_Pearson": "lee",
+    "Spatial_Pearson_Local": "lee",
+    "LOSH": "losh",
+    "areal_entropy": "map_comparison",
+    "completeness": "map_comparison",
+    "external_entropy": "map_comparison",
+    "homogeneity": "map_comparison",
+    "overlay_entropy": "map_comparison",
+    "NP_Mixture_Smoother": "mixture_smoothing",
+    "Moran": "moran",
+    "Moran_BV": "moran",
+    "Moran_BV_matrix": "moran",
+    "Moran_Local": "moran",
+    "Moran_Local_BV": "moran",
+    "Moran_Local_Rate": "moran",
+    "Moran_Rate": "moran",
+    "plot_moran_facet": "moran",
+    "MoranLocalConditional": "moran_local_mv",
+    "MoranLocalPartial": "moran_local_mv",
+    "boundary_silhouette": "silhouettes",
+    "path_silhouette": "silhouettes",
+    "Smaup": "smaup",
+    "isolation": "topo",
+    "prominence": "topo",
+    "fdr": "util",
+}
+
+__all__ = sorted({"adbscan", "shape", *_ATTRIBUTES})
+
+
+def __getattr__(name):
+    if name in _ATTRIBUTES:
+        module = importlib.import_module(f".{_ATTRIBUTES[name]}", __name__)
+        value = getattr(module, name)
+    elif name in _SUBMODULES:
+        value = importlib.import_module(f".{name}", __name__)
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted({*globals(), *_SUBMODULES, *_ATTRIBUTES})
+
+
+class _Package(types.ModuleType):
+    def __setattr__(self, name, value):
+        # the import system binds each submodule on the package once it is
+        # loaded, so `import esda.correlogram` would shadow the function of
+        # the same name; public names take precedence over submodules
+        if name in _ATTRIBUTES and isinstance(value, types.ModuleType):
+            value = getattr(value, name)
+        super().__setattr__(name, value)
+
+
+sys.modules[__name__].__class__ = _Package
+
 
 with contextlib.suppress(PackageNotFoundError):
     __version__ = version("esda")
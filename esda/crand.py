@@ -2,31 +2,38 @@
 Centralised conditional randomisation engine. Numba accelerated.
 """
 
+import contextlib
 import importlib
 import os
+import tempfile
+import time
 import warnings
+import weakref
+from collections import OrderedDict
 
 import numpy as np
 
 from .significance import _permutation_significance
 
 try:
-    from numba import boolean, njit, prange
+    from numba import njit, prange
+
+    _HAS_NUMBA = True
 except (ImportError, ModuleNotFoundError):
     from libpysal.common import jit as njit
 
     prange = range
-    boolean = bool
+    _HAS_NUMBA = False
 
 
-__all__ = ["crand"]
+__all__ = ["crand", "CrandPlan", "warmup"]
 
 #######################################################################
 #                   Utilities for all functions                       #
 #######################################################################
 
 
-@njit(fastmath=True)
+@njit(cache=True, fastmath=True)
 def vec_permutations(max_card: int, n: int, k_replications: int, seed: int):
     """
     Generate `max_card` permuted IDs, sampled from `n` without replacement,
@@ -56,6 +63,487 @@ def vec_permutations(max_card: int, n: int, k_replications: int, seed: int):
     return result
 
 
+_MASK32 = np.uint64(0xFFFFFFFF)
+_SHIFT32 = np.uint64(32)
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = np.uint64(0x9E3779B9)
+_PHILOX_W1 = np.uint64(0xBB67AE85)
+
+
+@njit(cache=True, fastmath=True)
+def _philox4x32(c0, c1, c2, c3, k0, k1):
+    """
+    Philox4x32-10 counter-based random bijection :cite:`salmon2011`
+    ...
+
+    Parameters
+    ----------
+    c0, c1, c2, c3 : numpy.uint64
+        32-bit words of the counter, stored in uint64
+    k0, k1 : numpy.uint64
+        32-bit words of the key, stored in uint64
+
+    Returns
+    -------
+    c0, c1, c2, c3 : numpy.uint64
+        32-bit random words, stored in uint64
+    """
+    for _ in range(10):
+        p0 = _PHILOX_M0 * c0
+        p1 = _PHILOX_M1 * c2
+        c0, c1, c2, c3 = (
+            (p1 >> _SHIFT32) ^ c1 ^ k0,
+            p1 & _MASK32,
+            (p0 >> _SHIFT32) ^ c3 ^ k1,
+            p0 & _MASK32,
+        )
+        k0 = (k0 + _PHILOX_W0) & _MASK32
+        k1 = (k1 + _PHILOX_W1) & _MASK32
+    return c0, c1, c2, c3
+
+
+@njit(cache=True, fastmath=True)
+def _probe(keys, x, mask):
+    """Slot of `x` in an open-addressing table, or of the empty slot it takes"""
+    slot = x & mask
+    while keys[slot] != -1 and keys[slot] != x:
+        slot = (slot + 1) & mask
+    return slot
+
+
+@njit(cache=True, fastmath=True)
+def _site_permutations(seed: int, i: int, n: int, k_replications: int, n_ids: int):
+    """
+    Generate `n_ids` IDs, sampled from `n - 1` without replacement,
+    `k_replications` times, from the counter-based stream of site `i`
+    ...
+
+    The stream is keyed on `seed` and the counter holds the site index and the
+    position of the draw, so the result depends only on `seed` and `i`.
+    Each replication is a partial Fisher-Yates shuffle of ``range(n - 1)``,
+    with bounded integers drawn without bias by Lemire's multiply-shift
+    rejection :cite:`lemire2019`. Only the displaced entries of the shuffled
+    range are stored, in a hash table, so each replication costs O(`n_ids`).
+
+    Parameters
+    ----------
+    seed : int
+        Seed keying the stream
+    i : int
+        Position of the site the IDs are generated for
+    n : int
+        Size of the sample. IDs are drawn from ``range(n - 1)``
+    k_replications : int
+        Number of samples of permuted IDs to perform
+    n_ids : int
+        Number of permuted IDs to generate per sample
+
+    Returns
+    -------
+    result : ndarray
+        (k_replications, n_ids) array with permuted IDs
+    """
+    key = np.uint64(seed)
+    k0 = key & _MASK32
+    k1 = (key >> _SHIFT32) & _MASK32
+    site = np.uint64(i)
+    s0 = site & _MASK32
+    s1 = (site >> _SHIFT32) & _MASK32
+    result = np.empty((k_replications, n_ids), dtype=np.int64)
+    # displaced entries of the shuffled range, at most half full
+    size = 1
+    while size < 2 * n_ids:
+        size *= 2
+    mask = size - 1
+    keys = np.empty(size, dtype=np.int64)
+    values = np.empty(size, dtype=np.int64)
+    words = np.empty(4, dtype=np.uint64)
+    draw = 0
+    for k in range(k_replications):
+        keys[:] = -1
+        for j in range(n_ids):
+            # uniform offset in range(n - 1 - j), from 32-bit words
+            span = np.uint64(n - 1 - j)
+            threshold = ((_MASK32 + np.uint64(1)) - span) % span
+            while True:
+                # every block of the stream gives four 32-bit words
+                if draw % 4 == 0:
+                    block = np.uint64(draw // 4)
+                    words[0], words[1], words[2], words[3] = _philox4x32(
+                        block & _MASK32, block >> _SHIFT32, s0, s1, k0, k1
+                    )
+                product = words[draw % 4] * span
+                draw += 1
+                if (product & _MASK32) >= threshold:
+                    break
+            t = j + np.int64(product >> _SHIFT32)
+            # swap entries j and t of the shuffled range; entry j is never
+            # read again, so only entry t is stored
+            slot_t = _probe(keys, t, mask)
+            result[k, j] = values[slot_t] if keys[slot_t] == t else t
+            if t != j:
+                slot_j = _probe(keys, j, mask)
+                entry_j = values[slot_j] if keys[slot_j] == j else j
+                keys[slot_t] = t
+                values[slot_t] = entry_j
+    return result
+
+
+def _weights_offsets(cardinalities):
+    """Position of the first weight of every site in the flat weights buffer"""
+    weights_offsets = np.zeros((cardinalities.shape[0] + 1,), dtype=np.int64)
+    weights_offsets[1:] = np.cumsum(cardinalities)
+    return weights_offsets
+
+
+def _chunk_starts(cardinalities, n_chunks, schedule="cardinality", simulate=None):
+    """
+    Split sites into at most `n_chunks` contiguous chunks of similar cost
+    ...
+
+    Parameters
+    ----------
+    cardinalities : ndarray
+        (N,) array containing the cardinalities for each element.
+    n_chunks : int
+        Number of chunks to split the sites into
+    schedule : str = "cardinality"
+        ``"cardinality"`` balances the number of neighbors gathered per chunk,
+        which is what the work of a site is proportional to. ``"sites"`` gives
+        every chunk the same number of sites.
+    simulate : None | ndarray
+        (N,) boolean array, False at sites that are skipped and cost nothing.
+        If None, all sites are simulated.
+
+    Returns
+    -------
+    starts : ndarray
+        (n_chunks + 1,) array with the first site of every chunk, followed by N.
+        Chunks that would be empty are dropped, so there may be fewer chunks
+        than requested when a few sites hold most of the neighbors.
+    """
+    n = cardinalities.shape[0]
+    n_chunks = max(min(n_chunks, n), 1)
+    if schedule not in ("cardinality", "sites"):
+        raise ValueError(
+            f"schedule='{schedule}' provided, but is not one of the supported"
+            " options: 'cardinality', 'sites'"
+        )
+    if schedule == "sites" and simulate is None:
+        starts = np.linspace(0, n, n_chunks + 1)
+    else:
+        if schedule == "cardinality":
+            # islands still gather their "fake" neighbor, and every site
+            # carries a fixed cost for its p-value and moments
+            work = np.maximum(cardinalities, 1) + 1
+        else:
+            work = np.ones((n,))
+        if simulate is not None:
+            work = work * simulate
+        cost = np.zeros((n + 1,))
+        cost[1:] = np.cumsum(work)
+        targets = cost[-1] * np.arange(n_chunks + 1) / n_chunks
+        starts = np.searchsorted(cost, targets)
+        starts[-1] = n
+    return np.unique(np.rint(starts).astype(np.int64))
+
+
+def _chunk_timings(starts, weights_offsets, seconds):
+    """
+    Summarise the sites, neighbors and wall time of every chunk
+
+    Returns
+    -------
+    timings : pandas.DataFrame
+        One row per chunk, with the first site (`start`), one past the last
+        site (`stop`), the number of sites and neighbors, and the seconds the
+        chunk took to simulate.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(
+        {
+            "start": starts[:-1],
+            "stop": starts[1:],
+            "n_sites": np.diff(starts),
+            "n_neighbors": np.diff(weights_offsets[starts]),
+            "seconds": seconds,
+        }
+    )
+
+
+def _allocate_outputs(observed, p_permutations, keep, rlocals=None):
+    """
+    Allocate the p-values, simulations and moments of all sites
+
+    Parameters
+    ----------
+    observed : ndarray
+        (N,) or (N, k) array with observed values
+    p_permutations : int
+        Number of permutations
+    keep : bool
+        If False, `rlocals` is an empty placeholder
+    rlocals : None | ndarray
+        Preallocated (N, permutations) or (N, k, permutations) array to
+        write the simulations into, e.g. a view on a memory-mapped file.
+
+    Returns
+    -------
+    p_sims, rlocals, sim_moments : ndarray
+        Outputs of `compute_chunk` (or `compute_chunk_columns`) for all sites
+    """
+    n, *extra = observed.shape
+    p_sims = np.zeros(observed.shape, dtype=np.float32)
+    if rlocals is None:
+        shape = (n, *extra, p_permutations) if keep else (1,) * (observed.ndim + 1)
+        rlocals = np.empty(shape, dtype=observed.dtype)
+    sim_moments = np.empty((n, *extra, 3))
+    return p_sims, rlocals, sim_moments
+
+
+def _simulation_summary(rlocals, observed, block_elements=None):
+    """
+    Count, for every site, the simulated values at least as large as the
+    observed one, and take their mean and standard deviation, reading
+    `rlocals` in blocks of sites so that memory-mapped simulations are
+    streamed from disk rather than loaded at once
+
+    Parameters
+    ----------
+    rlocals : ndarray
+        (N, permutations) array with the simulated values of every site
+    observed : ndarray
+        (N,) array with observed values
+    block_elements : None | int
+        Maximum number of simulated values read at once. If None,
+        `_BLOCK_ELEMENTS`.
+
+    Returns
+    -------
+    larger : ndarray
+        (N,) array with the number of simulated values >= observed
+    mean, std : ndarray
+        (N,) arrays with the mean and the standard deviation of the simulated
+        values, in the type of `rlocals`
+    """
+    n, p_permutations = rlocals.shape
+    if block_elements is None:
+        block_elements = _BLOCK_ELEMENTS
+    block = max(block_elements // max(p_permutations, 1), 1)
+    larger = np.empty((n,), dtype=np.int64)
+    mean = np.empty((n,), dtype=rlocals.dtype)
+    std = np.empty((n,), dtype=rlocals.dtype)
+    for start in range(0, n, block):
+        sites = slice(start, start + block)
+        rstats = np.asarray(rlocals[sites])
+        larger[sites] = (rstats >= observed[sites, None]).sum(axis=1)
+        mean[sites] = rstats.mean(axis=1)
+        std[sites] = rstats.std(axis=1)
+    return larger, mean, std
+
+
+def _transformation(w):
+    """Name of the transformation currently applied to a W or Graph"""
+    transformation = getattr(w, "transformation", None)
+    if transformation is None:
+        transformation = getattr(w, "transform", None)
+    return str(transformation).upper()
+
+
+# plans are cached by id of the weights object (Graph is not hashable) next to
+# a weak reference, so that entries are dropped with the weights themselves,
+# keeping the most recently used `_PLANS_PER_WEIGHTS` plans of each
+_PLAN_CACHE = {}
+_PLANS_PER_WEIGHTS = 8
+
+
+class CrandPlan:
+    """
+    Reusable preparation of a weights object for conditional randomization.
+
+    Building a plan extracts the self-weights, the flat buffer of the other
+    weights, and the cardinalities and offsets of every site, and generates the
+    table of permuted IDs. Passing a plan to :func:`crand`, or to the ``plan``
+    argument of the local statistics, skips this work, so that many variables
+    or statistics can be randomized over the same weights cheaply.
+
+    Parameters
+    ----------
+    w : W | Graph
+        Spatial weights object, with the transformation that the statistics
+        using the plan apply to it
+    permutations : int
+        Number of permutations for conditional randomisation
+    seed : None | int = None
+        Seed to ensure reproducibility of conditional randomizations. If None,
+        a seed is drawn from numpy's global random state.
+    rng : str = "shared"
+        How random neighbor sets are drawn. See :func:`crand`.
+
+    Attributes
+    ----------
+    n : int
+        Number of observations
+    transformation : str
+        Transformation of the weights the plan was built from
+    self_weights : ndarray
+        (N,) array with the weight of every site on itself
+    other_weights : ndarray
+        Flat buffer with the weights of every site on its other neighbors
+    cardinalities : ndarray
+        (N,) array with the number of other neighbors of every site
+    weights_offsets : ndarray
+        (N+1,) array with the position of the first weight of every site in
+        `other_weights`
+    permuted_ids : ndarray
+        (permutations, max_cardinality) array with permuted IDs, or an empty
+        (permutations, 0) array if rng="philox"
+    site_seed : int
+        Seed of the per-site streams if rng="philox", -1 otherwise
+
+    Examples
+    --------
+    >>> import libpysal
+    >>> from esda.crand import CrandPlan
+    >>> w = libpysal.weights.lat2W(5, 5)
+    >>> w.transform = "r"
+    >>> plan = CrandPlan(w, permutations=99, seed=12345)
+    >>> plan.cardinalities[:5]
+    array([2, 3, 3, 3, 2])
+    >>> plan.permuted_ids.shape
+    (99, 4)
+    """
+
+    def __init__(self, w, permutations, seed=None, rng="shared"):
+        if rng not in ("shared", "philox"):
+            raise ValueError(
+                f"rng='{rng}' provided, but is not one of the supported"
+                " options: 'shared', 'philox'"
+            )
+        if seed is None:
+            seed = np.random.randint(12345, 12345000)
+        self.permutations = permutations
+        self.seed = seed
+        self.rng = rng
+        self.transformation = _transformation(w)
+
+        # work on a copy, so that the sparse matrix of `w` is left untouched
+        adj_matrix = w.sparse.tocsr(copy=True)
+        self.n = adj_matrix.shape[0]
+        # we need to be careful to shuffle only *other* sites, not
+        # the self-site. This means we need to
+        # extract the self-weight, if any
+        self.self_weights = adj_matrix.diagonal()
+        # force the self-site weight to zero
+        with warnings.catch_warnings():
+            # massive changes to sparsity incur a cost, but it's not
+            # large for simply changing the diag
+            warnings.simplefilter("ignore")
+            adj_matrix.setdiag(0)
+            adj_matrix.eliminate_zeros()
+        # extract the weights from a now no-self-weighted adj_matrix
+        self.other_weights = adj_matrix.data.astype(np.float64)
+        # use the non-self weight as the cardinality, since
+        # this is the set we have to randomize.
+        # if there is a self-neighbor, we need to *not* shuffle the
+        # self neighbor, since conditional randomization conditions on site i.
+        self.cardinalities = np.diff(adj_matrix.indptr).astype(np.int64)
+        self.weights_offsets = _weights_offsets(self.cardinalities)
+        if rng == "philox":
+            # every site generates its own ids, so only the number of
+            # replications needs to be carried by the (empty) shared table
+            self.permuted_ids = np.empty((permutations, 0), dtype=np.int64)
+            self.site_seed = int(seed)
+        else:
+            max_card = self.cardinalities.max()
+            self.permuted_ids = vec_permutations(max_card, self.n, permutations, seed)
+            self.site_seed = -1
+
+    @classmethod
+    def from_weights(cls, w, permutations, seed=None, rng="shared"):
+        """
+        Return the cached plan for `w`, building and caching it if needed.
+
+        Plans are cached per weights object, keyed on its current
+        transformation, the number of permutations, the seed and `rng`, so
+        changing the transformation of a W picks up a matching plan. Plans
+        with seed=None are never cached, since they must draw new permutations
+        every time. Only the most recently used plans of each weights object
+        are kept, so looping over many seeds does not grow the cache. Call
+        :meth:`invalidate` after modifying the weights in any other way.
+
+        Parameters
+        ----------
+        w : W | Graph
+            Spatial weights object
+        permutations : int
+            Number of permutations for conditional randomisation
+        seed : None | int = None
+            Seed to ensure reproducibility of conditional randomizations
+        rng : str = "shared"
+            How random neighbor sets are drawn. See :func:`crand`.
+
+        Returns
+        -------
+        plan : CrandPlan
+        """
+        if seed is None:
+            return cls(w, permutations, seed=seed, rng=rng)
+        wid = id(w)
+        entry = _PLAN_CACHE.get(wid)
+        if entry is None or entry[0]() is not w:
+            try:
+                ref = weakref.ref(w, lambda _, wid=wid: _PLAN_CACHE.pop(wid, None))
+            except TypeError:
+                # not weak-referenceable, so it cannot be cached safely
+                return cls(w, permutations, seed=seed, rng=rng)
+            entry = _PLAN_CACHE[wid] = (ref, OrderedDict())
+        key = (_transformation(w), permutations, seed, rng)
+        plans = entry[1]
+        if key in plans:
+            plans.move_to_end(key)
+        else:
+            plans[key] = cls(w, permutations, seed=seed, rng=rng)
+            if len(plans) > _PLANS_PER_WEIGHTS:
+                plans.popitem(last=False)
+        return plans[key]
+
+    @staticmethod
+    def invalidate(w=None):
+        """
+        Drop the cached plans for `w`, or for all weights objects if None.
+
+        Parameters
+        ----------
+        w : None | W | Graph = None
+            Spatial weights object whose plans are rebuilt on next use
+        """
+        if w is None:
+            _PLAN_CACHE.clear()
+        else:
+            _PLAN_CACHE.pop(id(w), None)
+
+    def _validate(self, w, n, permutations):
+        """Check that the plan can be used to randomize `n` values over `w`"""
+        if self.n != n:
+            raise ValueError(
+                f"The plan was built for {self.n} observations, but {n} were provided."
+            )
+        if self.permutations != permutations:
+            raise ValueError(
+                f"The plan was built for {self.permutations} permutations,"
+                f" but {permutations} were requested."
+            )
+        if w is not None and _transformation(w) != self.transformation:
+            raise ValueError(
+                f"The plan was built from weights with transformation"
+                f" '{self.transformation}', but the weights provided have"
+                f" transformation '{_transformation(w)}'."
+            )
+
+
 def crand(
     z,
     w,
@@ -68,6 +556,17 @@ def crand(
     seed=None,
     island_weight=0,
     alternative=None,
+    backend="threads",
+    moments=False,
+    early_stopping=None,
+    rng="shared",
+    plan=None,
+    schedule="cardinality",
+    timings=False,
+    engine=None,
+    dtype=None,
+    simulations_path=None,
+    sites=None,
 ):
     """
     Conduct conditional randomization of a given input using the provided
@@ -81,7 +580,11 @@ def crand(
     w : libpysal.weights.W
         Spatial weights object
     observed : ndarray
-        (N,) array with observed values
+        (N,) array with observed values, or (N, k) array with the observed
+        values of k statistics, one for each column of `z`. In the latter
+        case, the random neighbors of every site are gathered once and used
+        to simulate all k statistics, and `stat_func` must return a
+        (permutations, k) array. Outputs then gain a column axis.
     permutations : int
         Number of permutations for conditional randomisation
     keep : Boolean
@@ -115,6 +618,80 @@ def crand(
             * 'lesser'
             * 'directed' -- Current default behavior
             * 'folded'
+    backend : str = "threads"
+        How to parallelise when ``n_jobs != 1``. ``"threads"`` runs all sites in
+        a single numba ``parallel=True`` kernel that shares memory across
+        threads. ``"loky"`` splits the sites into chunks that are sent to a
+        joblib process pool.
+    moments : bool = False
+        If True, also return the mean and variance of the simulated values
+        at each site. These are accumulated site by site, so they are
+        available even when keep=False.
+    early_stopping : None | int = None
+        If an integer h, use the sequential Monte Carlo procedure of
+        :cite:`besag1991sequential`: a site stops being simulated once h of its
+        simulated values are at least as extreme as the observed value, and its
+        p-value is the number of such values divided by the number of draws
+        used. Draws are made in batches that double in size (starting at h), so
+        a site may stop with slightly more than h extreme values. Sites that
+        never reach h extreme values use all `permutations` draws and the usual
+        (M + 1) / (R + 1) p-value. If keep=True, unused draws are set to NaN.
+    rng : str = "shared"
+        How random neighbor sets are drawn. ``"shared"`` generates one table of
+        permuted IDs from `seed` with numba's global generator and uses it for
+        every site. ``"philox"`` gives every site its own counter-based
+        Philox4x32-10 stream keyed on (`seed`, site index) :cite:`salmon2011`,
+        so the draws of a site depend only on the seed and its position. The
+        results are then bit-identical regardless of `n_jobs`, `backend`,
+        chunking, or the machine they are computed on, and any subset of
+        sites can be computed separately.
+    plan : None | CrandPlan = None
+        Prepared weights and permutation table to use. If given, `seed` and
+        `rng` are ignored in favour of those of the plan, which must have been
+        built for the same number of observations and permutations, and from
+        weights with the same transformation as `w`. If None, the cached plan
+        for `w` is used, or built (and cached, if `seed` is set).
+    schedule : str = "cardinality"
+        How sites are split into chunks when ``n_jobs != 1``. ``"cardinality"``
+        gives every worker chunks with about the same number of neighbors, so
+        that sites with many neighbors (e.g. dense cores of distance-band
+        weights) do not all land on the same worker. ``"sites"`` gives every
+        worker the same number of sites.
+    timings : bool = False
+        If True, also return a DataFrame with one row per chunk, reporting its
+        sites, its number of neighbors and the seconds it took to simulate, so
+        that imbalance between workers is visible. Per-chunk times are only
+        measured by the ``"loky"`` backend and the serial path; chunks run by
+        the ``"threads"`` backend share one kernel, so their seconds are NaN.
+    engine : None | str = None
+        ``"numba"`` simulates every site with the compiled `stat_func`.
+        ``"numpy"`` simulates blocks of sites at once with the vectorized
+        NumPy counterpart of `stat_func` (see `_register_block`), in the
+        calling process, ignoring `n_jobs` and `backend`. It gives the same
+        p-values as ``"numba"`` and is the fallback when numba is not
+        installed, since the uncompiled per-site loop is orders of magnitude
+        slower. If None, ``"numba"`` is used if numba is installed or
+        `stat_func` has no vectorized counterpart, and ``"numpy"`` otherwise.
+    dtype : None | numpy.dtype = None
+        Floating point type to simulate in, ``numpy.float32`` or
+        ``numpy.float64``. `z`, `observed`, `scaling` and the weights are cast
+        to it, so with float32 the neighbor gathers move half as many bytes and
+        `rlocals` takes half the memory. If None, `z` and the weights keep the
+        type of `z`, and simulations are float64.
+    simulations_path : None | str | os.PathLike = None
+        If given (and keep=True), `rlocals` is written straight into a .npy
+        file at this path, which is overwritten, instead of being held in
+        memory. Every backend writes its chunks into the file in place, and
+        `rlocals` is returned as a read-only ``numpy.memmap`` on it, so the
+        simulations of problems that do not fit in memory can be kept and
+        read back block by block.
+    sites : None | ndarray = None
+        Sites to simulate, as an (N,) boolean mask or an array of positions,
+        e.g. the candidates that pass an analytical screen. Other sites are
+        skipped, and get NaN p-values, simulations and moments, and zero
+        draws. Random neighbors are still drawn from all N sites, so the
+        results of the selected sites are those of a run over all sites with
+        the same seed or plan. If None, all sites are simulated.
 
     Returns
     -------
@@ -122,12 +699,44 @@ def crand(
         (N,) array with pseudo p-values from conditional permutation
     rlocals : ndarray
         If keep=True, (N, permutations) array with simulated values
-        of stat_func under the null of spatial randomness; else, empty (1, 1) array
-    """
-    adj_matrix = w.sparse
+        of stat_func under the null of spatial randomness; else, empty (1, 1) array.
+        A read-only memmap if `simulations_path` is given.
+    sim_moments : ndarray
+        Only returned if moments=True. (N, 3) array with the mean, the variance
+        and the number of simulated values of stat_func at each site.
+    chunk_timings : pandas.DataFrame
+        Only returned if timings=True. Sites, neighbors and wall time of every
+        chunk, see `timings`.
 
+    If `observed` is (N, k), `p_sim` is (N, k), `rlocals` is (N, k, permutations)
+    (or an empty (1, 1, 1) array) and `sim_moments` is (N, k, 3).
+    """
     n = len(z)
-    if z.ndim == 2:
+    if dtype is not None:
+        dtype = np.dtype(dtype)
+        if dtype not in (np.float32, np.float64):
+            raise ValueError(
+                f"dtype={dtype} provided, but is not one of the supported"
+                " options: float32, float64"
+            )
+        z = np.asarray(z, dtype=dtype)
+    # simulations are stored in the type of `observed`
+    observed = np.asarray(observed, dtype=np.float64 if dtype is None else dtype)
+    columns = np.ndim(observed) == 2
+    if columns:
+        # one statistic per column of z, all randomized with the same draws
+        if z.ndim != 2 or z.shape[1] != observed.shape[1]:
+            raise ValueError(
+                f"`z` must have one column for every column of `observed`,"
+                f" but `z` has shape {z.shape} and `observed` has shape"
+                f" {observed.shape}."
+            )
+        z = np.ascontiguousarray(z)
+        observed = np.ascontiguousarray(observed)
+        if scaling is None:
+            scaling = (n - 1) / (z * z).sum(axis=0)
+        scaling = np.ones(z.shape[1]) * scaling
+    elif z.ndim == 2:
         if z.shape[1] == 2:
             # assume that matrix is [X Y], and scaling is moran-like
             scaling = (
@@ -169,32 +778,42 @@ def crand(
             "'lesser', 'directed', 'folded')"
         )
 
-    # paralellise over permutations?
-    if seed is None:
-        seed = np.random.randint(12345, 12345000)
-
-    # we need to be careful to shuffle only *other* sites, not
-    # the self-site. This means we need to
-    # extract the self-weight, if any
-    self_weights = adj_matrix.diagonal()
-    # force the self-site weight to zero
-    with warnings.catch_warnings():
-        # massive changes to sparsity incur a cost, but it's not
-        # large for simply changing the diag
-        warnings.simplefilter("ignore")
-        adj_matrix.setdiag(0)
-        adj_matrix.eliminate_zeros()
-    # extract the weights from a now no-self-weighted adj_matrix
-    other_weights = adj_matrix.data.astype(z.dtype)  # cast is forced by @ in numba
-    # use the non-self weight as the cardinality, since
-    # this is the set we have to randomize.
-    # if there is a self-neighbor, we need to *not* shuffle the
-    # self neighbor, since conditional randomization conditions on site i.
-    cardinalities = np.array((adj_matrix != 0).sum(1)).flatten()
-    max_card = cardinalities.max()
-    permuted_ids = vec_permutations(max_card, n, permutations, seed)
+    if plan is None:
+        plan = CrandPlan.from_weights(w, permutations, seed=seed, rng=rng)
+    else:
+        plan._validate(w, n, permutations)
+    cardinalities = plan.cardinalities
+    # cast is forced by @ in numba
+    self_weights = plan.self_weights.astype(z.dtype, copy=False)
+    other_weights = plan.other_weights.astype(z.dtype, copy=False)
+    if dtype is not None:
+        # a float64 scaling would promote every simulated value to float64
+        scaling = np.asarray(scaling, dtype=dtype)[()]
+    permuted_ids = plan.permuted_ids
+    site_seed = plan.site_seed
+
+    if early_stopping is None:
+        stop_after = 0
+    elif columns:
+        raise NotImplementedError(
+            "early_stopping is not yet supported when randomizing"
+            " several statistics at once."
+        )
+    elif int(early_stopping) == early_stopping and early_stopping > 0:
+        stop_after = int(early_stopping)
+    else:
+        raise ValueError(
+            f"early_stopping must be None or a positive integer, "
+            f"but {early_stopping} was provided"
+        )
 
-    if n_jobs != 1 and not importlib.util.find_spec("joblib"):
+    if backend not in ("threads", "loky"):
+        raise ValueError(
+            f"backend='{backend}' provided, but is not one of the supported"
+            " options: 'threads', 'loky'"
+        )
+
+    if n_jobs != 1 and backend == "loky" and not importlib.util.find_spec("joblib"):
         warnings.warn(
             f"Parallel processing is requested (n_jobs={n_jobs}),"
             f" but joblib cannot be imported. n_jobs will be set"
@@ -203,8 +822,100 @@ def crand(
         )
         n_jobs = 1
 
-    if n_jobs == 1:
-        p_sims, rlocals = compute_chunk(
+    if schedule not in ("cardinality", "sites"):
+        raise ValueError(
+            f"schedule='{schedule}' provided, but is not one of the supported"
+            " options: 'cardinality', 'sites'"
+        )
+
+    if engine is None:
+        engine = "numba" if _HAS_NUMBA or stat_func not in _BLOCK_STATS else "numpy"
+    if engine not in ("numba", "numpy"):
+        raise ValueError(
+            f"engine='{engine}' provided, but is not one of the supported"
+            " options: 'numba', 'numpy'"
+        )
+    if engine == "numpy" and stat_func not in _BLOCK_STATS:
+        raise ValueError(
+            f"engine='numpy' requested, but {stat_func} has no vectorized"
+            " counterpart registered with `_register_block`."
+        )
+
+    if sites is None:
+        simulate = np.ones((n,), dtype=np.bool_)
+    else:
+        sites = np.asarray(sites)
+        if sites.dtype == np.bool_:
+            if sites.shape != (n,):
+                raise ValueError(
+                    f"A boolean `sites` mask must have one entry per site, but"
+                    f" has shape {sites.shape} for {n} sites."
+                )
+            simulate = sites
+        else:
+            simulate = np.zeros((n,), dtype=np.bool_)
+            simulate[sites] = True
+
+    simulations = None
+    if simulations_path is not None:
+        if not keep:
+            raise ValueError("simulations_path requires keep=True.")
+        simulations_path = os.fspath(simulations_path)
+        simulations = np.lib.format.open_memmap(
+            simulations_path,
+            mode="w+",
+            dtype=observed.dtype,
+            shape=(n, *observed.shape[1:], permuted_ids.shape[0]),
+        )
+
+    tic = time.perf_counter()
+    starts = np.array([0, n], dtype=np.int64)
+    seconds = None
+    # plain view on the mapped buffer, as numba does not type np.memmap
+    rlocals = None if simulations is None else np.asarray(simulations)
+    if engine == "numpy":
+        p_sims, rlocals, sim_moments = vectorized_crand(
+            z,
+            observed,
+            cardinalities,
+            plan.weights_offsets,
+            self_weights,
+            other_weights,
+            permuted_ids,
+            scaling,
+            keep,
+            stat_func,
+            island_weight,
+            alternative=alternative,
+            stop_after=stop_after,
+            site_seed=site_seed,
+            rlocals=rlocals,
+            simulate=simulate,
+        )
+    elif n_jobs == 1 and columns:
+        out = _allocate_outputs(observed, permuted_ids.shape[0], keep, rlocals)
+        _fill_chunk_columns(
+            0,
+            z,
+            z,
+            observed,
+            cardinalities,
+            self_weights,
+            other_weights,
+            permuted_ids,
+            scaling,
+            keep,
+            stat_func,
+            island_weight,
+            alternative,
+            site_seed,
+            simulate,
+            *out,
+        )
+        p_sims, rlocals, sim_moments = out
+    elif n_jobs == 1:
+        out = _allocate_outputs(observed, permuted_ids.shape[0], keep, rlocals)
+        _fill_chunk(
             0,  # chunk start
             z,  # chunked z, for serial this is the entire data
             z,  # all z, for serial this is also the entire data
@@ -217,7 +928,33 @@ def crand(
             keep,  # whether or not to keep the local statistics
             stat_func,
             island_weight,
+            alternative,
+            stop_after,
+            site_seed,
+            simulate,  # whether each site is simulated
+            *out,  # outputs, filled in place
+        )
+        p_sims, rlocals, sim_moments = out
+    elif backend == "threads":
+        p_sims, rlocals, sim_moments, starts, seconds = threaded_crand(
+            z,
+            observed,
+            cardinalities,
+            self_weights,
+            other_weights,
+            permuted_ids,
+            scaling,
+            n_jobs,
+            keep,
+            stat_func,
+            island_weight,
             alternative=alternative,
+            stop_after=stop_after,
+            site_seed=site_seed,
+            weights_offsets=plan.weights_offsets,
+            schedule=schedule,
+            rlocals=rlocals,
+            simulate=simulate,
         )
     else:
         if n_jobs == -1:
@@ -225,7 +962,7 @@ def crand(
         if n_jobs > len(z):
             n_jobs = len(z)
         # Parallel implementation
-        p_sims, rlocals = parallel_crand(
+        p_sims, rlocals, sim_moments, starts, seconds = parallel_crand(
             z,
             observed,
             cardinalities,
@@ -238,12 +975,29 @@ def crand(
             stat_func,
             island_weight,
             alternative=alternative,
+            stop_after=stop_after,
+            site_seed=site_seed,
+            schedule=schedule,
+            simulations_path=simulations_path,
+            simulate=simulate,
         )
+    if seconds is None:
+        # serial, a single chunk
+        seconds = np.array([time.perf_counter() - tic])
+    if simulations is not None:
+        simulations.flush()
+        del simulations
+        rlocals = np.load(simulations_path, mmap_mode="r")
 
-    return p_sims, rlocals
+    out = (p_sims, rlocals)
+    if moments:
+        out += (sim_moments,)
+    if timings:
+        out += (_chunk_timings(starts, plan.weights_offsets, seconds),)
+    return out
 
 
-@njit(parallel=False, fastmath=True)
+@njit(cache=True, parallel=False, fastmath=True)
 def compute_chunk(
     chunk_start: int,
     z_chunk: np.ndarray,
@@ -258,6 +1012,8 @@ def compute_chunk(
     stat_func,
     island_weight: float,
     alternative: str,
+    stop_after: int = 0,
+    site_seed: int = -1,
 ):
     """
     Compute conditional randomisation for a single chunk
@@ -309,6 +1065,16 @@ def compute_chunk(
         value to use as a weight for the "fake" neighbor for every island.
         If numpy.nan, will propagate to the final local statistic depending
         on the `stat_func`. If 0, then the lag is always zero for islands.
+    alternative : str
+        The alternative hypothesis for conditional randomization.
+    stop_after : int
+        Number of extreme simulated values after which a site stops being
+        simulated. If 0, all permutations are used for every site.
+    site_seed : int
+        If non-negative, every site draws its permuted ids from its own
+        counter-based stream keyed on `site_seed` and the site index, and only
+        the number of rows of `permuted_ids` is used. If -1, `permuted_ids`
+        is shared by all sites.
 
     Returns
     -------
@@ -318,145 +1084,797 @@ def compute_chunk(
     rlocals : ndarray
         (n_chunk, max_cardinality) array with local statistics simulated under
         the null of spatial randomness
+    sim_moments : ndarray
+        (n_chunk, 3) array with the mean, the variance and the number of the
+        local statistics simulated under the null of spatial randomness
     """
     chunk_n = z_chunk.shape[0]
-    n_samples = z.shape[0]
-    p_permutations, k_max_card = permuted_ids.shape
     p_sims = np.zeros((chunk_n,), dtype=np.float32)
-    rlocals = np.empty((chunk_n, permuted_ids.shape[0])) if keep else np.empty((1, 1))
+    shape = (chunk_n, permuted_ids.shape[0]) if keep else (1, 1)
+    rlocals = np.empty(shape, dtype=observed.dtype)
+    sim_moments = np.empty((chunk_n, 3))
+    _fill_chunk(
+        chunk_start,
+        z_chunk,
+        z,
+        observed,
+        cardinalities,
+        self_weights,
+        other_weights,
+        permuted_ids,
+        scaling,
+        keep,
+        stat_func,
+        island_weight,
+        alternative,
+        stop_after,
+        site_seed,
+        np.ones((chunk_n,), dtype=np.bool_),
+        p_sims,
+        rlocals,
+        sim_moments,
+    )
+    return p_sims, rlocals, sim_moments
 
-    mask = np.ones((n_samples,), dtype=np.int8) == 1
+
+@njit(cache=True, parallel=False, fastmath=True)
+def _fill_chunk(
+    chunk_start,
+    z_chunk,
+    z,
+    observed,
+    cardinalities,
+    self_weights,
+    other_weights,
+    permuted_ids,
+    scaling,
+    keep,
+    stat_func,
+    island_weight,
+    alternative,
+    stop_after,
+    site_seed,
+    simulate,
+    p_sims,
+    rlocals,
+    sim_moments,
+):
+    """
+    Compute conditional randomisation for a single chunk, writing the results
+    into `p_sims`, `rlocals` and `sim_moments`, which have one row per site of
+    the chunk. See `compute_chunk`. Sites where the boolean `simulate` is False
+    are skipped, and get NaN results and no draws.
+    """
+    chunk_n = z_chunk.shape[0]
     wloc = 0
 
     for i in range(chunk_n):
         cardinality = cardinalities[i]
-        if cardinality == 0:  # deal with islands
-            weights_i = np.zeros(2, dtype=other_weights.dtype)
-            weights_i[1] = island_weight
-        else:
-            # we need to fix the self-weight to the first position
-            weights_i = np.zeros(cardinality + 1, dtype=other_weights.dtype)
-            weights_i[0] = self_weights[i]
-            # this chomps the next `cardinality` weights off of `weights`
-            weights_i[1:] = other_weights[wloc : (wloc + cardinality)]
+        if not simulate[i]:
+            wloc += cardinality
+            p_sims[i] = np.nan
+            sim_moments[i, :2] = np.nan
+            sim_moments[i, 2] = 0
+            if keep:
+                rlocals[i] = np.nan
+            continue
+        weights_i = _site_weights(
+            cardinality, self_weights[i], other_weights, wloc, island_weight
+        )
         wloc += cardinality
-        mask[chunk_start + i] = False
-        rstats = stat_func(chunk_start + i, z, permuted_ids, weights_i, scaling)
-        p_sims[i] = _permutation_significance(
-            observed[i], rstats, alternative=alternative
-        ).item()
+        p_sims[i], rstats, n_draws = _simulate_site(
+            chunk_start + i,
+            observed[i],
+            z,
+            permuted_ids,
+            weights_i,
+            scaling,
+            stat_func,
+            alternative,
+            stop_after,
+            site_seed,
+        )
+        sim_moments[i, 0], sim_moments[i, 1] = _running_moments(rstats[:n_draws])
+        sim_moments[i, 2] = n_draws
         if keep:
-            rlocals[i] = rstats
-
-    return p_sims, rlocals
-
-
-#######################################################################
-#                   Parallel Implementation                           #
-#######################################################################
+            rlocals[i, :n_draws] = rstats[:n_draws]
+            rlocals[i, n_draws:] = np.nan
 
 
-@njit(fastmath=True)
-def build_weights_offsets(cardinalities: np.ndarray, n_chunks: int):
+@njit(cache=True, fastmath=True)
+def _site_weights(cardinality, self_weight, other_weights, wloc, island_weight):
     """
-    Utility function to construct offsets into the weights
-    flat data array found in the W.sparse.data object
+    Build the weights vector passed to `stat_func` for a single site,
+    with the self-weight fixed to the first position.
     ...
 
     Parameters
     ----------
-    cardinalities : ndarray
-        (n_chunk,) array containing the cardinalities for each element.
-    n_chunks : int
-        Number of chunks to split the weights into
+    cardinality : int
+        Number of (non-self) neighbors of the site
+    self_weight : float
+        Weight of the site on itself
+    other_weights : ndarray
+        Flat weights buffer, as obtained from a CSR representation of W
+    wloc : int
+        Offset of the first weight of the site in `other_weights`
+    island_weight : float
+        Weight of the "fake" neighbor used if the site is an island
 
     Returns
     -------
-    boundary_points : ndarray
-        (n_chunks,) array with positions to split a flat representation of W
-        for every chunk
+    weights_i : ndarray
+        (cardinality + 1,) array with the self-weight followed by neighbor
+        weights, or (2,) array with zero and `island_weight` for islands
     """
-    boundary_points = np.zeros((n_chunks + 1,), dtype=np.int64)
-    n = cardinalities.shape[0]
-    chunk_size = np.int64(n / n_chunks) + 1
-    start = 0
-    for i in range(n_chunks):
-        advance = cardinalities[start : start + chunk_size].sum()
-        boundary_points[i + 1] = boundary_points[i] + advance
-        start += chunk_size
-    return boundary_points
+    if cardinality == 0:  # deal with islands
+        weights_i = np.zeros(2, dtype=other_weights.dtype)
+        weights_i[1] = island_weight
+    else:
+        # we need to fix the self-weight to the first position
+        weights_i = np.zeros(cardinality + 1, dtype=other_weights.dtype)
+        weights_i[0] = self_weight
+        # this chomps the next `cardinality` weights off of `weights`
+        weights_i[1:] = other_weights[wloc : (wloc + cardinality)]
+    return weights_i
 
 
-@njit(fastmath=True)
-def chunk_generator(
-    n_jobs: int,
-    starts: np.ndarray,
-    z: np.ndarray,
-    observed: np.ndarray,
-    cardinalities: np.ndarray,
-    self_weights: np.ndarray,
-    other_weights: np.ndarray,
-    w_boundary_points: np.ndarray,
+@njit(cache=True, fastmath=True)
+def _simulate_site(
+    i,
+    observed_i,
+    z,
+    permuted_ids,
+    weights_i,
+    scaling,
+    stat_func,
+    alternative,
+    stop_after,
+    site_seed,
 ):
     """
-    Construct chunks to iterate over within numba in parallel
+    Simulate the local statistic of a single site and compute its pseudo p-value
     ...
 
     Parameters
     ----------
-    n_jobs : int
-        Number of cores to be used in the conditional randomisation. If -1,
-        all available cores are used.
-    starts : ndarray
-        (n_chunks+1,) array of positional starts for each chunk
-    z : ndarray
-        2D array with N rows with standardised observed values
+    i : int
+        Position of observation to be evaluated in the sample
+    observed_i : float
+        Observed value of the statistic at site i
+    z, permuted_ids, weights_i, scaling, stat_func, alternative
+        See `compute_chunk`.
+    stop_after : int
+        If positive, draws are made in batches that double in size, starting
+        at `stop_after`, until at least `stop_after` simulated values are as
+        extreme as `observed_i` :cite:`besag1991sequential`. If 0, all
+        permutations are drawn at once.
+    site_seed : int
+        If non-negative, the permuted ids of site i are drawn from its own
+        counter-based stream, see `_site_permutations`.
+
+    Returns
+    -------
+    p_sim : float
+        Pseudo p-value of the observed statistic
+    rstats : ndarray
+        (permutations,) array whose first `n_draws` entries are the simulated
+        values of the statistic
+    n_draws : int
+        Number of simulated values drawn for the site
+    """
+    p_permutations = permuted_ids.shape[0]
+    if site_seed >= 0:
+        permuted_ids = _site_permutations(
+            site_seed,
+            i,
+            z.shape[0],
+            p_permutations,
+            min(weights_i.shape[0], z.shape[0] - 1),
+        )
+    if stop_after == 0:
+        rstats = stat_func(i, z, permuted_ids, weights_i, scaling)
+        # _permutation_significance only broadcasts float64 scalars, and the
+        # cast is exact for a float32 observed value
+        p_sim = _permutation_significance(
+            np.float64(observed_i), rstats, alternative=alternative
+        )
+        return p_sim.item(), rstats, p_permutations
+    n_draws = min(stop_after, p_permutations)
+    first = stat_func(i, z, permuted_ids[:n_draws], weights_i, scaling)
+    # keep the precision `stat_func` computes in
+    rstats = np.empty((p_permutations,), dtype=first.dtype)
+    rstats[:n_draws] = first
+    while True:
+        p_sim, done = _sequential_step(
+            observed_i, rstats[:n_draws], alternative, stop_after, p_permutations
+        )
+        if done:
+            return p_sim, rstats, n_draws
+        checkpoint = min(2 * n_draws, p_permutations)
+        rstats[n_draws:checkpoint] = stat_func(
+            i, z, permuted_ids[n_draws:checkpoint], weights_i, scaling
+        )
+        n_draws = checkpoint
+
+
+@njit(cache=True, fastmath=True)
+def _sequential_step(observed_i, rstats, alternative, stop_after, p_permutations):
+    """
+    Check whether a site can stop being simulated after the draws in `rstats`
+    ...
+
+    Returns
+    -------
+    p_sim : float
+        Sequential p-value if the site stops early, else the usual pseudo
+        p-value of the draws made so far
+    done : bool
+        Whether `stop_after` extreme values were found, or all
+        `p_permutations` draws were used
+    """
+    n_draws = rstats.shape[0]
+    p_sim = _permutation_significance(
+        np.float64(observed_i), rstats, alternative=alternative
+    )
+    p_sim = p_sim.item()
+    if n_draws == p_permutations:
+        return p_sim, True
+    # recover the count of extreme draws from (M + 1) / (R + 1)
+    n_extreme = int(np.rint(p_sim * (n_draws + 1))) - 1
+    if n_extreme >= stop_after:
+        return n_extreme / n_draws, True
+    return p_sim, False
+
+
+@njit(cache=True, fastmath=False)
+def _running_moments(rstats):
+    """
+    Single-pass (Welford) mean and variance of the simulated values of a site
+    ...
+
+    Parameters
+    ----------
+    rstats : ndarray
+        (permutations,) array with simulated values of the local statistic
+
+    Returns
+    -------
+    mean : float
+        Mean of the simulated values
+    variance : float
+        Population variance (ddof=0) of the simulated values
+    """
+    mean = 0.0
+    m2 = 0.0
+    for k in range(rstats.shape[0]):
+        delta = rstats[k] - mean
+        mean += delta / (k + 1)
+        m2 += delta * (rstats[k] - mean)
+    return mean, m2 / rstats.shape[0]
+
+
+#######################################################################
+#                   Parallel Implementation                           #
+#######################################################################
+
+
+@njit(cache=True, fastmath=True)
+def _simulate_site_columns(
+    i,
+    observed_i,
+    z,
+    permuted_ids,
+    weights_i,
+    scaling,
+    stat_func,
+    alternative,
+    site_seed,
+):
+    """
+    Simulate the k local statistics of a single site from one set of random
+    neighbors and compute their pseudo p-values
+    ...
+
+    Parameters
+    ----------
+    i : int
+        Position of observation to be evaluated in the sample
+    observed_i : ndarray
+        (k,) array with the observed values of the statistics at site i
+    z, permuted_ids, weights_i, scaling, stat_func, alternative, site_seed
+        See `compute_chunk_columns`.
+
+    Returns
+    -------
+    p_sim : ndarray
+        (k,) array with pseudo p-values of the observed statistics
+    rstats : ndarray
+        (k, permutations) array with the simulated values of the statistics
+    """
+    if site_seed >= 0:
+        permuted_ids = _site_permutations(
+            site_seed,
+            i,
+            z.shape[0],
+            permuted_ids.shape[0],
+            min(weights_i.shape[0], z.shape[0] - 1),
+        )
+    rstats = np.ascontiguousarray(stat_func(i, z, permuted_ids, weights_i, scaling).T)
+    p_sim = _permutation_significance(
+        observed_i.reshape(-1, 1), rstats, alternative=alternative
+    )
+    return p_sim, rstats
+
+
+@njit(cache=True, parallel=False, fastmath=True)
+def compute_chunk_columns(
+    chunk_start: int,
+    z_chunk: np.ndarray,
+    z: np.ndarray,
+    observed: np.ndarray,
+    cardinalities: np.ndarray,
+    self_weights: np.ndarray,
+    other_weights: np.ndarray,
+    permuted_ids: np.ndarray,
+    scaling: np.ndarray,
+    keep: bool,
+    stat_func,
+    island_weight: float,
+    alternative: str,
+    site_seed: int = -1,
+):
+    """
+    Compute conditional randomisation of k statistics for a single chunk,
+    gathering the random neighbors of every site once for all k columns
+    ...
+
+    Parameters
+    ----------
+    z : ndarray
+        (N, k) array with k standardised variables
+    observed : ndarray
+        (n_chunk, k) array with observed values of the k statistics
+    scaling : ndarray
+        (k,) array with the scaling applied to the statistics of every column
+    stat_func : callable
+        Method implementing the spatial statistic to be evaluated under
+        conditional randomisation. It has the same signature as in
+        `compute_chunk`, but receives the (N, k) `z` and (k,) `scaling`,
+        and returns a (permutations, k) array.
+
+    All other parameters are as in `compute_chunk`.
+
+    Returns
+    -------
+    p_sims : ndarray
+        (n_chunk, k) array with pseudo p-values from conditional permutation
+    rlocals : ndarray
+        (n_chunk, k, permutations) array with local statistics simulated under
+        the null of spatial randomness
+    sim_moments : ndarray
+        (n_chunk, k, 3) array with the mean, the variance and the number of
+        the local statistics simulated under the null of spatial randomness
+    """
+    chunk_n = z_chunk.shape[0]
+    k = observed.shape[1]
+    p_permutations = permuted_ids.shape[0]
+    p_sims = np.zeros((chunk_n, k), dtype=np.float32)
+    shape = (chunk_n, k, p_permutations) if keep else (1, 1, 1)
+    rlocals = np.empty(shape, dtype=observed.dtype)
+    sim_moments = np.empty((chunk_n, k, 3))
+    _fill_chunk_columns(
+        chunk_start,
+        z_chunk,
+        z,
+        observed,
+        cardinalities,
+        self_weights,
+        other_weights,
+        permuted_ids,
+        scaling,
+        keep,
+        stat_func,
+        island_weight,
+        alternative,
+        site_seed,
+        np.ones((chunk_n,), dtype=np.bool_),
+        p_sims,
+        rlocals,
+        sim_moments,
+    )
+    return p_sims, rlocals, sim_moments
+
+
+@njit(cache=True, parallel=False, fastmath=True)
+def _fill_chunk_columns(
+    chunk_start,
+    z_chunk,
+    z,
+    observed,
+    cardinalities,
+    self_weights,
+    other_weights,
+    permuted_ids,
+    scaling,
+    keep,
+    stat_func,
+    island_weight,
+    alternative,
+    site_seed,
+    simulate,
+    p_sims,
+    rlocals,
+    sim_moments,
+):
+    """
+    Compute conditional randomisation of k statistics for a single chunk,
+    writing the results into `p_sims`, `rlocals` and `sim_moments`, which have
+    one row per site of the chunk. See `compute_chunk_columns` and
+    `_fill_chunk`.
+    """
+    chunk_n = z_chunk.shape[0]
+    k = observed.shape[1]
+    p_permutations = permuted_ids.shape[0]
+    wloc = 0
+
+    for i in range(chunk_n):
+        cardinality = cardinalities[i]
+        if not simulate[i]:
+            wloc += cardinality
+            p_sims[i] = np.nan
+            sim_moments[i, :, :2] = np.nan
+            sim_moments[i, :, 2] = 0
+            if keep:
+                rlocals[i] = np.nan
+            continue
+        weights_i = _site_weights(
+            cardinality, self_weights[i], other_weights, wloc, island_weight
+        )
+        wloc += cardinality
+        p_sim, rstats = _simulate_site_columns(
+            chunk_start + i,
+            observed[i],
+            z,
+            permuted_ids,
+            weights_i,
+            scaling,
+            stat_func,
+            alternative,
+            site_seed,
+        )
+        p_sims[i] = p_sim
+        for j in range(k):
+            sim_moments[i, j, 0], sim_moments[i, j, 1] = _running_moments(rstats[j])
+            sim_moments[i, j, 2] = p_permutations
+        if keep:
+            rlocals[i] = rstats
+
+
+@njit(cache=True, parallel=True, fastmath=True)
+def compute_threaded(
+    z: np.ndarray,
+    observed: np.ndarray,
+    cardinalities: np.ndarray,
+    weights_offsets: np.ndarray,
+    starts: np.ndarray,
+    self_weights: np.ndarray,
+    other_weights: np.ndarray,
+    permuted_ids: np.ndarray,
+    scaling: np.float64,
+    keep: bool,
+    stat_func,
+    island_weight: float,
+    alternative: str,
+    stop_after: int,
+    site_seed: int,
+    simulate: np.ndarray,
+    p_sims: np.ndarray,
+    rlocals: np.ndarray,
+    sim_moments: np.ndarray,
+):
+    """
+    Compute conditional randomisation for all sites, spreading chunks of
+    sites across numba threads that share the inputs and outputs in memory
+    ...
+
+    Parameters
+    ----------
+    z : ndarray
+        2D array with N rows with standardised observed values
     observed : ndarray
         (N,) array with observed values
     cardinalities : ndarray
         (N,) array containing the cardinalities for each element.
-    weights : ndarray
-        Array containing the weights within the chunk in a flat format (ie. as
-        obtained from the `values` attribute of a CSR sparse representation of
-        the original W. This is as long as the sum of `cardinalities`
-    w_boundary_points : ndarray
-        (n_chunks,) array with positions to split a flat representation of W
-        for every chunk
+    weights_offsets : ndarray
+        (N+1,) array with the position of the first weight of every site
+        in `other_weights`, i.e. the cumulative sum of `cardinalities`
+    starts : ndarray
+        (n_chunks + 1,) array with the first site of every chunk, followed by
+        N. Every chunk is run by one thread.
+    self_weights : ndarray of shape (n,)
+        Array containing the self-weights for each observation.
+    other_weights : ndarray
+        Array containing the weights of all other sites in the computation
+        other than site i.
+    permuted_ids : ndarray
+        (permutations, max_cardinality) array with indices of permuted
+        ids to use to construct random realizations of the statistic
+    scaling : float
+        Scaling value to apply to every local statistic
+    keep : bool
+        If True, store simulation; else do not return randomised statistics
+    stat_func : callable
+        Method implementing the spatial statistic to be evaluated under
+        conditional randomisation. See `compute_chunk`.
+    island_weight:
+        value to use as a weight for the "fake" neighbor for every island.
+    alternative : str
+        The alternative hypothesis for conditional randomization.
+    stop_after : int
+        Number of extreme simulated values after which a site stops being
+        simulated. If 0, all permutations are used for every site.
+    site_seed : int
+        If non-negative, every site draws its permuted ids from its own
+        counter-based stream keyed on `site_seed` and the site index, and only
+        the number of rows of `permuted_ids` is used. If -1, `permuted_ids`
+        is shared by all sites.
+    simulate : ndarray
+        (N,) boolean array, False at sites that are skipped, and get NaN
+        results and no draws
+    p_sims : ndarray
+        (N,) array to write the pseudo p-values from conditional permutation
+        into
+    rlocals : ndarray
+        (N, permutations) array to write the local statistics simulated under
+        the null of spatial randomness into, or a (1, 1) placeholder
+    sim_moments : ndarray
+        (N, 3) array to write the mean, the variance and the number of the
+        local statistics simulated under the null of spatial randomness into
+    """
+    for chunk in prange(starts.shape[0] - 1):
+        for i in range(starts[chunk], starts[chunk + 1]):
+            if not simulate[i]:
+                p_sims[i] = np.nan
+                sim_moments[i, :2] = np.nan
+                sim_moments[i, 2] = 0
+                if keep:
+                    rlocals[i] = np.nan
+                continue
+            weights_i = _site_weights(
+                cardinalities[i],
+                self_weights[i],
+                other_weights,
+                weights_offsets[i],
+                island_weight,
+            )
+            p_sims[i], rstats, n_draws = _simulate_site(
+                i,
+                observed[i],
+                z,
+                permuted_ids,
+                weights_i,
+                scaling,
+                stat_func,
+                alternative,
+                stop_after,
+                site_seed,
+            )
+            sim_moments[i, 0], sim_moments[i, 1] = _running_moments(rstats[:n_draws])
+            sim_moments[i, 2] = n_draws
+            if keep:
+                rlocals[i, :n_draws] = rstats[:n_draws]
+                rlocals[i, n_draws:] = np.nan
 
-    Yields
-    ------
-    start : int
-        Starting index for the chunk of input. Should be zero if z_chunk == z.
-    z_chunk : numpy.ndarray
-        (n_chunk,) array containing the chunk of standardised observed values.
-    z : ndarray
-        2D array with N rows with standardised observed values
-    observed_chunk : ndarray
-        (n_chunk,) array containing observed values for the chunk
-    cardinalities_chunk : ndarray
+
+@njit(cache=True, parallel=True, fastmath=True)
+def compute_threaded_columns(
+    z: np.ndarray,
+    observed: np.ndarray,
+    cardinalities: np.ndarray,
+    weights_offsets: np.ndarray,
+    starts: np.ndarray,
+    self_weights: np.ndarray,
+    other_weights: np.ndarray,
+    permuted_ids: np.ndarray,
+    scaling: np.ndarray,
+    keep: bool,
+    stat_func,
+    island_weight: float,
+    alternative: str,
+    site_seed: int,
+    simulate: np.ndarray,
+    p_sims: np.ndarray,
+    rlocals: np.ndarray,
+    sim_moments: np.ndarray,
+):
+    """
+    Compute conditional randomisation of k statistics for all sites,
+    spreading sites across numba threads
+    ...
+
+    Parameters are as in `compute_threaded`, with the (N, k) `observed`,
+    (k,) `scaling` and outputs shaped as those of `compute_chunk_columns`.
+    """
+    k = observed.shape[1]
+    p_permutations = permuted_ids.shape[0]
+    for chunk in prange(starts.shape[0] - 1):
+        for i in range(starts[chunk], starts[chunk + 1]):
+            if not simulate[i]:
+                p_sims[i] = np.nan
+                sim_moments[i, :, :2] = np.nan
+                sim_moments[i, :, 2] = 0
+                if keep:
+                    rlocals[i] = np.nan
+                continue
+            weights_i = _site_weights(
+                cardinalities[i],
+                self_weights[i],
+                other_weights,
+                weights_offsets[i],
+                island_weight,
+            )
+            p_sim, rstats = _simulate_site_columns(
+                i,
+                observed[i],
+                z,
+                permuted_ids,
+                weights_i,
+                scaling,
+                stat_func,
+                alternative,
+                site_seed,
+            )
+            p_sims[i] = p_sim
+            for j in range(k):
+                sim_moments[i, j, 0], sim_moments[i, j, 1] = _running_moments(rstats[j])
+                sim_moments[i, j, 2] = p_permutations
+            if keep:
+                rlocals[i] = rstats
+
+
+def threaded_crand(
+    z: np.ndarray,
+    observed: np.ndarray,
+    cardinalities: np.ndarray,
+    self_weights: np.ndarray,
+    other_weights: np.ndarray,
+    permuted_ids: np.ndarray,
+    scaling: np.float64,
+    n_jobs: int,
+    keep: bool,
+    stat_func,
+    island_weight,
+    alternative: str = "directed",
+    stop_after: int = 0,
+    site_seed: int = -1,
+    weights_offsets=None,
+    schedule: str = "cardinality",
+    rlocals=None,
+    simulate=None,
+):
+    """
+    Conduct conditional randomization in parallel using numba threads
+    ...
+
+    Parameters
+    ----------
+    n_jobs : int
+        Number of threads to be used in the conditional randomisation. If -1,
+        all available threads are used.
+    weights_offsets : None | ndarray
+        (N+1,) array with the position of the first weight of every site in
+        `other_weights`. Computed from `cardinalities` if None.
+    rlocals : None | ndarray
+        Preallocated array to write the simulations into, see
+        `_allocate_outputs`.
+
+    All other parameters and the return values are as in `parallel_crand`.
+    Chunks share a single kernel, so their seconds are NaN.
+    """
+    if n_jobs == -1 or n_jobs > _max_threads():
+        n_jobs = _max_threads()
+    if weights_offsets is None:
+        weights_offsets = _weights_offsets(cardinalities)
+    if simulate is None:
+        simulate = np.ones(cardinalities.shape, dtype=np.bool_)
+    starts = _chunk_starts(cardinalities, n_jobs, schedule, simulate)
+    seconds = np.full((starts.shape[0] - 1,), np.nan)
+    out = _allocate_outputs(observed, permuted_ids.shape[0], keep, rlocals)
+    with _numba_threads(n_jobs):
+        if observed.ndim == 2:
+            compute_threaded_columns(
+                z,
+                observed,
+                cardinalities,
+                weights_offsets,
+                starts,
+                self_weights,
+                other_weights,
+                permuted_ids,
+                scaling,
+                keep,
+                stat_func,
+                island_weight,
+                alternative,
+                site_seed,
+                simulate,
+                *out,
+            )
+        else:
+            compute_threaded(
+                z,
+                observed,
+                cardinalities,
+                weights_offsets,
+                starts,
+                self_weights,
+                other_weights,
+                permuted_ids,
+                scaling,
+                keep,
+                stat_func,
+                island_weight,
+                alternative,
+                stop_after,
+                site_seed,
+                simulate,
+                *out,
+            )
+    return (*out, starts, seconds)
+
+
+def _max_threads():
+    """Number of threads available to numba, or one if numba is missing"""
+    try:
+        from numba import config
+    except (ImportError, ModuleNotFoundError):
+        return 1
+    return config.NUMBA_NUM_THREADS
+
+
+@contextlib.contextmanager
+def _numba_threads(n_threads):
+    """Temporarily set the number of threads used by numba parallel kernels"""
+    try:
+        from numba import get_num_threads, set_num_threads
+    except (ImportError, ModuleNotFoundError):
+        yield
+        return
+    previous = get_num_threads()
+    set_num_threads(n_threads)
+    try:
+        yield
+    finally:
+        set_num_threads(previous)
+
+
+@njit(cache=True, fastmath=True)
+def build_weights_offsets(cardinalities: np.ndarray, starts: np.ndarray):
+    """
+    Utility function to construct offsets into the weights
+    flat data array found in the W.sparse.data object
+    ...
+
+    Parameters
+    ----------
+    cardinalities : ndarray
         (n_chunk,) array containing the cardinalities for each element.
-    weights_chunk : ndarray
-        Array containing the weights within the chunk in a flat format (ie. as
-        obtained from the `values` attribute of a CSR sparse representation of
-        the original W. This is as long as the sum of `cardinalities`
-    """
-    chunk_size = starts[1] - starts[0]
-    for i in range(n_jobs):
-        start = starts[i]
-        z_chunk = z[start : (start + chunk_size)]
-        self_weights_chunk = self_weights[start : (start + chunk_size)]
-        observed_chunk = observed[start : (start + chunk_size)]
-        cardinalities_chunk = cardinalities[start : (start + chunk_size)]
-        w_chunk = other_weights[w_boundary_points[i] : w_boundary_points[i + 1]]
-        yield (
-            start,
-            z_chunk,
-            z,
-            observed_chunk,
-            cardinalities_chunk,
-            self_weights_chunk,
-            w_chunk,
-        )
+    starts : ndarray
+        (n_chunks + 1,) array with the first site of every chunk, followed by N
+
+    Returns
+    -------
+    boundary_points : ndarray
+        (n_chunks + 1,) array with positions to split a flat representation of W
+        for every chunk
+    """
+    n_chunks = starts.shape[0] - 1
+    boundary_points = np.zeros((n_chunks + 1,), dtype=np.int64)
+    for i in range(n_chunks):
+        advance = cardinalities[starts[i] : starts[i + 1]].sum()
+        boundary_points[i + 1] = boundary_points[i] + advance
+    return boundary_points
 
 
 def parallel_crand(
@@ -472,11 +1890,22 @@ def parallel_crand(
     stat_func,
     island_weight,
     alternative: str = "directed",
+    stop_after: int = 0,
+    site_seed: int = -1,
+    schedule: str = "cardinality",
+    simulations_path=None,
+    simulate=None,
 ):
     """
     Conduct conditional randomization in parallel using numba
     ...
 
+    The inputs and outputs are written to memory-mapped .npy files in a
+    temporary folder (see :func:`tempfile.gettempdir`), which the loky
+    workers open by name. Workers therefore share a single copy of the data
+    and write their chunk of the results in place, instead of receiving
+    pickled slices and sending their results back.
+
     Parameters
     ----------
     z : ndarray
@@ -522,6 +1951,26 @@ def parallel_crand(
         value to use as a weight for the "fake" neighbor for every island.
         If numpy.nan, will propagate to the final local statistic depending
         on the `stat_func`. If 0, then the lag is always zero for islands.
+    alternative : str
+        The alternative hypothesis for conditional randomization.
+    stop_after : int
+        Number of extreme simulated values after which a site stops being
+        simulated. If 0, all permutations are used for every site.
+    site_seed : int
+        If non-negative, every site draws its permuted ids from its own
+        counter-based stream keyed on `site_seed` and the site index, and only
+        the number of rows of `permuted_ids` is used. If -1, `permuted_ids`
+        is shared by all sites.
+    schedule : str = "cardinality"
+        How sites are split into `n_jobs` chunks, see `_chunk_starts`.
+    simulations_path : None | str
+        Path of an existing .npy file of the shape of `rlocals` that the
+        workers write the simulations into, instead of a temporary one.
+    simulate : None | ndarray
+        (N,) boolean array, False at sites that are skipped, and get NaN
+        results and no draws. Chunks are balanced over the other sites. If
+        None, all sites are simulated.
+
     Returns
     -------
     larger : ndarray
@@ -530,50 +1979,504 @@ def parallel_crand(
     rlocals : ndarray
         (N, max_cardinality) array with local statistics simulated under
         the null of spatial randomness
+    sim_moments : ndarray
+        (N, 3) array with the mean, the variance and the number of the
+        local statistics simulated under the null of spatial randomness
+    starts : ndarray
+        (n_chunks + 1,) array with the first site of every chunk, followed by N
+    seconds : ndarray
+        (n_chunks,) array with the wall time each chunk took in its worker
     """
     from joblib import Parallel, delayed, parallel_backend
 
     n = z.shape[0]
-    w_boundary_points = build_weights_offsets(cardinalities, n_jobs)
-    chunk_size = n // n_jobs + 1
-    starts = np.arange(n_jobs + 1) * chunk_size
-    # ------------------------------------------------------------------
-    # Set up output holders
-    rlocals = np.empty((n, permuted_ids.shape[0])) if keep else np.empty((1, 1))
+    if simulate is None:
+        simulate = np.ones((n,), dtype=np.bool_)
+    starts = _chunk_starts(cardinalities, n_jobs, schedule, simulate)
+    w_boundary_points = build_weights_offsets(cardinalities, starts)
+    columns = observed.ndim == 2
+    if columns:
+        k = observed.shape[1]
+        p_sims_shape = (n, k)
+        rlocals_shape = (n, k, permuted_ids.shape[0]) if keep else (1, 1, 1)
+        moments_shape = (n, k, 3)
+    else:
+        p_sims_shape = (n,)
+        rlocals_shape = (n, permuted_ids.shape[0]) if keep else (1, 1)
+        moments_shape = (n, 3)
 
     # ------------------------------------------------------------------
-    # Joblib parallel loop by chunks
+    # Inputs and outputs are memory-mapped files that every worker opens by
+    # name, so that they are neither pickled per chunk nor copied per worker,
+    # and chunks write their results in place.
+    with tempfile.TemporaryDirectory(
+        prefix="esda_crand_", ignore_cleanup_errors=True
+    ) as folder:
+        paths = dict(
+            z=_dump(folder, "z", z),
+            observed=_dump(folder, "observed", observed),
+            cardinalities=_dump(folder, "cardinalities", cardinalities),
+            self_weights=_dump(folder, "self_weights", self_weights),
+            other_weights=_dump(folder, "other_weights", other_weights),
+            permuted_ids=_dump(folder, "permuted_ids", permuted_ids),
+            simulate=_dump(folder, "simulate", simulate),
+            p_sims=_dump(folder, "p_sims", shape=p_sims_shape, dtype=np.float32),
+            rlocals=simulations_path
+            or _dump(folder, "rlocals", shape=rlocals_shape, dtype=observed.dtype),
+            sim_moments=_dump(folder, "sim_moments", shape=moments_shape),
+        )
+
+        # ------------------------------------------------------------------
+        # Joblib parallel loop by chunks
+        with parallel_backend("loky", inner_max_num_threads=1):
+            seconds = Parallel(n_jobs=n_jobs)(
+                delayed(_shared_chunk)(
+                    paths,
+                    starts[i],
+                    starts[i + 1],
+                    w_boundary_points[i],
+                    w_boundary_points[i + 1],
+                    scaling,
+                    keep,
+                    stat_func,
+                    island_weight,
+                    alternative,
+                    stop_after,
+                    site_seed,
+                )
+                for i in range(starts.shape[0] - 1)
+            )
 
-    # construct chunks using a generator
-    chunks = chunk_generator(
-        n_jobs,
-        starts,
+        p_sims = np.load(paths["p_sims"])
+        # the caller opens `simulations_path` itself
+        rlocals = None if simulations_path else np.load(paths["rlocals"])
+        sim_moments = np.load(paths["sim_moments"])
+
+    return p_sims, rlocals, sim_moments, starts, np.array(seconds)
+
+
+def _dump(folder, name, array=None, shape=None, dtype=np.float64):
+    """
+    Write `array` to a .npy file in `folder`, or create an empty one with the
+    given `shape` and `dtype`, and return its path
+    """
+    path = os.path.join(folder, f"{name}.npy")
+    if array is None:
+        out = np.lib.format.open_memmap(path, mode="w+", dtype=dtype, shape=shape)
+        del out
+    else:
+        np.save(path, np.ascontiguousarray(array))
+    return path
+
+
+def _shared_chunk(
+    paths,
+    start,
+    stop,
+    w_start,
+    w_stop,
+    scaling,
+    keep,
+    stat_func,
+    island_weight,
+    alternative,
+    stop_after,
+    site_seed,
+):
+    """
+    Open the memory-mapped inputs and outputs in `paths`, and compute the
+    chunk of sites between `start` and `stop` in place
+
+    Returns
+    -------
+    seconds : float
+        Wall time the chunk took to simulate
+    """
+    tic = time.perf_counter()
+    arrays = {
+        name: np.load(path, mmap_mode="r+" if name in _OUTPUTS else "r")
+        for name, path in paths.items()
+    }
+    # plain views on the mapped buffers, as numba does not type np.memmap
+    (
         z,
         observed,
         cardinalities,
         self_weights,
         other_weights,
-        w_boundary_points,
+        permuted_ids,
+        simulate,
+    ) = (np.asarray(arrays[name]) for name in _INPUTS)
+    p_sims, rlocals, sim_moments = (np.asarray(arrays[name]) for name in _OUTPUTS)
+    chunk = (
+        start,
+        z[start:stop],
+        z,
+        observed[start:stop],
+        cardinalities[start:stop],
+        self_weights[start:stop],
+        other_weights[w_start:w_stop],
+        permuted_ids,
+        scaling,
+        keep,
+        stat_func,
+        island_weight,
+        alternative,
+    )
+    outputs = (
+        p_sims[start:stop],
+        rlocals[start:stop] if keep else rlocals,
+        sim_moments[start:stop],
     )
+    if observed.ndim == 2:
+        _fill_chunk_columns(*chunk, site_seed, simulate[start:stop], *outputs)
+    else:
+        _fill_chunk(*chunk, stop_after, site_seed, simulate[start:stop], *outputs)
+    for name in _OUTPUTS:
+        arrays[name].flush()
+    return time.perf_counter() - tic
 
-    with parallel_backend("loky", inner_max_num_threads=1):
-        worker_out = Parallel(n_jobs=n_jobs)(
-            delayed(compute_chunk)(
-                *pars,
-                permuted_ids,
-                scaling,
-                keep,
-                stat_func,
-                island_weight,
-                alternative,
-            )
-            for pars in chunks
+
+_INPUTS = (
+    "z",
+    "observed",
+    "cardinalities",
+    "self_weights",
+    "other_weights",
+    "permuted_ids",
+    "simulate",
+)
+_OUTPUTS = ("p_sims", "rlocals", "sim_moments")
+
+
+#######################################################################
+#                   Vectorized NumPy Implementation                   #
+#######################################################################
+
+# stat_func -> vectorized counterpart, see `_register_block`
+_BLOCK_STATS = {}
+
+# maximum number of random neighbors gathered at once by `vectorized_crand`
+_BLOCK_ELEMENTS = 2**22
+
+
+def _register_block(stat_func):
+    """
+    Register the vectorized NumPy counterpart of a `stat_func`, used by
+    `vectorized_crand`
+    ...
+
+    The decorated function computes the simulated statistics of a block of
+    sites at once, and has the following signature:
+        i : ndarray
+            (b,) array with the positions of the sites in the block
+        z : ndarray
+            2D array with N rows with standardised observed values
+        zrand : ndarray
+            Rows of `z` at the random neighbors of every site and replication,
+            with all neighbors of a replication next to each other, and all
+            replications of a site next to each other
+        weights : ndarray
+            Weight of every random neighbor in `zrand`
+        segments : ndarray
+            (b * permutations,) array with the position in `zrand` of the
+            first neighbor of every site and replication
+        self_weights : ndarray
+            (b,) array with the self-weights of the sites
+        scaling : float
+            Scaling value to apply to every local statistic
+    and returns a (b, permutations) array, or (b, permutations, k) array if
+    `stat_func` simulates k statistics.
+    """
+
+    def decorator(block_func):
+        _BLOCK_STATS[stat_func] = block_func
+        return block_func
+
+    return decorator
+
+
+def _block_lag(values, weights, segments, n_sites):
+    """
+    Weighted sum of the random neighbors of every site and replication,
+    as a (n_sites, permutations) array, or (n_sites, permutations, k) array
+    if `values` has k columns
+    """
+    if values.ndim == 2:
+        weights = weights[:, None]
+    lag = np.add.reduceat(values * weights, segments, axis=0)
+    return lag.reshape(n_sites, -1, *values.shape[1:])
+
+
+def _block_sites(values, segments, n_elements):
+    """Repeat the (b,) `values` of the sites onto each of their random neighbors"""
+    per_segment = np.repeat(values, segments.shape[0] // values.shape[0])
+    return np.repeat(per_segment, np.diff(segments, append=n_elements))
+
+
+def _gather_block(
+    sites,
+    cardinalities,
+    weights_offsets,
+    other_weights,
+    permuted_ids,
+    island_weight,
+    site_seed,
+    n,
+):
+    """
+    Positions and weights of the random neighbors of a block of sites,
+    laid out as described in `_register_block`
+    ...
+
+    Returns
+    -------
+    ids : ndarray
+        Positions of the random neighbors in the full data
+    weights : ndarray
+        Weight of every random neighbor
+    segments : ndarray
+        (b * permutations,) array with the position in `ids` of the first
+        neighbor of every site and replication
+    """
+    p_permutations = permuted_ids.shape[0]
+    # islands draw a single "fake" neighbor
+    sizes = np.maximum(cardinalities, 1)
+    lengths = np.repeat(sizes, p_permutations)
+    segments = np.zeros(lengths.shape, dtype=np.int64)
+    np.cumsum(lengths[:-1], out=segments[1:])
+    segment = np.repeat(np.arange(lengths.shape[0]), lengths)
+    k = np.arange(segment.shape[0]) - segments[segment]
+    local = segment // p_permutations
+    if site_seed >= 0:
+        ids = np.concatenate(
+            [
+                _site_permutations(
+                    site_seed, i, n, p_permutations, min(size + 1, n - 1)
+                )[:, :size].ravel()
+                for i, size in zip(sites, sizes, strict=True)
+            ]
         )
+    else:
+        ids = permuted_ids[segment % p_permutations, k]
+    # ids index the data without site i, see `_permuted_neighbors`
+    ids = ids + (ids >= sites[local])
+    weights = np.full(ids.shape, island_weight, dtype=other_weights.dtype)
+    neighbors = cardinalities[local] > 0
+    weights[neighbors] = other_weights[
+        weights_offsets[sites][local[neighbors]] + k[neighbors]
+    ]
+    return ids, weights, segments
+
+
+def _blocks(costs, budget):
+    """Split sites into contiguous blocks whose total cost is within `budget`"""
+    total = np.cumsum(costs)
+    start = 0
+    while start < costs.shape[0]:
+        done = total[start - 1] if start else 0
+        stop = max(np.searchsorted(total, done + budget, side="right"), start + 1)
+        yield start, stop
+        start = stop
 
-    p_sims, rlocals = zip(*worker_out, strict=True)
-    p_sims = np.hstack(p_sims).squeeze()
-    rlocals = np.vstack(rlocals).squeeze()
-    return p_sims, rlocals
+
+def vectorized_crand(
+    z: np.ndarray,
+    observed: np.ndarray,
+    cardinalities: np.ndarray,
+    weights_offsets: np.ndarray,
+    self_weights: np.ndarray,
+    other_weights: np.ndarray,
+    permuted_ids: np.ndarray,
+    scaling: np.float64,
+    keep: bool,
+    stat_func,
+    island_weight,
+    alternative: str = "directed",
+    stop_after: int = 0,
+    site_seed: int = -1,
+    rlocals=None,
+    simulate=None,
+):
+    """
+    Conduct conditional randomization with NumPy, simulating blocks of sites
+    at once with the vectorized counterpart of `stat_func`
+    ...
+
+    The random neighbors of a block are gathered with fancy indexing into
+    flat arrays, and weighted sums over them are taken with `np.add.reduceat`,
+    so no Python code runs per site unless `stop_after` or `site_seed` is set.
+    Blocks are sized to hold at most `_BLOCK_ELEMENTS` random neighbors.
+
+    Parameters
+    ----------
+    weights_offsets : ndarray
+        (N+1,) array with the position of the first weight of every site in
+        `other_weights`
+    rlocals : None | ndarray
+        Preallocated array to write the simulations into, see
+        `_allocate_outputs`.
+    simulate : None | ndarray
+        (N,) boolean array, False at sites that are skipped, and get NaN
+        results and no draws. If None, all sites are simulated.
+
+    All other parameters and the return values are as in `compute_chunk`
+    (or `compute_chunk_columns`, if `observed` is (N, k)), for all N sites.
+    """
+    block_func = _BLOCK_STATS[stat_func]
+    n = z.shape[0]
+    p_permutations = permuted_ids.shape[0]
+    columns = observed.ndim == 2
+    p_sims, rlocals, sim_moments = _allocate_outputs(
+        observed, p_permutations, keep, rlocals
+    )
+    if simulate is None:
+        selected = np.arange(n)
+    else:
+        selected = np.flatnonzero(simulate)
+        skipped = ~simulate
+        p_sims[skipped] = np.nan
+        sim_moments[skipped, ..., :2] = np.nan
+        sim_moments[skipped, ..., 2] = 0
+        if keep:
+            rlocals[skipped] = np.nan
+    costs = np.maximum(cardinalities[selected], 1) * p_permutations
+    # as in `_site_weights`, islands have no self-weight
+    self_weights = np.where(cardinalities > 0, self_weights, 0)
+    for start, stop in _blocks(costs, _BLOCK_ELEMENTS):
+        sites = selected[start:stop]
+        ids, weights, segments = _gather_block(
+            sites,
+            cardinalities[sites],
+            weights_offsets,
+            other_weights,
+            permuted_ids,
+            island_weight,
+            site_seed,
+            n,
+        )
+        rstats = block_func(
+            sites, z, z[ids], weights, segments, self_weights[sites], scaling
+        )
+        if columns:
+            # (b, permutations, k) -> (b, k, permutations)
+            rstats = np.ascontiguousarray(np.moveaxis(rstats, 1, -1))
+        observed_block = observed[sites]
+        n_draws = np.full(observed_block.shape, p_permutations)
+        if stop_after:
+            for b in range(stop - start):
+                n_draws[b] = min(stop_after, p_permutations)
+                while True:
+                    p_sim, done = _sequential_step(
+                        observed_block[b],
+                        rstats[b, : n_draws[b]],
+                        alternative,
+                        stop_after,
+                        p_permutations,
+                    )
+                    if done:
+                        break
+                    n_draws[b] = min(2 * n_draws[b], p_permutations)
+                p_sims[sites[b]] = p_sim
+                rstats[b, n_draws[b] :] = np.nan
+        else:
+            p_sims[sites] = _permutation_significance(
+                observed_block.reshape(-1, 1),
+                rstats.reshape(-1, p_permutations),
+                alternative=alternative,
+            ).reshape(observed_block.shape)
+        sim_moments[sites, ..., 0] = np.nanmean(rstats, axis=-1)
+        sim_moments[sites, ..., 1] = np.nanvar(rstats, axis=-1)
+        sim_moments[sites, ..., 2] = n_draws
+        if keep:
+            rlocals[sites] = rstats
+    return p_sims, rlocals, sim_moments
+
+
+#######################################################################
+#                   Total randomization of global statistics          #
+#######################################################################
+
+
+def _permutation_blocks(n, permutations, seed=None, batch_size=None):
+    """
+    Yield `permutations` random permutations of ``range(n)``, as (B, n)
+    blocks with one permutation per row, and at most `batch_size` rows
+
+    If `seed` is None, permutations are drawn one at a time from the global
+    NumPy random state, so ``z[ids[b]]`` matches ``numpy.random.permutation(z)``
+    drawn in the same order. Otherwise, they are drawn a block at a time from
+    ``numpy.random.default_rng(seed)``, which continues the stream of `seed`
+    if it is already a Generator. Either way, blocks are drawn in the calling
+    thread, so they do not depend on how they are computed.
+    """
+    if batch_size is None:
+        batch_size = max(_BLOCK_ELEMENTS // max(n, 1), 1)
+    rng = None if seed is None else np.random.default_rng(seed)
+    for start in range(0, permutations, batch_size):
+        size = min(batch_size, permutations - start)
+        if rng is None:
+            ids = np.empty((size, n), dtype=np.intp)
+            for b in range(size):
+                ids[b] = np.random.permutation(n)
+        else:
+            ids = rng.permuted(np.tile(np.arange(n), (size, 1)), axis=1)
+        yield ids
+
+
+def total_crand(statistic, n, permutations, seed=None, n_jobs=1, batch_size=None):
+    """
+    Simulate a global statistic under total randomization, a block of
+    permutations at a time.
+
+    Parameters
+    ----------
+    statistic : callable
+        Function of a (B, n) array of permutations of ``range(n)``, one per
+        row, returning the B simulated statistics, usually through a single
+        sparse-dense product with the (n, B) block of permuted values.
+    n : int
+        Number of observations.
+    permutations : int
+        Number of permutations.
+    seed : None | int | numpy.random.Generator = None
+        Seed of the permutations. If None, they are drawn from the global
+        NumPy random state, as ``numpy.random.permutation`` would. A
+        Generator is used as is, so that successive calls draw different
+        permutations.
+    n_jobs : int = 1
+        Number of threads computing blocks at once. If -1, all available
+        cores are used. Results do not depend on n_jobs.
+    batch_size : None | int = None
+        Number of permutations in each block. By default, blocks hold about
+        ``_BLOCK_ELEMENTS`` permuted values, to cap memory.
+
+    Returns
+    -------
+    numpy.ndarray of the simulated statistics, stacked along the first axis
+    in the order of the permutations.
+    """
+    blocks = _permutation_blocks(n, permutations, seed=seed, batch_size=batch_size)
+    if n_jobs != 1 and not importlib.util.find_spec("joblib"):
+        warnings.warn(
+            f"Parallel processing is requested (n_jobs={n_jobs}),"
+            f" but joblib cannot be imported. n_jobs will be set"
+            f" to 1.",
+            stacklevel=2,
+        )
+        n_jobs = 1
+    if n_jobs == 1:
+        sims = [statistic(ids) for ids in blocks]
+    else:
+        from joblib import Parallel, delayed
+
+        # sparse products release the GIL, so threads avoid copying w
+        sims = Parallel(n_jobs=n_jobs, prefer="threads")(
+            delayed(statistic)(ids) for ids in blocks
+        )
+    if not sims:
+        return np.empty((0,))
+    return np.concatenate(sims)
 
 
 #######################################################################
@@ -581,38 +2484,151 @@ def parallel_crand(
 #######################################################################
 
 
-@njit(fastmath=False)
+@njit(cache=True, fastmath=False)
+def _permuted_neighbors(i, permuted_ids, cardinality):
+    """
+    Map the first `cardinality` permuted IDs of every replication onto
+    positions in the full data, skipping site `i`.
+
+    `permuted_ids` are drawn from ``range(n - 1)``, i.e. they index into the
+    data with site `i` removed. Rather than building that reduced copy of the
+    data for every site, any id at or above `i` is shifted up by one, so only
+    the `cardinality` values needed per replication are ever gathered.
+
+    Returns
+    -------
+    ids : ndarray
+        (permutations * cardinality,) flat array of positions into the full data
+    """
+    ids = permuted_ids[:, :cardinality].flatten()
+    return ids + (ids >= i)
+
+
+@njit(cache=True, fastmath=False)
 def _prepare_univariate(i, z, permuted_ids, weights_i):
-    mask = np.ones_like(z, dtype=boolean)
-    mask[i] = False
-    z_no_i = z[mask]
     cardinality = len(weights_i)
-    flat_permutation_ids = permuted_ids[:, :cardinality].flatten()
-    zrand = z_no_i[flat_permutation_ids].reshape(-1, cardinality)
+    ids = _permuted_neighbors(i, permuted_ids, cardinality)
+    zrand = z[ids].reshape(-1, cardinality)
     return z[i], zrand
 
 
-@njit(fastmath=False)
+@njit(cache=True, fastmath=False)
+def _prepare_columns(i, z, permuted_ids, weights_i):
+    """
+    Gather the random neighbors of site `i` once for all columns of `z`,
+    returning (k,) values at `i` and a (permutations, cardinality, k) array
+    """
+    cardinality = len(weights_i)
+    ids = _permuted_neighbors(i, permuted_ids, cardinality)
+    zrand = z[ids].reshape(-1, cardinality, z.shape[1])
+    return z[i], zrand
+
+
+@njit(cache=True, fastmath=False)
 def _prepare_bivariate(i, z, permuted_ids, weights_i):
     zx = z[:, 0]
     zy = z[:, 1]
 
     cardinality = len(weights_i)
+    ids = _permuted_neighbors(i, permuted_ids, cardinality)
 
-    mask = np.ones_like(zx, dtype=boolean)
-    mask[i] = False
-    zx_no_i = zy[mask]
-    zy_no_i = zx[mask]
-
-    flat_permutation_indices = permuted_ids[:, :cardinality].flatten()
-
-    zxrand = zx_no_i[flat_permutation_indices].reshape(-1, cardinality)
-    zyrand = zy_no_i[flat_permutation_indices].reshape(-1, cardinality)
+    zxrand = zx[ids].reshape(-1, cardinality)
+    zyrand = zy[ids].reshape(-1, cardinality)
 
     return zx[i], zxrand, zy[i], zyrand
 
 
-@njit(fastmath=True)
+@njit(cache=True, fastmath=True)
 def local(i, z, permuted_ids, weights_i, scaling):
     raise NotImplementedError
     # returns (k_permutations,) array of random statistics for observation i
+
+
+#######################################################################
+#                   Ahead-of-time compilation                         #
+#######################################################################
+
+
+def warmup(n_jobs=-1):
+    """
+    Compile the conditional randomisation kernels of esda for float64 data
+    ...
+
+    Every kernel is declared with ``cache=True``, so compiled code is written to
+    numba's on-disk cache (``__pycache__`` next to the source, or
+    ``NUMBA_CACHE_DIR``) and loaded, instead of compiled, by later processes.
+    Calling this function once, e.g. when building an environment or before
+    spawning workers, fills that cache, so short-lived processes start
+    computing statistics right away. It is a no-op if numba is not installed.
+
+    Parameters
+    ----------
+    n_jobs : int = -1
+        Number of threads to compile the threaded kernels with. If 1, only the
+        serial kernels are compiled.
+
+    Returns
+    -------
+    seconds : dict
+        Wall time taken by each statistic, which is dominated by compilation
+        (or loading from the cache) of its kernels.
+
+    Examples
+    --------
+    >>> import esda
+    >>> seconds = esda.warmup(n_jobs=1)
+    >>> sorted(seconds)[:2]
+    ['G_Local', 'G_Local_star']
+    """
+    from libpysal.weights import lat2W
+
+    from .geary_local import Geary_Local
+    from .getisord import G_Local
+    from .join_counts_local import Join_Counts_Local
+    from .join_counts_local_bv import Join_Counts_Local_BV
+    from .join_counts_local_mv import Join_Counts_Local_MV
+    from .moran import Moran_Local, Moran_Local_BV, _moran_local_columns_crand
+
+    w = lat2W(4, 4)
+    w.transform = "r"
+    rng = np.random.default_rng(0)
+    x, y = rng.normal(size=(2, 16))
+    binary = (rng.random((2, 16)) > 0.5).astype(int)
+    kws = dict(permutations=9, seed=0, alternative="two-sided")
+    z = np.column_stack((x, y))
+    z = z - z.mean(axis=0)
+    observed = z * (w.sparse @ z)
+    statistics = {
+        "Moran_Local": lambda j: Moran_Local(y, w, n_jobs=j, **kws),
+        "Moran_Local_BV": lambda j: Moran_Local_BV(x, y, w, n_jobs=j, **kws),
+        "Moran_Local_columns": lambda j: crand(
+            z,
+            w,
+            observed,
+            9,
+            True,
+            j,
+            _moran_local_columns_crand,
+            seed=0,
+            alternative="two-sided",
+        ),
+        "G_Local": lambda j: G_Local(y, w, n_jobs=j, **kws),
+        "G_Local_star": lambda j: G_Local(y, w, star=True, n_jobs=j, **kws),
+        "Geary_Local": lambda j: Geary_Local(w, n_jobs=j, **kws).fit(y),
+        "Join_Counts_Local": lambda j: Join_Counts_Local(w, n_jobs=j, **kws).fit(
+            binary[0], permutations=9
+        ),
+        "Join_Counts_Local_BV": lambda j: Join_Counts_Local_BV(w, n_jobs=j, **kws).fit(
+            binary[0], binary[1], permutations=9
+        ),
+        "Join_Counts_Local_MV": lambda j: Join_Counts_Local_MV(w, n_jobs=j, **kws).fit(
+            binary, permutations=9
+        ),
+    }
+    seconds = {}
+    for name, statistic in statistics.items():
+        tic = time.perf_counter()
+        for j in (1,) if n_jobs == 1 else (1, n_jobs):
+            statistic(j)
+        seconds[name] = time.perf_counter() - tic
+    return seconds
@@ -8,10 +8,16 @@ __author__ = "Luc Anselin <luc.anselin@asu.edu> Serge Rey <sjsrey@gmail.com>"
 
 
 import numpy as np
-import pandas as pd
-from libpysal.weights import W, lag_spatial
 
-from .crand import _prepare_univariate
+from .crand import (
+    _BLOCK_ELEMENTS,
+    _HAS_NUMBA,
+    _max_threads,
+    _numba_threads,
+    _prepare_univariate,
+    prange,
+    total_crand,
+)
 from .crand import njit as _njit
 
 __all__ = ["Gamma"]
@@ -31,17 +37,31 @@ class Gamma:
     w               : W | Graph
                       spatial weights instance as W or Graph aligned with y
                       can be binary or row-standardized
-    operation       : {'c', 's', 'a'}
+    operation       : {'c', 's', 'a'} or callable
                       attribute similarity function where,
                       'c' cross product
                       's' squared difference
                       'a' absolute difference
+                      or a function op(z, i, j) of the values and the
+                      positions of a pair of neighbors. Functions compiled
+                      with numba.njit are evaluated in parallel kernels
+                      over the edges, other functions in Python.
     standardize     : {False, True}
                       standardize variables first
                       False, keep as is
                       True, standardize to mean zero and variance one
     permutations    : int
                       number of random permutations for calculation of pseudo-p_values
+    n_jobs          : int
+                      number of threads simulating permutations at once. If -1,
+                      all available cores are used.
+    seed            : None | int
+                      seed of the permutations. If None (default), they are
+                      drawn from the global numpy random state.
+    batch_size      : None | int
+                      number of permutations simulated in each pass over the
+                      edges, to cap memory. By default, blocks hold about
+                      2**22 permuted values.
 
     Attributes
     ----------
@@ -161,7 +181,15 @@ class Gamma:
     """
 
     def __init__(
-        self, y, w, operation="c", standardize=False, permutations=PERMUTATIONS
+        self,
+        y,
+        w,
+        operation="c",
+        standardize=False,
+        permutations=PERMUTATIONS,
+        n_jobs=1,
+        seed=None,
+        batch_size=None,
     ):
         y = np.asarray(y).flatten()
         self.w = w
@@ -174,15 +202,16 @@ class Gamma:
             ysd = np.std(self.y)
             ys = (self.y - ym) / ysd
             self.y = ys
-        calc = self.__calc_w if isinstance(self.w, W) else self.__calc_g
-        self.g = calc(self.y, self.op)
+        # W is in id_order and Graph in unique_ids order, as y is
+        edges = self.w.sparse.tocoo()
+        self._focal, self._neighbor, self._weights = edges.row, edges.col, edges.data
+        W = self.w.sparse
+        self._degree = np.asarray(W.sum(axis=0) + W.sum(axis=1).T).flatten()
+        n = self.y.shape[0]
+        self.g = self.__calc(np.arange(n)[None, :])[0]
 
         if permutations:
-            sim = [
-                calc(np.random.permutation(self.y), self.op)
-                for i in range(permutations)
-            ]
-            self.sim_g = np.array(sim)
+            self.sim_g = self.__simulate(permutations, n_jobs, seed, batch_size)
             self.min_g = np.min(self.sim_g)
             self.mean_g = np.mean(self.sim_g)
             self.max_g = np.max(self.sim_g)
@@ -199,67 +228,52 @@ class Gamma:
         """new name to fit with Moran module"""
         return self.p_sim_g
 
-    def __calc_w(self, z, op):
-        if op == "c":  # cross-product
-            zl = lag_spatial(self.w, z)
-            g = (z * zl).sum()
-        elif op == "s":  # squared difference
-            zs = np.zeros(z.shape)
-            z2 = z**2
-            for i, i0 in enumerate(self.w.id_order):
-                neighbors = self.w.neighbor_offsets[i0]
-                wijs = self.w.weights[i0]
-                zw = list(zip(neighbors, wijs, strict=True))
-                zs[i] = sum(
-                    [wij * (z2[i] - 2.0 * z[i] * z[j] + z2[j]) for j, wij in zw]
-                )
-            g = zs.sum()
-        elif op == "a":  # absolute difference
-            zs = np.zeros(z.shape)
-            for i, i0 in enumerate(self.w.id_order):
-                neighbors = self.w.neighbor_offsets[i0]
-                wijs = self.w.weights[i0]
-                zw = list(zip(neighbors, wijs, strict=True))
-                zs[i] = sum([wij * abs(z[i] - z[j]) for j, wij in zw])
-            g = zs.sum()
+    def __simulate(self, permutations, n_jobs, seed, batch_size):
+        n = self.y.shape[0]
+        if not (_HAS_NUMBA and (self.op in ("s", "a") or _is_compiled(self.op))):
+            return total_crand(
+                self.__calc,
+                n,
+                permutations,
+                seed=seed,
+                n_jobs=n_jobs,
+                batch_size=batch_size,
+            )
+        # the kernels are parallel over the permutations of each block
+        if n_jobs == -1 or n_jobs > _max_threads():
+            n_jobs = _max_threads()
+        with _numba_threads(n_jobs):
+            return total_crand(
+                self.__calc, n, permutations, seed=seed, batch_size=batch_size
+            )
+
+    def __calc(self, ids):
+        """Gamma index for each permutation of y in the rows of `ids`"""
+        edges = (self._focal, self._neighbor, self._weights)
+        if self.op == "c":  # cross-product
+            z = self.y[ids.T]
+            return np.einsum("ij,ij->j", z, self.w.sparse @ z)
+        elif self.op in ("s", "a") and _HAS_NUMBA:  # squared or absolute difference
+            return _gamma_difference(self.y, ids, *edges, self.op == "a")
+        elif self.op == "s":
+            # sum_ij w_ij (z_i - z_j)^2 = sum_i (w_i. + w_.i) z_i^2 - 2 z'Wz,
+            # with one permutation of y per row, centered to avoid cancellation,
+            # and summed in sequence so that results do not depend on batching
+            z = (self.y - self.y.mean())[ids]
+            lag = (self.w.sparse @ z.T).T
+            return np.add.accumulate(z * (self._degree * z - 2 * lag), axis=1)[:, -1]
+        elif self.op == "a":
+            return _gamma_absolute_blocks(self.y, ids, *edges)
+        elif _is_compiled(self.op):
+            return _gamma_op(self.y, ids, *edges, self.op)
         else:  # any previously defined function op
-            zs = np.zeros(z.shape)
-            for i, i0 in enumerate(self.w.id_order):
-                neighbors = self.w.neighbor_offsets[i0]
-                wijs = self.w.weights[i0]
-                zw = list(zip(neighbors, wijs, strict=True))
-                zs[i] = sum([wij * op(z, i, j) for j, wij in zw])
-            g = zs.sum()
-
-        return g
-
-    def __calc_g(self, z, op):
-        if op == "c":  # cross-product
-            zl = self.w.lag(z)
-            g = (z * zl).sum()
-        elif op == "s":  # squared difference
-            z = pd.Series(z, index=self.w.unique_ids)
-            z2 = z**2
-            focal, neighbour = self.w.index_pairs
-            g = (
-                self.w._adjacency.values
-                * (
-                    z2[focal].values
-                    - 2.0 * z[focal].values * z[neighbour].values
-                    + z2[neighbour].values
+            g = np.zeros(ids.shape[0])
+            for b, permutation in enumerate(ids):
+                z = self.y[permutation]
+                g[b] = sum(
+                    wij * self.op(z, i, j) for i, j, wij in zip(*edges, strict=True)
                 )
-            ).sum()
-        elif op == "a":  # absolute difference
-            z = pd.Series(z, index=self.w.unique_ids)
-            focal, neighbour = self.w.index_pairs
-            g = (
-                self.w._adjacency.values
-                * (np.abs(z[focal].values - z[neighbour].values))
-            ).sum()
-        else:  # any previously defined function op
-            raise NotImplementedError
-
-        return g
+            return g
 
     def __pseudop(self, sim, g):
         above = sim >= g
@@ -270,10 +284,59 @@ class Gamma:
         return psim
 
 
+def _is_compiled(op):
+    """Whether `op` is a function compiled by numba"""
+    if not _HAS_NUMBA:
+        return False
+    from numba.core.dispatcher import Dispatcher
+
+    return isinstance(op, Dispatcher)
+
+
+@_njit(cache=True, parallel=True, fastmath=False)
+def _gamma_difference(z, ids, focal, neighbor, weights, absolute):
+    """Gamma index of squared or absolute differences over an edge list"""
+    g = np.zeros(ids.shape[0])
+    for b in prange(ids.shape[0]):
+        zb = z[ids[b]]
+        total = 0.0
+        for e in range(focal.shape[0]):
+            d = zb[focal[e]] - zb[neighbor[e]]
+            total += weights[e] * (abs(d) if absolute else d * d)
+        g[b] = total
+    return g
+
+
+def _gamma_absolute_blocks(z, ids, focal, neighbor, weights):
+    """Gamma index of absolute differences, over blocks of permutations"""
+    g = np.zeros(ids.shape[0])
+    step = max(_BLOCK_ELEMENTS // max(focal.shape[0], 1), 1)
+    for start in range(0, ids.shape[0], step):
+        rows = ids[start : start + step]
+        d = z[rows[:, focal]] - z[rows[:, neighbor]]
+        # summed in sequence, so that results do not depend on batching
+        g[start : start + step] = np.add.accumulate(np.abs(d) * weights, axis=1)[:, -1]
+    return g
+
+
+# not cached, since it is compiled again for every op
+@_njit(parallel=True, fastmath=False)
+def _gamma_op(z, ids, focal, neighbor, weights, op):
+    """Gamma index of a numba-compiled op(z, i, j) over an edge list"""
+    g = np.zeros(ids.shape[0])
+    for b in prange(ids.shape[0]):
+        zb = z[ids[b]]
+        total = 0.0
+        for e in range(focal.shape[0]):
+            total += weights[e] * op(zb, focal[e], neighbor[e])
+        g[b] = total
+    return g
+
+
 # --------------------------------------------------------------
 # Conditional Randomization Function Implementations
 # --------------------------------------------------------------
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _local_gamma_crand(i, z, permuted_ids, weights_i, scaling):
     zi, zrand = _prepare_univariate(i, z, permuted_ids, weights_i)
     return (zi * zrand) @ weights_i * scaling
@@ -9,6 +9,9 @@ import numpy as np
 import scipy.stats as stats
 from libpysal import graph, weights
 
+from .crand import _HAS_NUMBA, _max_threads, _numba_threads, prange, total_crand
+from .crand import njit as _njit
+
 __all__ = ["Geary"]
 
 
@@ -30,6 +33,16 @@ class Geary:
     permutations   : int
                      number of random permutations for calculation of
                      pseudo-p_values
+    n_jobs         : int
+                     number of threads simulating permutations at once. If
+                     -1, all available cores are used.
+    seed           : None | int
+                     seed of the permutations. If None (default), they are
+                     drawn from the global numpy random state.
+    batch_size     : None | int
+                     number of permutations simulated in each pass over the
+                     edges, to cap memory. By default, blocks hold about
+                     2**22 permuted values.
 
     Attributes
     ----------
@@ -99,7 +112,16 @@ class Geary:
 
     """
 
-    def __init__(self, y, w, transformation="r", permutations=999):
+    def __init__(
+        self,
+        y,
+        w,
+        transformation="r",
+        permutations=999,
+        n_jobs=1,
+        seed=None,
+        batch_size=None,
+    ):
         if not isinstance(w, weights.W | graph.Graph):
             raise TypeError(
                 "w must be a libpysal.weights.W or libpysal.graph.Graph object, "
@@ -139,10 +161,7 @@ class Geary:
             self.p_rand = stats.norm.cdf(self.z_rand)
 
         if permutations:
-            sim = [
-                self.__calc(np.random.permutation(self.y)) for i in range(permutations)
-            ]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = self.__simulate(permutations, n_jobs, seed, batch_size)
             above = sim >= self.C
             larger = sum(above)
             if (permutations - larger) < larger:
@@ -186,3 +205,56 @@ class Geary:
         num = (self._weights * ((y[self._focal_ix] - y[self._neighbor_ix]) ** 2)).sum()
         a = (self.n - 1) * num
         return a / self.den
+
+    def __simulate(self, permutations, n_jobs, seed, batch_size):
+        if not _HAS_NUMBA:
+            W = self.w.sparse
+            self._degree = np.asarray(W.sum(axis=0) + W.sum(axis=1).T).flatten()
+            return total_crand(
+                self.__calc_block,
+                self.n,
+                permutations,
+                seed=seed,
+                n_jobs=n_jobs,
+                batch_size=batch_size,
+            )
+        # the kernel is parallel over the permutations of each block
+        if n_jobs == -1 or n_jobs > _max_threads():
+            n_jobs = _max_threads()
+        with _numba_threads(n_jobs):
+            return total_crand(
+                self.__calc_kernel,
+                self.n,
+                permutations,
+                seed=seed,
+                batch_size=batch_size,
+            )
+
+    def __calc_kernel(self, ids):
+        num = _geary_permutations(
+            self.y, ids, self._focal_ix, self._neighbor_ix, self._weights
+        )
+        return (self.n - 1) * num / self.den
+
+    def __calc_block(self, ids):
+        # sum_ij w_ij (y_i - y_j)^2 = sum_i (w_i. + w_.i) y_i^2 - 2 y'Wy,
+        # with one permutation of y per row, centered to avoid cancellation,
+        # and summed in sequence so that results do not depend on batching
+        y = (self.y - self.y.mean())[ids]
+        lag = (self.w.sparse @ y.T).T
+        num = np.add.accumulate(y * (self._degree * y - 2 * lag), axis=1)[:, -1]
+        return (self.n - 1) * num / self.den
+
+
+@_njit(cache=True, parallel=True, fastmath=False)
+def _geary_permutations(y, ids, focal, neighbor, weights):
+    """Numerator of Geary's C for each permutation of `y` in the rows of `ids`"""
+    num = np.zeros(ids.shape[0])
+    for b in prange(ids.shape[0]):
+        yb = y[ids[b]]
+        total = 0.0
+        for e in range(focal.shape[0]):
+            d = yb[focal[e]] - yb[neighbor[e]]
+            total += weights[e] * d * d
+        num[b] = total
+    return num
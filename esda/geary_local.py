@@ -3,7 +3,12 @@ import pandas as pd
 from libpysal import weights
 from sklearn.base import BaseEstimator
 
-from esda.crand import _prepare_univariate
+from esda.crand import (
+    _block_lag,
+    _block_sites,
+    _prepare_univariate,
+    _register_block,
+)
 from esda.crand import crand as _crand_plus
 from esda.crand import njit as _njit
 
@@ -23,6 +28,10 @@ class Geary_Local(BaseEstimator):
         island_weight=0,
         drop_islands=True,
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        dtype=None,
+        sites=None,
     ):
         """
         Initialize a Local_Geary estimator
@@ -74,6 +83,26 @@ class Geary_Local(BaseEstimator):
         alternative : None | str = None
             The alternative hypothesis for conditional randomization.
             See ``crand.crand()`` for complete description.
+        early_stopping : None | int = None
+            If an integer h, a site stops being simulated once h of its
+            simulated values are as extreme as the observed one, and its
+            p-value is estimated sequentially :cite:`besag1991sequential`.
+            See ``crand.crand()`` for complete description.
+        plan : None | CrandPlan = None
+            Prepared weights and permutation table from ``crand.CrandPlan``,
+            to reuse across statistics over the same weights. It must match
+            the transformed weights and `permutations`, and its seed is used
+            instead of `seed`. See ``crand.crand()`` for complete description.
+        dtype : None | numpy.dtype = None
+            Floating point type of the conditional randomization, e.g.
+            ``numpy.float32`` to halve the memory traffic of the simulations.
+            See ``crand.crand()`` for complete description.
+        sites : None | array = None
+            Sites to run the conditional randomization for, as a boolean mask
+            or an array of positions. Other sites get NaN p-values and
+            simulations, and zero draws, while random neighbors are still
+            drawn from all sites. See ``crand.crand()`` for complete
+            description.
 
         Attributes
         ----------
@@ -97,6 +126,10 @@ class Geary_Local(BaseEstimator):
         self.island_weight = island_weight
         self.drop_islands = drop_islands
         self.alternative = alternative
+        self.early_stopping = early_stopping
+        self.plan = plan
+        self.dtype = dtype
+        self.sites = sites
 
     def fit(self, x):
         """
@@ -148,7 +181,7 @@ class Geary_Local(BaseEstimator):
         self.localG = self._statistic(x, w, self.drop_islands)
 
         if permutations:
-            self.p_sim, self.rlocalG = _crand_plus(
+            self.p_sim, self.rlocalG, sim_moments = _crand_plus(
                 z=(x - np.mean(x)) / np.std(x),
                 w=w,
                 observed=self.localG,
@@ -159,7 +192,13 @@ class Geary_Local(BaseEstimator):
                 seed=self.seed,
                 island_weight=self.island_weight,
                 alternative=self.alternative,
+                moments=True,
+                early_stopping=self.early_stopping,
+                plan=self.plan,
+                dtype=self.dtype,
+                sites=self.sites,
             )
+            self.n_draws = sim_moments[:, 2].astype(int)
 
         if self.labels:
             Eij_mean = np.mean(self.localG)
@@ -218,8 +257,14 @@ class Geary_Local(BaseEstimator):
 # Note: does not using the scaling parameter
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _local_geary(i, z, permuted_ids, weights_i, scaling):  # noqa: ARG001 - Unused function argument: `scaling`
     other_weights = weights_i[1:]
     zi, zrand = _prepare_univariate(i, z, permuted_ids, other_weights)
     return (zi - zrand) ** 2 @ other_weights
+
+
+@_register_block(_local_geary)
+def _local_geary_block(i, z, zrand, weights, segments, self_weights, scaling):  # noqa: ARG001 - Unused function argument: `self_weights`, `scaling`
+    zi = _block_sites(z[i], segments, zrand.shape[0])
+    return _block_lag((zi - zrand) ** 2, weights, segments, len(i))
@@ -13,7 +13,13 @@ from libpysal.weights.spatial_lag import lag_spatial
 from libpysal.weights.util import fill_diagonal
 from scipy import stats
 
-from .crand import _prepare_univariate
+from .crand import (
+    _block_lag,
+    _prepare_univariate,
+    _register_block,
+    _simulation_summary,
+    total_crand,
+)
 from .crand import crand as _crand_plus
 from .crand import njit as _njit
 
@@ -32,6 +38,12 @@ class G:
                    spatial weights instance as W or Graph aligned with y
     permutations  : int
                     the number of random permutations for calculating pseudo p_values
+    n_jobs        : int
+                    number of threads simulating blocks of permutations at
+                    once. If -1, all available cores are used.
+    seed          : None | int
+                    seed of the permutations. If None (default), they are
+                    drawn from the global numpy random state.
 
     Attributes
     ----------
@@ -110,7 +122,7 @@ class G:
     np.float64(0.173)
     """
 
-    def __init__(self, y, w, permutations=PERMUTATIONS):
+    def __init__(self, y, w, permutations=PERMUTATIONS, n_jobs=1, seed=None):
         y = np.asarray(y).flatten()
         self.n = len(y)
         self.y = y
@@ -132,10 +144,9 @@ class G:
         self.p_norm = 1.0 - stats.norm.cdf(np.abs(self.z_norm))
 
         if permutations:
-            sim = [
-                self.__calc(np.random.permutation(self.y)) for i in range(permutations)
-            ]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = total_crand(
+                self.__calc_block, self.n, permutations, seed=seed, n_jobs=n_jobs
+            )
             above = sim >= self.G
             larger = sum(above)
             if (self.permutations - larger) < larger:
@@ -182,6 +193,11 @@ class G:
         self.num = y * yl
         return self.num.sum() / self.den_sum
 
+    def __calc_block(self, ids):
+        # one permutation of y per column, lagged by a single sparse product
+        y = self.y[ids.T]
+        return np.einsum("ij,ij->j", y, self.w.sparse @ y) / self.den_sum
+
     @property
     def _statistic(self):
         """Standardized accessor for esda statistics"""
@@ -220,6 +236,38 @@ class G_Local:
     alternative : None or str, optional
         The alternative hypothesis for conditional randomization. See
         ``crand.crand()`` for complete description.
+    early_stopping : None or int, optional
+        If an integer h, a site stops being simulated once h of its simulated
+        values are as extreme as the observed one, and its p-value is estimated
+        sequentially :cite:`besag1991sequential`. See ``crand.crand()`` for
+        complete description.
+    plan : None or CrandPlan, optional
+        Prepared weights and permutation table from ``crand.CrandPlan``, to
+        reuse across statistics over the same weights. It must match the
+        transformed weights and `permutations`, and its seed is used instead
+        of `seed`. See ``crand.crand()`` for complete description.
+    dtype : None or numpy.dtype, optional
+        Floating point type of the conditional randomization, e.g.
+        ``numpy.float32`` to halve the memory traffic of the simulations and
+        the size of `rGs`. See ``crand.crand()`` for complete description.
+    simulations_path : None, str or os.PathLike, optional
+        If given, `rGs` is written to a .npy file at this path while it is
+        simulated, and kept on disk as a read-only memmap rather than in
+        memory, so that `sim` is only read when accessed, and EG_sim and
+        VG_sim are computed block by block. Only used if keep_simulations is
+        True. See ``crand.crand()`` for complete description.
+    inference : {"permutation", "analytic"}, optional
+        How to test the local statistics. ``"permutation"`` runs the
+        conditional randomization. ``"analytic"`` skips it, and only provides
+        Zs and p_norm from the analytical moments EGs and VGs, at the cost of
+        a sparse product. This is cheap enough to screen very large maps for
+        candidate sites before simulating.
+    sites : None or array, optional
+        Sites to run the conditional randomization for, as a boolean mask or
+        an array of positions, e.g. those where p_norm is small. Other sites
+        get NaN p_sim, EG_sim, VG_sim and simulations, and zero n_draws.
+        Random neighbors are still drawn from all sites. See
+        ``crand.crand()`` for complete description.
 
     Attributes
     ----------
@@ -257,6 +305,9 @@ class G_Local:
     p_z_sim : array
         P-values based on the standard normal approximation from permutations
         (one-sided).
+    n_draws : array
+        Number of simulated values drawn at each site. Equal to
+        ``permutations`` unless ``early_stopping`` is set.
 
     Notes
     -----
@@ -355,7 +406,18 @@ class G_Local:
         seed=None,
         island_weight=0,
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        dtype=None,
+        simulations_path=None,
+        inference="permutation",
+        sites=None,
     ):
+        if inference not in ("permutation", "analytic"):
+            raise ValueError(
+                f"inference='{inference}' provided, but is not one of the"
+                " supported options: 'permutation', 'analytic'"
+            )
         y = np.asarray(y).flatten()
         self.n = len(y)
         self.y = y
@@ -370,8 +432,8 @@ class G_Local:
         self.star = star
         self.calc()
         self.p_norm = stats.norm.sf(np.abs(self.Zs))
-        if permutations:
-            self.p_sim, self.rGs = _crand_plus(
+        if permutations and inference == "permutation":
+            self.p_sim, self.rGs, sim_moments = _crand_plus(
                 y,
                 w,
                 self.Gs,
@@ -383,14 +445,25 @@ class G_Local:
                 seed=seed,
                 island_weight=island_weight,
                 alternative=alternative,
+                moments=True,
+                early_stopping=early_stopping,
+                plan=plan,
+                dtype=dtype,
+                simulations_path=simulations_path if keep_simulations else None,
+                sites=sites,
             )
+            self.n_draws = sim_moments[:, 2].astype(int)
             if keep_simulations:
-                self.sim = sim = self.rGs.T
-                self.EG_sim = sim.mean(axis=0)
-                self.seG_sim = sim.std(axis=0)
+                self.sim = self.rGs.T
+            if keep_simulations and early_stopping is None:
+                _, self.EG_sim, self.seG_sim = _simulation_summary(self.rGs, self.Gs)
                 self.VG_sim = self.seG_sim * self.seG_sim
-                self.z_sim = (self.Gs - self.EG_sim) / self.seG_sim
-                self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
+            else:
+                self.EG_sim = sim_moments[:, 0]
+                self.VG_sim = sim_moments[:, 1]
+                self.seG_sim = np.sqrt(self.VG_sim)
+            self.z_sim = (self.Gs - self.EG_sim) / self.seG_sim
+            self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
 
     def __crand(self, keep_simulations):
         warnings.warn(
@@ -567,16 +640,28 @@ def _infer_star_and_structure_w(weights, star, transform):
 # --------------------------------------------------------------
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _g_local_crand(i, z, permuted_ids, weights_i, scaling):
     other_weights = weights_i[1:]
     zi, zrand = _prepare_univariate(i, z, permuted_ids, other_weights)
     return (zrand @ other_weights) / (scaling - zi)
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _g_local_star_crand(i, z, permuted_ids, weights_i, scaling):
     self_weight = weights_i[0]
     other_weights = weights_i[1:]
     zi, zrand = _prepare_univariate(i, z, permuted_ids, other_weights)
     return (zrand @ other_weights + self_weight * zi) / scaling
+
+
+@_register_block(_g_local_crand)
+def _g_local_block(i, z, zrand, weights, segments, self_weights, scaling):  # noqa: ARG001 - Unused function argument: `self_weights`
+    lag = _block_lag(zrand, weights, segments, len(i))
+    return lag / (scaling - z[i])[:, None]
+
+
+@_register_block(_g_local_star_crand)
+def _g_local_star_block(i, z, zrand, weights, segments, self_weights, scaling):
+    lag = _block_lag(zrand, weights, segments, len(i))
+    return (lag + (self_weights * z[i])[:, None]) / scaling
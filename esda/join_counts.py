@@ -9,9 +9,11 @@ __author__ = "Sergio J. Rey <srey@asu.edu> , Luc Anselin <luc.anselin@asu.edu>"
 import numpy as np
 import pandas as pd
 from libpysal.weights import W
+from scipy import sparse
 from scipy.stats import chi2, chi2_contingency
 
 from .crand import njit as _njit
+from .crand import total_crand
 
 __all__ = ["Join_Counts"]
 
@@ -31,6 +33,15 @@ class Join_Counts:
                       spatial weights instance as W or Graph aligned with y
     permutations    : int
                       number of random permutations for calculation of pseudo-p_values
+    n_jobs          : int
+                      number of threads simulating blocks of permutations at
+                      once. If -1, all available cores are used.
+    seed            : None | int
+                      seed of the permutations. If None (default), they are
+                      drawn from the global numpy random state.
+    batch_size      : None | int
+                      number of permutations simulated at once, to cap memory.
+                      By default, blocks hold about 2**22 permuted values.
 
     Attributes
     ----------
@@ -143,7 +154,16 @@ class Join_Counts:
 
     """
 
-    def __init__(self, y, w, permutations=PERMUTATIONS, drop_islands=True):
+    def __init__(
+        self,
+        y,
+        w,
+        permutations=PERMUTATIONS,
+        drop_islands=True,
+        n_jobs=1,
+        seed=None,
+        batch_size=None,
+    ):
         y = np.asarray(y).flatten()
 
         if isinstance(w, W):
@@ -186,17 +206,7 @@ class Join_Counts:
         self.calc = self.__calc
 
         if permutations:
-            sim = []
-            i = 0
-            while i < permutations:
-                try:
-                    res = self.__calc(np.random.permutation(self.y))
-                    sim.append(res)
-                    i += 1
-                except ValueError:
-                    # expected count of 0 -> inadmissible
-                    pass
-            sim_jc = np.array(sim, dtype=object)
+            sim_jc = self.__simulate(permutations, n_jobs, seed, batch_size)
             self.sim_bb = sim_jc[:, 0]
             self.min_bb = np.min(self.sim_bb)
             self.mean_bb = np.mean(self.sim_bb)
@@ -218,7 +228,9 @@ class Join_Counts:
 
             p_sim_bb = self.__pseudop(self.sim_bb, self.bb)
             p_sim_bw = self.__pseudop(self.sim_bw, self.bw)
-            p_sim_chi2 = self.__pseudop(self.sim_chi2, self.chi2)
+            # same closed form as the simulations, so that ties are kept
+            observed = self.__calc_block(np.arange(self.y.shape[0])[None, :])
+            p_sim_chi2 = self.__pseudop(self.sim_chi2, observed[0, 3])
             p_sim_autocorr_pos = self.__pseudop(
                 self.sim_autocurr_pos, self.autocorr_pos
             )
@@ -250,6 +262,64 @@ class Join_Counts:
         stat, pvalue, dof, expected = chi2
         return (bb, ww, bw + wb, stat, pvalue, dof, expected, np.array(table))
 
+    def __simulate(self, permutations, n_jobs, seed, batch_size):
+        n = self.y.shape[0]
+        ids = self.w.id_order if isinstance(self.w, W) else self.w.unique_ids
+        index = pd.Index(ids)
+        focal = index.get_indexer(self.adj_list.focal)
+        neighbor = index.get_indexer(self.adj_list.neighbor)
+        self._edges = (
+            sparse.csr_matrix(
+                (np.ones(focal.shape[0]), (focal, neighbor)), shape=(n, n)
+            ),
+            np.bincount(focal, minlength=n),
+            np.bincount(neighbor, minlength=n),
+        )
+        # inadmissible draws are replaced by further ones from the same stream
+        rng = None if seed is None else np.random.default_rng(seed)
+        sims = []
+        remaining = permutations
+        while remaining:
+            sim = total_crand(
+                self.__calc_block,
+                n,
+                remaining,
+                seed=rng,
+                n_jobs=n_jobs,
+                batch_size=batch_size,
+            )
+            sim = sim[sim[:, -1] > 0, :-1]
+            sims.append(sim)
+            remaining -= sim.shape[0]
+        return np.concatenate(sims)
+
+    def __calc_block(self, ids):
+        """
+        Join counts and chi-square for each permutation of y in the rows of
+        `ids`, with a last column flagging those whose expected counts are
+        all positive
+        """
+        adjacency, focal_degree, neighbor_degree = self._edges
+        z = self.y[ids.T].astype(float)
+        # joins are listed in both directions in the adjacency list
+        both = np.einsum("ij,ij->j", z, adjacency @ z)
+        focal = focal_degree @ z
+        neighbor = neighbor_degree @ z
+        bb = both / 2
+        bw = (focal - both) / 2
+        wb = (neighbor - both) / 2
+        ww = (focal_degree.sum() - focal - neighbor + both) / 2
+        # chi2_contingency of [[ww, wb], [bw, bb]], with Yates' correction
+        table = np.array([[ww, wb], [bw, bb]])
+        expected = table.sum(axis=1)[:, None] * table.sum(axis=0)[None, :]
+        expected /= table.sum(axis=(0, 1))
+        admissible = (expected > 0).all(axis=(0, 1))
+        diff = np.abs(ww - expected[0, 0])
+        diff -= np.minimum(0.5, diff)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            stat = diff**2 * (1 / expected).sum(axis=(0, 1))
+        return np.column_stack((bb, ww, bw + wb, stat, admissible))
+
     def __pseudop(self, sim, jc):
         above = sim >= jc
         larger = sum(above)
@@ -264,6 +334,6 @@ class Join_Counts:
 # --------------------------------------------------------------
 # Conditional Randomization Function Implementations
 # --------------------------------------------------------------
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _local_join_count_crand():
     raise NotImplementedError
@@ -3,7 +3,7 @@ import pandas as pd
 from libpysal import weights
 from sklearn.base import BaseEstimator
 
-from esda.crand import _prepare_univariate
+from esda.crand import _block_lag, _prepare_univariate, _register_block
 from esda.crand import crand as _crand_plus
 from esda.crand import njit as _njit
 
@@ -23,6 +23,10 @@ class Join_Counts_Local(BaseEstimator):
         island_weight=0,
         drop_islands=True,
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        dtype=None,
+        sites=None,
     ):
         """
         Initialize a Local_Join_Count estimator
@@ -58,6 +62,26 @@ class Join_Counts_Local(BaseEstimator):
         alternative : None | str = None
             The alternative hypothesis for conditional randomization.
             See ``crand.crand()`` for complete description.
+        early_stopping : None | int = None
+            If an integer h, a site stops being simulated once h of its
+            simulated values are as extreme as the observed one, and its
+            p-value is estimated sequentially :cite:`besag1991sequential`.
+            See ``crand.crand()`` for complete description.
+        plan : None | CrandPlan = None
+            Prepared weights and permutation table from ``crand.CrandPlan``,
+            to reuse across statistics over the same weights. It must match
+            the transformed weights and `permutations`, and its seed is used
+            instead of `seed`. See ``crand.crand()`` for complete description.
+        dtype : None | numpy.dtype = None
+            Floating point type of the conditional randomization, e.g.
+            ``numpy.float32`` to halve the memory traffic of the simulations.
+            See ``crand.crand()`` for complete description.
+        sites : None | array = None
+            Sites to run the conditional randomization for, as a boolean mask
+            or an array of positions. Other sites get NaN p-values and
+            simulations, and zero draws, while random neighbors are still
+            drawn from all sites. See ``crand.crand()`` for complete
+            description.
 
         Attributes
         ----------
@@ -78,6 +102,10 @@ class Join_Counts_Local(BaseEstimator):
         self.island_weight = island_weight
         self.drop_islands = drop_islands
         self.alternative = alternative
+        self.early_stopping = early_stopping
+        self.plan = plan
+        self.dtype = dtype
+        self.sites = sites
 
     def fit(self, y, n_jobs=1, permutations=999):
         """
@@ -162,7 +190,7 @@ class Join_Counts_Local(BaseEstimator):
         self.LJC = self._statistic(y, w, self.drop_islands)
 
         if permutations:
-            self.p_sim, self.rjoins = _crand_plus(
+            self.p_sim, self.rjoins, sim_moments = _crand_plus(
                 z=self.y,
                 w=self.w,
                 observed=self.LJC,
@@ -173,7 +201,13 @@ class Join_Counts_Local(BaseEstimator):
                 seed=self.seed,
                 island_weight=self.island_weight,
                 alternative=self.alternative,
+                moments=True,
+                early_stopping=self.early_stopping,
+                plan=self.plan,
+                dtype=self.dtype,
+                sites=self.sites,
             )
+            self.n_draws = sim_moments[:, 2].astype(int)
             # Set p-values for those with LJC of 0 to NaN
             self.p_sim[self.LJC == 0] = "NaN"
 
@@ -211,9 +245,14 @@ class Join_Counts_Local(BaseEstimator):
 # Note: scaling not used
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _ljc_uni(i, z, permuted_ids, weights_i, scaling):  # noqa: ARG001 - Unused function argument: `scaling`
     # self_weight = weights_i[0]
     other_weights = weights_i[1:]
     zi, zrand = _prepare_univariate(i, z, permuted_ids, other_weights)
     return zi * (zrand @ other_weights)
+
+
+@_register_block(_ljc_uni)
+def _ljc_uni_block(i, z, zrand, weights, segments, self_weights, scaling):  # noqa: ARG001 - Unused function argument: `self_weights`, `scaling`
+    return z[i][:, None] * _block_lag(zrand, weights, segments, len(i))
@@ -3,7 +3,12 @@ import pandas as pd
 from libpysal import weights
 from sklearn.base import BaseEstimator
 
-from esda.crand import _prepare_bivariate, _prepare_univariate
+from esda.crand import (
+    _block_lag,
+    _prepare_bivariate,
+    _prepare_univariate,
+    _register_block,
+)
 from esda.crand import crand as _crand_plus
 from esda.crand import njit as _njit
 
@@ -23,6 +28,9 @@ class Join_Counts_Local_BV(BaseEstimator):
         island_weight=0,
         drop_islands=True,
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        sites=None,
     ):
         """
         Initialize a Local_Join_Counts_BV estimator
@@ -57,6 +65,22 @@ class Join_Counts_Local_BV(BaseEstimator):
         alternative : None | str = None
             The alternative hypothesis for conditional randomization.
             See ``crand.crand()`` for complete description.
+        early_stopping : None | int = None
+            If an integer h, a site stops being simulated once h of its
+            simulated values are as extreme as the observed one, and its
+            p-value is estimated sequentially :cite:`besag1991sequential`.
+            See ``crand.crand()`` for complete description.
+        plan : None | CrandPlan = None
+            Prepared weights and permutation table from ``crand.CrandPlan``,
+            to reuse across statistics over the same weights. It must match
+            the transformed weights and `permutations`, and its seed is used
+            instead of `seed`. See ``crand.crand()`` for complete description.
+        sites : None | array = None
+            Sites to run the conditional randomization for, as a boolean mask
+            or an array of positions. Other sites get NaN p-values and
+            simulations, and zero draws, while random neighbors are still
+            drawn from all sites. See ``crand.crand()`` for complete
+            description.
         """
 
         self.connectivity = connectivity
@@ -67,6 +91,9 @@ class Join_Counts_Local_BV(BaseEstimator):
         self.island_weight = island_weight
         self.drop_islands = drop_islands
         self.alternative = alternative
+        self.early_stopping = early_stopping
+        self.plan = plan
+        self.sites = sites
 
     def fit(self, x, z, case="CLC", n_jobs=1, permutations=999):
         """
@@ -193,7 +220,7 @@ class Join_Counts_Local_BV(BaseEstimator):
 
         if permutations:
             if case == "BJC":
-                self.p_sim, self.rjoins = _crand_plus(
+                self.p_sim, self.rjoins, sim_moments = _crand_plus(
                     z=np.column_stack((x, z)),
                     w=self.w,
                     observed=self.LJC,
@@ -204,11 +231,16 @@ class Join_Counts_Local_BV(BaseEstimator):
                     seed=self.seed,
                     island_weight=self.island_weight,
                     alternative=self.alternative,
+                    moments=True,
+                    early_stopping=self.early_stopping,
+                    plan=self.plan,
+                    sites=self.sites,
                 )
+                self.n_draws = sim_moments[:, 2].astype(int)
                 # Set p-values for those with LJC of 0 to NaN
                 self.p_sim[self.LJC == 0] = "NaN"
             elif case == "CLC":
-                self.p_sim, self.rjoins = _crand_plus(
+                self.p_sim, self.rjoins, sim_moments = _crand_plus(
                     z=np.column_stack((x, z)),
                     w=self.w,
                     observed=self.LJC,
@@ -219,7 +251,12 @@ class Join_Counts_Local_BV(BaseEstimator):
                     seed=self.seed,
                     island_weight=self.island_weight,
                     alternative=self.alternative,
+                    moments=True,
+                    early_stopping=self.early_stopping,
+                    plan=self.plan,
+                    sites=self.sites,
                 )
+                self.n_draws = sim_moments[:, 2].astype(int)
                 # Set p-values for those with LJC of 0 to NaN
                 self.p_sim[self.LJC == 0] = "NaN"
             else:
@@ -288,7 +325,7 @@ class Join_Counts_Local_BV(BaseEstimator):
 # Note: scaling not used
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _ljc_bv_case1(i, z, permuted_ids, weights_i, scaling):  # noqa: ARG001 - Unused function argument: `scaling`
     zx = z[:, 0]
     zy = z[:, 1]
@@ -297,10 +334,21 @@ def _ljc_bv_case1(i, z, permuted_ids, weights_i, scaling):  # noqa: ARG001 - Unu
     return zx[i] * (zyrand @ other_weights)
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _ljc_bv_case2(i, z, permuted_ids, weights_i, scaling):  # noqa: ARG001 - Unused function argument: `scaling`
     zy = z[:, 1]
     other_weights = weights_i[1:]
     zxi, zxrand, zyi, zyrand = _prepare_bivariate(i, z, permuted_ids, other_weights)
     zf = zxrand * zyrand
     return zy[i] * (zf @ other_weights)
+
+
+@_register_block(_ljc_bv_case1)
+def _ljc_bv_case1_block(i, z, zrand, weights, segments, self_weights, scaling):  # noqa: ARG001 - Unused function argument: `self_weights`, `scaling`
+    return z[i, 0][:, None] * _block_lag(zrand[:, 1], weights, segments, len(i))
+
+
+@_register_block(_ljc_bv_case2)
+def _ljc_bv_case2_block(i, z, zrand, weights, segments, self_weights, scaling):  # noqa: ARG001 - Unused function argument: `self_weights`, `scaling`
+    zf = zrand[:, 0] * zrand[:, 1]
+    return z[i, 1][:, None] * _block_lag(zf, weights, segments, len(i))
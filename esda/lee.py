@@ -1,16 +1,24 @@
 import numpy
+from libpysal.weights import WSP
 from scipy import sparse
 from sklearn import preprocessing, utils
 from sklearn.base import BaseEstimator
 
-from .crand import _prepare_bivariate
+from .crand import (
+    _BLOCK_ELEMENTS,
+    _block_lag,
+    _prepare_bivariate,
+    _register_block,
+    total_crand,
+)
+from .crand import crand as _crand_plus
 from .crand import njit as _njit
 
 
 class Spatial_Pearson(BaseEstimator):
     """Global Spatial Pearson Statistic"""
 
-    def __init__(self, connectivity=None, permutations=999):
+    def __init__(self, connectivity=None, permutations=999, n_jobs=1, seed=None):
         """
         Initialize a spatial pearson estimator
 
@@ -22,6 +30,12 @@ class Spatial_Pearson(BaseEstimator):
         permutations:   int
                         the number of permutations to conduct for inference.
                         if < 1, no permutational inference will be conducted.
+        n_jobs:         int
+                        the number of threads simulating blocks of permutations
+                        at once. If -1, all available cores are used.
+        seed:           None | int
+                        seed of the permutations. If None (default), they are
+                        drawn from the global numpy random state.
 
         Attributes
         ----------
@@ -40,6 +54,8 @@ class Spatial_Pearson(BaseEstimator):
         """
         self.connectivity = connectivity
         self.permutations = permutations
+        self.n_jobs = n_jobs
+        self.seed = seed
 
     def fit(self, x, y):
         """
@@ -73,20 +89,35 @@ class Spatial_Pearson(BaseEstimator):
         )
         if self.connectivity is None:
             self.connectivity = sparse.eye(Z.shape[0])
-        self.association_ = self._statistic(Z, self.connectivity)
+        # the smoothing operator does not change across permutations
+        W = self.connectivity
+        self._ctc = W.T @ W
+        self._ctc_total = self._ctc.sum()
+        self.association_ = self._quadratic_form(Z[None], self._ctc)[0]
+        self.association_ /= self._ctc_total
 
         if self.permutations is None or self.permutations < 1:
             return self
 
         if self.permutations:
-            simulations = [
-                self._statistic(numpy.random.permutation(Z), self.connectivity)
-                for _ in range(self.permutations)
-            ]
-            self.reference_distribution_ = simulations = numpy.array(simulations)
-            above = simulations >= self.association_
-            larger = above.sum(axis=0)
-            extreme = numpy.minimum(self.permutations - larger, larger)
+            n, k = Z.shape
+            # each permutation smooths all k columns at once
+            simulations = total_crand(
+                lambda ids: self._quadratic_form(Z[ids], self._ctc) / self._ctc_total,
+                n,
+                self.permutations,
+                seed=self.seed,
+                n_jobs=self.n_jobs,
+                batch_size=max(_BLOCK_ELEMENTS // (n * k), 1),
+            )
+            self.reference_distribution_ = simulations
+            # simulations within rounding of the observed value are ties, and
+            # count towards both tails, since the batched quadratic forms do
+            # not sum in the same order as the observed one
+            ties = numpy.isclose(simulations, self.association_, rtol=1e-10, atol=1e-12)
+            larger = ((simulations > self.association_) | ties).sum(axis=0)
+            smaller = ((simulations < self.association_) | ties).sum(axis=0)
+            extreme = numpy.minimum(larger, smaller)
             self.significance_ = (extreme + 1.0) / (self.permutations + 1.0)
         return self
 
@@ -96,11 +127,30 @@ class Spatial_Pearson(BaseEstimator):
         ones = numpy.ones(ctc.shape[0])
         return (Z.T @ ctc @ Z) / (ones.T @ ctc @ ones)
 
+    @staticmethod
+    def _quadratic_form(Z, ctc):
+        """
+        Z_b^T (V^TV) Z_b for each (n, k) block Z_b of a (B, n, k) array,
+        from a single sparse-dense product
+        """
+        B, n, k = Z.shape
+        columns = Z.transpose(1, 0, 2).reshape(n, B * k)
+        smoothed = numpy.asarray(ctc @ columns).reshape(n, B, k)
+        return numpy.einsum("bni,nbj->bij", Z, smoothed)
+
 
 class Spatial_Pearson_Local(BaseEstimator):
     """Local Spatial Pearson Statistic"""
 
-    def __init__(self, connectivity=None, permutations=999):
+    def __init__(
+        self,
+        connectivity=None,
+        permutations=999,
+        n_jobs=1,
+        keep_simulations=True,
+        seed=None,
+        alternative="directed",
+    ):
         """
         Initialize a spatial local pearson estimator
 
@@ -112,10 +162,20 @@ class Spatial_Pearson_Local(BaseEstimator):
         permutations:   int
                         the number of permutations to conduct for inference.
                         if < 1, no permutational inference will be conducted.
-        significance_: numpy.ndarray (2,2)
-                       permutation-based p-values for the fraction of times the
-                       observed correlation was more extreme than the simulated
-                       correlations.
+        n_jobs:         int
+                        Number of cores to be used in the conditional
+                        randomisation. If -1, all available cores are used.
+        keep_simulations: bool
+                        If True (default), reference_distribution_ keeps every
+                        simulated value; otherwise it is None.
+        seed:           None | int
+                        Seed to ensure reproducibility of conditional
+                        randomizations. See ``crand.crand()``.
+        alternative:    str
+                        The alternative hypothesis for conditional
+                        randomization. Defaults to "directed", the pseudo
+                        p-value of earlier releases. See ``crand.crand()`` for
+                        complete description.
         Attributes
         ----------
         associations_: numpy.ndarray (n_samples,)
@@ -138,6 +198,10 @@ class Spatial_Pearson_Local(BaseEstimator):
         """
         self.connectivity = connectivity
         self.permutations = permutations
+        self.n_jobs = n_jobs
+        self.keep_simulations = keep_simulations
+        self.seed = seed
+        self.alternative = alternative
 
     def fit(self, x, y):
         """
@@ -186,49 +250,31 @@ class Spatial_Pearson_Local(BaseEstimator):
 
         Z = numpy.column_stack((x, y))
 
-        standard_connectivity = sparse.csc_matrix(
-            self.connectivity / self.connectivity.sum(axis=1).reshape(-1, 1)
-        )
-
-        n, _ = x.shape
+        # row-standardize without densifying, islands keep empty rows
+        connectivity = sparse.csr_matrix(self.connectivity)
+        with numpy.errstate(divide="ignore"):
+            inverse_sums = 1 / numpy.asarray(connectivity.sum(axis=1)).flatten()
+        standard_connectivity = sparse.diags(inverse_sums) @ connectivity
 
         self.associations_ = self._statistic(Z, standard_connectivity)
 
         if self.permutations:
-            self.reference_distribution_ = numpy.empty((n, self.permutations))
-            max_neighbors = (standard_connectivity != 0).sum(axis=1).max()
-            random_ids = numpy.array(
-                [
-                    numpy.random.permutation(n - 1)[0 : max_neighbors + 1]
-                    for i in range(self.permutations)
-                ]
+            self.significance_, rlocals = _crand_plus(
+                Z,
+                WSP(standard_connectivity),
+                self.associations_,
+                self.permutations,
+                self.keep_simulations,
+                n_jobs=self.n_jobs,
+                stat_func=_local_spatial_pearson_crand,
+                scaling=1.0,
+                seed=self.seed,
+                alternative=self.alternative,
             )
-            ids = numpy.arange(n)
-
-            for i in range(n):
-                row = standard_connectivity[i]
-                weight = numpy.asarray(row[row.nonzero()]).reshape(-1, 1)
-                cardinality = row.nonzero()[0].shape[0]
-
-                ids_not_i = ids[ids != i]
-                numpy.random.shuffle(ids_not_i)
-                randomizer = random_ids[:, 0:cardinality]
-                random_neighbors = ids_not_i[randomizer]
-
-                random_neighbor_x = x[random_neighbors]
-                random_neighbor_y = y[random_neighbors]
-
-                self.reference_distribution_[i] = (
-                    (weight * random_neighbor_y).sum(axis=1) - y.mean()
-                ).squeeze()
-                self.reference_distribution_[i] *= (
-                    (weight * random_neighbor_x).sum(axis=1) - x.mean()
-                ).squeeze()
-            above = self.reference_distribution_ >= self.associations_.reshape(-1, 1)
-            larger = above.sum(axis=1)
-            extreme = numpy.minimum(larger, self.permutations - larger)
-            self.significance_ = (extreme + 1.0) / (self.permutations + 1.0)
-            self.reference_distribution_ = self.reference_distribution_.T
+            if self.keep_simulations:
+                self.reference_distribution_ = rlocals.T
+            else:
+                self.reference_distribution_ = None
         else:
             self.reference_distribution_ = None
         return self
@@ -243,7 +289,20 @@ class Spatial_Pearson_Local(BaseEstimator):
 # --------------------------------------------------------------
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _local_spatial_pearson_crand(i, z, permuted_ids, weights_i, scaling):
-    zxi, zxrand, zyi, zyrand = _prepare_bivariate(i, z, permuted_ids, weights_i)
-    return (zyrand @ weights_i) * (zxrand @ weights_i) * scaling
+    self_weight = weights_i[0]
+    other_weights = weights_i[1:]
+    zxi, zxrand, zyi, zyrand = _prepare_bivariate(i, z, permuted_ids, other_weights)
+    zx_lag = zxrand @ other_weights + self_weight * zxi
+    zy_lag = zyrand @ other_weights + self_weight * zyi
+    return zy_lag * zx_lag * scaling
+
+
+@_register_block(_local_spatial_pearson_crand)
+def _local_spatial_pearson_block(i, z, zrand, weights, segments, self_weights, scaling):
+    zx_lag = _block_lag(zrand[:, 0], weights, segments, len(i))
+    zy_lag = _block_lag(zrand[:, 1], weights, segments, len(i))
+    zx_lag += self_weights[:, None] * z[i, 0][:, None]
+    zy_lag += self_weights[:, None] * z[i, 1][:, None]
+    return zy_lag * zx_lag * scaling
@@ -9,6 +9,8 @@ __author__ = (
     "Levi John Wolf <levi.john.wolf@gmail.com>"
 )
 
+import os
+from collections.abc import Mapping
 from warnings import simplefilter, warn
 
 import numpy as np
@@ -18,7 +20,15 @@ from libpysal.weights import W
 from libpysal.weights.spatial_lag import lag_spatial
 from scipy import sparse
 
-from .crand import _prepare_univariate
+from .crand import (
+    _BLOCK_ELEMENTS,
+    _block_lag,
+    _prepare_columns,
+    _prepare_univariate,
+    _register_block,
+    _simulation_summary,
+    total_crand,
+)
 from .crand import crand as _crand_plus
 from .crand import njit as _njit
 from .smoothing import assuncao_rate
@@ -78,6 +88,12 @@ class Moran:
     two_tailed      : boolean
                       If True (default) analytical p-values for Moran are two
                       tailed, otherwise if False, they are one-tailed.
+    n_jobs          : int
+                      number of threads simulating blocks of permutations at
+                      once. If -1, all available cores are used.
+    seed            : None | int
+                      seed of the permutations. If None (default), they are
+                      drawn from the global numpy random state.
 
     Attributes
     ----------
@@ -179,7 +195,14 @@ class Moran:
     """  # noqa: E501
 
     def __init__(
-        self, y, w, transformation="r", permutations=PERMUTATIONS, two_tailed=True
+        self,
+        y,
+        w,
+        transformation="r",
+        permutations=PERMUTATIONS,
+        two_tailed=True,
+        n_jobs=1,
+        seed=None,
     ):
         y = np.asarray(y).flatten()
         self.y = y
@@ -203,10 +226,9 @@ class Moran:
             self.p_rand *= 2.0
 
         if permutations:
-            sim = [
-                self.__calc(np.random.permutation(self.z)) for i in range(permutations)
-            ]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = total_crand(
+                self.__calc_block, self.n, permutations, seed=seed, n_jobs=n_jobs
+            )
             above = sim >= self.I
             larger = above.sum()
             if (self.permutations - larger) < larger:
@@ -269,6 +291,13 @@ class Moran:
         s0 = self.w.s0 if isinstance(self.w, W) else self.summary.s0
         return self.n / s0 * inum / self.z2ss
 
+    def __calc_block(self, ids):
+        # one permutation of z per column, lagged by a single sparse product
+        z = self.z[ids.T]
+        inum = np.einsum("ij,ij->j", z, self.w.sparse @ z)
+        s0 = self.w.s0 if isinstance(self.w, W) else self.summary.s0
+        return self.n / s0 * inum / self.z2ss
+
     @property
     def _statistic(self):
         """More consistent hidden attribute to access ESDA statistics"""
@@ -435,6 +464,12 @@ class Moran_BV:
     permutations    : int
                       number of random permutations for calculation of pseudo
                       p_values
+    n_jobs          : int
+                      number of threads simulating blocks of permutations at
+                      once. If -1, all available cores are used.
+    seed            : None | int
+                      seed of the permutations. If None (default), they are
+                      drawn from the global numpy random state.
 
     Attributes
     ----------
@@ -514,7 +549,16 @@ class Moran_BV:
     np.float64(0.001)
     """  # noqa: E501
 
-    def __init__(self, x, y, w, transformation="r", permutations=PERMUTATIONS):
+    def __init__(
+        self,
+        x,
+        y,
+        w,
+        transformation="r",
+        permutations=PERMUTATIONS,
+        n_jobs=1,
+        seed=None,
+    ):
         x = np.asarray(x).flatten()
         y = np.asarray(y).flatten()
         zy = (y - y.mean()) / y.std(ddof=1)
@@ -529,9 +573,9 @@ class Moran_BV:
         self.w = w
         self.I = self.__calc(zy)
         if permutations:
-            nrp = np.random.permutation
-            sim = [self.__calc(nrp(zy)) for i in range(permutations)]
-            self.sim = sim = np.array(sim)
+            self.sim = sim = total_crand(
+                self.__calc_block, n, permutations, seed=seed, n_jobs=n_jobs
+            )
             above = sim >= self.I
             larger = above.sum()
             if (permutations - larger) < larger:
@@ -552,6 +596,10 @@ class Moran_BV:
         self.num = (self.zx * wzy).sum()
         return self.num / self.den
 
+    def __calc_block(self, ids):
+        # one permutation of zy per column, lagged by a single sparse product
+        return self.zx @ (self.w.sparse @ self.zy[ids.T]) / self.den
+
     @property
     def _statistic(self):
         """More consistent hidden attribute to access ESDA statistics"""
@@ -695,11 +743,14 @@ class Moran_BV:
         )
 
 
-def Moran_BV_matrix(variables, w, permutations=0, varnames=None):
+def Moran_BV_matrix(variables, w, permutations=0, varnames=None, n_jobs=1, seed=None):
     """
     Bivariate Moran Matrix
 
-    Calculates bivariate Moran between all pairs of a set of variables.
+    Calculates bivariate Moran between all pairs of a set of variables, from a
+    single sparse product of the weights with all standardized variables.
+    Permutations shuffle all variables at once, so that every draw simulates
+    the whole matrix.
 
     Parameters
     ----------
@@ -715,11 +766,23 @@ def Moran_BV_matrix(variables, w, permutations=0, varnames=None):
                    in `splot` or `.plot()`. Default =None.
                    Note: If variables is a `pandas.DataFrame` varnames
                    will automatically be generated
+    n_jobs       : int
+                   number of threads simulating blocks of permutations at
+                   once. If -1, all available cores are used.
+    seed         : None | int
+                   seed of the permutations. If None (default), they are
+                   drawn from the global numpy random state.
+
     Returns
     -------
-    results      : dictionary
+    results      : mapping
                    (i,  j) is the key for the pair of variables, values are
-                   the Moran_BV objects.
+                   the Moran_BV objects, built when they are first accessed.
+                   The (k, k) arrays of all pairs are available as the I,
+                   p_sim, EI_sim, VI_sim, seI_sim, z_sim and p_z_sim
+                   attributes of `results`, and the (permutations, k, k)
+                   simulations as its sim attribute. Their diagonal holds
+                   each variable against its own spatial lag.
 
     Examples
     --------
@@ -765,12 +828,19 @@ def Moran_BV_matrix(variables, w, permutations=0, varnames=None):
         variables_n = variables
 
     results = _Moran_BV_Matrix_array(
-        variables=variables_n, w=w, permutations=permutations, varnames=varnames
+        variables=variables_n,
+        w=w,
+        permutations=permutations,
+        varnames=varnames,
+        n_jobs=n_jobs,
+        seed=seed,
     )
     return results
 
 
-def _Moran_BV_Matrix_array(variables, w, permutations=0, varnames=None):
+def _Moran_BV_Matrix_array(
+    variables, w, permutations=0, varnames=None, n_jobs=1, seed=None
+):
     """
     Base calculation for MORAN_BV_Matrix
     """
@@ -778,18 +848,90 @@ def _Moran_BV_Matrix_array(variables, w, permutations=0, varnames=None):
     k = len(variables)
     if varnames is None:
         varnames = [f"x{i}" for i in range(k)]
+    return _MoranBVMatrix(variables, w, permutations, varnames, n_jobs, seed)
 
-    rk = list(range(0, k - 1))
-    results = {}
-    for i in rk:
-        for j in range(i + 1, k):
-            y1 = variables[i]
-            y2 = variables[j]
-            results[i, j] = Moran_BV(y1, y2, w, permutations=permutations)
-            results[j, i] = Moran_BV(y2, y1, w, permutations=permutations)
-            results[i, j].varnames = {"x": varnames[i], "y": varnames[j]}
-            results[j, i].varnames = {"x": varnames[j], "y": varnames[i]}
-    return results
+
+class _MoranBVMatrix(Mapping):
+    """
+    Bivariate Moran's I of all pairs of k variables, as (k, k) arrays, that
+    builds the Moran_BV object of a pair (i, j) when it is first accessed
+    """
+
+    def __init__(self, variables, w, permutations, varnames, n_jobs, seed):
+        X = np.column_stack([np.asarray(x).flatten() for x in variables])
+        n, k = X.shape
+        self.X = X
+        self.Z = Z = (X - X.mean(axis=0)) / X.std(axis=0, ddof=1)
+        self.w = w = _transform(w, "r")
+        self.permutations = permutations
+        self.varnames = varnames
+        self.den = n - 1.0  # zx'zx = zy'zy = n-1
+        self.num = Z.T @ (w.sparse @ Z)
+        self.I = self.num / self.den
+        self._pairs = {}
+        if permutations:
+            self.sim = sim = total_crand(
+                self.__calc_block,
+                n,
+                permutations,
+                seed=seed,
+                n_jobs=n_jobs,
+                batch_size=max(_BLOCK_ELEMENTS // (n * k), 1),
+            )
+            larger = (sim >= self.I).sum(axis=0)
+            low_extreme = (permutations - larger) < larger
+            larger[low_extreme] = permutations - larger[low_extreme]
+            self.p_sim = (larger + 1.0) / (permutations + 1.0)
+            self.EI_sim = sim.sum(axis=0) / permutations
+            self.seI_sim = sim.std(axis=0)
+            self.VI_sim = self.seI_sim**2
+            with np.errstate(divide="ignore"):
+                self.z_sim = (self.I - self.EI_sim) / self.seI_sim
+            self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
+
+    def __calc_block(self, ids):
+        # all variables permuted together, one draw per block of k columns
+        n, k = self.Z.shape
+        lag = self.w.sparse @ self.Z[ids.T].reshape(n, -1)
+        return np.einsum("ni,nbj->bij", self.Z, lag.reshape(n, -1, k)) / self.den
+
+    def __getitem__(self, key):
+        i, j = key
+        k = self.Z.shape[1]
+        if i == j or not (0 <= i < k and 0 <= j < k):
+            raise KeyError(key)
+        if key not in self._pairs:
+            self._pairs[key] = self.__pair(i, j)
+        return self._pairs[key]
+
+    def __iter__(self):
+        k = self.Z.shape[1]
+        for i in range(k - 1):
+            for j in range(i + 1, k):
+                yield (i, j)
+                yield (j, i)
+
+    def __len__(self):
+        k = self.Z.shape[1]
+        return k * (k - 1)
+
+    def __pair(self, i, j):
+        """Moran_BV of variable i against the spatial lag of variable j"""
+        pair = Moran_BV.__new__(Moran_BV)
+        pair.x = self.X[:, i]
+        pair.y = self.X[:, j]
+        pair.zx = self.Z[:, i]
+        pair.zy = self.Z[:, j]
+        pair.den = self.den
+        pair.w = self.w
+        pair.num = self.num[i, j]
+        pair.I = self.I[i, j]
+        if self.permutations:
+            pair.sim = self.sim[:, i, j]
+            for name in ("p_sim", "EI_sim", "seI_sim", "VI_sim", "z_sim", "p_z_sim"):
+                setattr(pair, name, getattr(self, name)[i, j])
+        pair.varnames = {"x": self.varnames[i], "y": self.varnames[j]}
+        return pair
 
 
 def plot_moran_facet(
@@ -932,6 +1074,12 @@ class Moran_Rate(Moran):
     permutations    : int
                       number of random permutations for calculation of pseudo
                       p_values
+    n_jobs          : int
+                      number of threads simulating blocks of permutations at
+                      once. If -1, all available cores are used.
+    seed            : None | int
+                      seed of the permutations. If None (default), they are
+                      drawn from the global numpy random state.
 
     Attributes
     ----------
@@ -1018,6 +1166,8 @@ class Moran_Rate(Moran):
         transformation="r",
         permutations=PERMUTATIONS,
         two_tailed=True,
+        n_jobs=1,
+        seed=None,
     ):
         e = np.asarray(e).flatten()
         b = np.asarray(b).flatten()
@@ -1029,6 +1179,8 @@ class Moran_Rate(Moran):
             transformation=transformation,
             permutations=permutations,
             two_tailed=two_tailed,
+            n_jobs=n_jobs,
+            seed=seed,
         )
 
     @classmethod
@@ -1183,7 +1335,8 @@ class Moran_Local:
         (default=True)
         If True, the entire matrix of replications under the null
         is stored in memory and accessible; otherwise, replications
-        are not saved
+        are not saved, but their mean and variance at each site are
+        still available through EI_sim and VI_sim
     seed : None/int
            Seed to ensure reproducibility of conditional randomizations.
            Must be set here, and not outside of the function, since numba
@@ -1193,6 +1346,40 @@ class Moran_Local:
         value to use as a weight for the "fake" neighbor for every island.
         If numpy.nan, will propagate to the final local statistic depending
         on the `stat_func`. If 0, then the lag is always zero for islands.
+    early_stopping : None | int = None
+        If an integer h, a site stops being simulated once h of its simulated
+        values are as extreme as the observed one, and its p-value is estimated
+        sequentially :cite:`besag1991sequential`. This greatly reduces the cost
+        of inference when most sites are clearly not significant.
+        See ``crand.crand()`` for complete description.
+    plan : None | CrandPlan = None
+        Prepared weights and permutation table from ``crand.CrandPlan``, to
+        reuse across statistics over the same weights. It must match the
+        transformed weights and `permutations`, and its seed is used instead
+        of `seed`. See ``crand.crand()`` for complete description.
+    dtype : None | numpy.dtype = None
+        Floating point type of the conditional randomization, e.g.
+        ``numpy.float32`` to halve the memory traffic of the simulations and
+        the size of `rlisas`. Local statistics and their moments are still
+        computed in float64. See ``crand.crand()`` for complete description.
+    simulations_path : None | str | os.PathLike = None
+        If given, `rlisas` is written to a .npy file at this path while it is
+        simulated, and kept on disk as a read-only memmap rather than in
+        memory, so that `sim` is only read when accessed, and EI_sim and
+        VI_sim are computed block by block. Only used if keep_simulations is
+        True. See ``crand.crand()`` for complete description.
+    inference : str = "permutation"
+        How to test the local statistics. ``"permutation"`` runs the
+        conditional randomization. ``"analytic"`` skips it, and only provides
+        z_c and p_z_c, the normal approximation under conditional
+        randomization, at the cost of a sparse product. This is cheap enough
+        to screen very large maps for candidate sites before simulating.
+    sites : None | array = None
+        Sites to run the conditional randomization for, as a boolean mask or
+        an array of positions, e.g. those where p_z_c from
+        ``inference="analytic"`` is small. Other sites get NaN p_sim, EI_sim,
+        VI_sim and simulations, and zero n_draws. Random neighbors are still
+        drawn from all sites. See ``crand.crand()`` for complete description.
 
     Attributes
     ----------
@@ -1246,6 +1433,13 @@ class Moran_Local:
         from :cite:`sokal1998local`. Varies strongly by site, since
         it conditions on z_i. We recommend using VI_sim, not VIc,
         for analysis. This VIc is only provided for reproducibility.
+    z_c : array
+        standardized Is under conditional randomization, using the
+        analytical moments EIc and VIc
+    p_z_c : array
+        p-values based on the standard normal approximation of z_c
+        (one-sided). For two-sided tests, these values should be
+        multiplied by 2
     seI_sim : array
         (if permutations>0)
         standard deviations of Is under permutations.
@@ -1264,7 +1458,8 @@ class Moran_Local:
         (default=True)
         If True, the entire matrix of replications under the null
         is stored in memory and accessible; otherwise, replications
-        are not saved
+        are not saved, but their mean and variance at each site are
+        still available through EI_sim and VI_sim
     seed : None/int
         Seed to ensure reproducibility of conditional randomizations.
         Must be set here, and not outside of the function, since numba does
@@ -1272,6 +1467,10 @@ class Moran_Local:
     alternative : None | str = None
         The alternative hypothesis for conditional randomization.
         See ``crand.crand()`` for complete description.
+    n_draws : array
+        (if permutations>0)
+        number of simulated values drawn at each site. Equal to
+        permutations unless early_stopping is set.
 
     Notes
     -----
@@ -1324,7 +1523,18 @@ class Moran_Local:
         seed=None,
         island_weight=0,  # noqa: ARG002 - Unused method argument: `island_weight`
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        dtype=None,
+        simulations_path=None,
+        inference="permutation",
+        sites=None,
     ):
+        if inference not in ("permutation", "analytic"):
+            raise ValueError(
+                f"inference='{inference}' provided, but is not one of the"
+                " supported options: 'permutation', 'analytic'"
+            )
         y = np.asarray(y).flatten()
         self.y = y
         n = len(y)
@@ -1350,8 +1560,13 @@ class Moran_Local:
         self.quads = quads
         self.__quads()
         self.__moments()
-        if permutations:
-            self.p_sim, self.rlisas = _crand_plus(
+        # EIc and VIc are the moments of z_i / m2 * sum_j w_ij z_j, which is
+        # n / (n - 1) times Is
+        with np.errstate(divide="ignore", invalid="ignore"):
+            self.z_c = (self.Is * n / self.n_1 - self.EIc) / np.sqrt(self.VIc)
+        self.p_z_c = stats.norm.sf(np.abs(self.z_c))
+        if permutations and inference == "permutation":
+            self.p_sim, self.rlisas, sim_moments = _crand_plus(
                 z,
                 w,
                 self.Is,
@@ -1361,29 +1576,126 @@ class Moran_Local:
                 stat_func=_moran_local_crand,
                 seed=seed,
                 alternative=alternative,
+                moments=True,
+                early_stopping=early_stopping,
+                plan=plan,
+                dtype=dtype,
+                simulations_path=simulations_path if keep_simulations else None,
+                sites=sites,
             )
-            self.sim = np.transpose(self.rlisas)
-            if keep_simulations:
-                sim = np.transpose(self.rlisas)
-                above = sim >= self.Is
-                larger = above.sum(0)
-                low_extreme = (self.permutations - larger) < larger
-                larger[low_extreme] = self.permutations - larger[low_extreme]
-                self.p_sim = (larger + 1.0) / (permutations + 1.0)
-                self.sim = sim
-                self.EI_sim = self.sim.mean(axis=0)
-                self.seI_sim = self.sim.std(axis=0)
-                self.VI_sim = self.seI_sim * self.seI_sim
-                with np.errstate(divide="ignore"):
-                    self.z_sim = (self.Is - self.EI_sim) / self.seI_sim
-                self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
-            else:
+            self.__simulations(sim_moments, keep_simulations, early_stopping)
+
+    def __simulations(self, sim_moments, keep_simulations, early_stopping):
+        permutations = self.permutations
+        self.n_draws = sim_moments[:, 2].astype(int)
+        self.sim = np.transpose(self.rlisas)
+        if keep_simulations and early_stopping is None:
+            larger, self.EI_sim, self.seI_sim = _simulation_summary(
+                self.rlisas, self.Is
+            )
+            low_extreme = (self.permutations - larger) < larger
+            larger[low_extreme] = self.permutations - larger[low_extreme]
+            # sites that were not simulated keep their NaN p-value
+            self.p_sim = np.where(
+                self.n_draws > 0, (larger + 1.0) / (permutations + 1.0), np.nan
+            )
+            self.VI_sim = self.seI_sim * self.seI_sim
+        else:
+            if not keep_simulations:
                 self.sim = self.rlisas = None
-                self.EI_sim = np.nan
-                self.seI_sim = np.nan
-                self.VI_sim = np.nan
-                self.z_sim = np.nan
-                self.p_z_sim = np.nan
+            self.EI_sim = sim_moments[:, 0]
+            self.VI_sim = sim_moments[:, 1]
+            self.seI_sim = np.sqrt(self.VI_sim)
+        with np.errstate(divide="ignore"):
+            self.z_sim = (self.Is - self.EI_sim) / self.seI_sim
+        self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
+
+    @classmethod
+    def _from_columns(
+        cls,
+        Y,
+        w,
+        permutations=PERMUTATIONS,
+        n_jobs=1,
+        keep_simulations=True,
+        seed=None,
+        alternative=None,
+        early_stopping=None,
+        plan=None,
+        dtype=None,
+        simulations_path=None,
+        inference="permutation",
+        sites=None,
+        **kwargs,
+    ):
+        """
+        Compute a Moran_Local for every column of `Y`, randomizing all
+        columns together in a single conditional randomization pass.
+
+        Parameters
+        ----------
+        Y : numpy.ndarray
+            (n, k) array with one variable per column
+
+        All other parameters are as in Moran_Local. If there are no
+        permutations, early_stopping is set or inference is "analytic",
+        every column is computed on its own. If `simulations_path` is given,
+        the simulations of all columns are written to that single
+        (n, k, permutations) file, or to one file per column, with the
+        column number appended to its name, if every column is computed on
+        its own.
+
+        Returns
+        -------
+        list of k Moran_Local objects, matching those computed one column
+        at a time with the same `seed`.
+        """
+        kws = dict(
+            permutations=permutations,
+            n_jobs=n_jobs,
+            keep_simulations=keep_simulations,
+            seed=seed,
+            alternative=alternative,
+            early_stopping=early_stopping,
+            plan=plan,
+            dtype=dtype,
+            inference=inference,
+            sites=sites,
+        )
+        Y = np.asarray(Y)
+        together = inference == "permutation" and early_stopping is None
+        if not permutations or not together:
+            if simulations_path is not None:
+                # one file per column, next to the requested one
+                root, ext = os.path.splitext(os.fspath(simulations_path))
+                return [
+                    cls(y, w, simulations_path=f"{root}_{j}{ext}", **kws, **kwargs)
+                    for j, y in enumerate(Y.T)
+                ]
+            return [cls(y, w, **kws, **kwargs) for y in Y.T]
+        lisas = [cls(y, w, permutations=0, **kwargs) for y in Y.T]
+        p_sims, rlisas, sim_moments = _crand_plus(
+            np.column_stack([lisa.z for lisa in lisas]),
+            lisas[0].w,
+            np.column_stack([lisa.Is for lisa in lisas]),
+            permutations,
+            keep_simulations,
+            n_jobs=n_jobs,
+            stat_func=_moran_local_columns_crand,
+            seed=seed,
+            alternative=alternative,
+            moments=True,
+            plan=plan,
+            dtype=dtype,
+            simulations_path=simulations_path if keep_simulations else None,
+            sites=sites,
+        )
+        for j, lisa in enumerate(lisas):
+            lisa.permutations = permutations
+            lisa.p_sim = p_sims[:, j]
+            lisa.rlisas = rlisas[:, j] if keep_simulations else rlisas[:, 0]
+            lisa.__simulations(sim_moments[:, j], keep_simulations, None)
+        return lisas
 
     def __calc(self, w, z):
         zl = _slag(w, z)
@@ -1505,6 +1817,7 @@ class Moran_Local:
             outvals=outvals,
             stat=cls,
             swapname=cls.__name__.lower(),
+            batch_stat=cls._from_columns,
             **stat_kws,
         )
 
@@ -1712,7 +2025,8 @@ class Moran_Local_BV:
         (default=True)
         If True, the entire matrix of replications under the null
         is stored in memory and accessible; otherwise, replications
-        are not saved
+        are not saved, but their mean and variance at each site are
+        still available through EI_sim and VI_sim
     seed : None/int
         Seed to ensure reproducibility of conditional randomizations.
         Must be set here, and not outside of the function, since numba
@@ -1725,6 +2039,24 @@ class Moran_Local_BV:
     alternative : None | str = None
         The alternative hypothesis for conditional randomization.
         See ``crand.crand()`` for complete description.
+    early_stopping : None | int = None
+        If an integer h, a site stops being simulated once h of its simulated
+        values are as extreme as the observed one, and its p-value is estimated
+        sequentially :cite:`besag1991sequential`. This greatly reduces the cost
+        of inference when most sites are clearly not significant.
+        See ``crand.crand()`` for complete description.
+    plan : None | CrandPlan = None
+        Prepared weights and permutation table from ``crand.CrandPlan``, to
+        reuse across statistics over the same weights. It must match the
+        transformed weights and `permutations`, and its seed is used instead
+        of `seed`. See ``crand.crand()`` for complete description.
+    simulations_path : None | str | os.PathLike = None
+        If given, `rlisas` is kept on disk in a .npy file at this path rather
+        than in memory. See ``Moran_Local`` for complete description.
+    sites : None | array = None
+        Sites to run the conditional randomization for, as a boolean mask or
+        an array of positions. Other sites get NaN results. See
+        ``Moran_Local`` for complete description.
 
     Attributes
     ----------
@@ -1767,6 +2099,10 @@ class Moran_Local_BV:
         p-values based on standard normal approximation from
         permutations (one-sided)
         for two-sided tests, these values should be multiplied by 2
+    n_draws : array
+        (if permutations>0)
+        number of simulated values drawn at each site. Equal to
+        permutations unless early_stopping is set.
 
     Examples
     --------
@@ -1819,6 +2155,10 @@ class Moran_Local_BV:
         seed=None,
         island_weight=0,  # noqa: ARG002 - Unused method argument: `island_weight`
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        simulations_path=None,
+        sites=None,
     ):
         x = np.asarray(x).flatten()
         y = np.asarray(y).flatten()
@@ -1852,7 +2192,7 @@ class Moran_Local_BV:
         self.quads = quads
         self.__quads()
         if permutations:
-            self.p_sim, self.rlisas = _crand_plus(
+            self.p_sim, self.rlisas, sim_moments = _crand_plus(
                 np.column_stack((zx, zy)),
                 w,
                 self.Is,
@@ -1862,22 +2202,34 @@ class Moran_Local_BV:
                 stat_func=_moran_local_bv_crand,
                 seed=seed,
                 alternative=alternative,
+                moments=True,
+                early_stopping=early_stopping,
+                plan=plan,
+                simulations_path=simulations_path if keep_simulations else None,
+                sites=sites,
             )
+            self.n_draws = sim_moments[:, 2].astype(int)
             self.sim = np.transpose(self.rlisas)
-            if keep_simulations:
-                sim = np.transpose(self.rlisas)
-                above = sim >= self.Is
-                larger = above.sum(0)
+            if keep_simulations and early_stopping is None:
+                larger, self.EI_sim, self.seI_sim = _simulation_summary(
+                    self.rlisas, self.Is
+                )
                 low_extreme = (self.permutations - larger) < larger
                 larger[low_extreme] = self.permutations - larger[low_extreme]
-                self.p_sim = (larger + 1.0) / (permutations + 1.0)
-                self.sim = sim
-                self.EI_sim = sim.mean(axis=0)
-                self.seI_sim = sim.std(axis=0)
+                # sites that were not simulated keep their NaN p-value
+                self.p_sim = np.where(
+                    self.n_draws > 0, (larger + 1.0) / (permutations + 1.0), np.nan
+                )
                 self.VI_sim = self.seI_sim * self.seI_sim
-                with np.errstate(divide="ignore"):
-                    self.z_sim = (self.Is - self.EI_sim) / self.seI_sim
-                self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
+            else:
+                if not keep_simulations:
+                    self.sim = self.rlisas = None
+                self.EI_sim = sim_moments[:, 0]
+                self.VI_sim = sim_moments[:, 1]
+                self.seI_sim = np.sqrt(self.VI_sim)
+            with np.errstate(divide="ignore"):
+                self.z_sim = (self.Is - self.EI_sim) / self.seI_sim
+            self.p_z_sim = stats.norm.sf(np.abs(self.z_sim))
 
     def __calc(self):
         zly = _slag(self.w, self.zy)
@@ -2180,7 +2532,8 @@ class Moran_Local_Rate(Moran_Local):
         (default=True)
         If True, the entire matrix of replications under the null
         is stored in memory and accessible; otherwise, replications
-        are not saved
+        are not saved, but their mean and variance at each site are
+        still available through EI_sim and VI_sim
     seed : None/int
         Seed to ensure reproducibility of conditional randomizations.
         Must be set here, and not outside of the function, since numba does not
@@ -2192,6 +2545,28 @@ class Moran_Local_Rate(Moran_Local):
     alternative : None | str = None
         The alternative hypothesis for conditional randomization.
         See ``crand.crand()`` for complete description.
+    early_stopping : None | int = None
+        If an integer h, a site stops being simulated once h of its simulated
+        values are as extreme as the observed one, and its p-value is estimated
+        sequentially :cite:`besag1991sequential`. This greatly reduces the cost
+        of inference when most sites are clearly not significant.
+        See ``crand.crand()`` for complete description.
+    plan : None | CrandPlan = None
+        Prepared weights and permutation table from ``crand.CrandPlan``, to
+        reuse across statistics over the same weights. It must match the
+        transformed weights and `permutations`, and its seed is used instead
+        of `seed`. See ``crand.crand()`` for complete description.
+    simulations_path : None | str | os.PathLike = None
+        If given, `rlisas` is kept on disk in a .npy file at this path rather
+        than in memory. See ``Moran_Local`` for complete description.
+    inference : str = "permutation"
+        ``"analytic"`` skips the conditional randomization and only provides
+        the normal approximation z_c and p_z_c. See ``Moran_Local`` for
+        complete description.
+    sites : None | array = None
+        Sites to run the conditional randomization for, as a boolean mask or
+        an array of positions. Other sites get NaN results. See
+        ``Moran_Local`` for complete description.
 
     Attributes
     ----------
@@ -2292,6 +2667,11 @@ class Moran_Local_Rate(Moran_Local):
         seed=None,
         island_weight=0,  # noqa: ARG002 - Unused method argument: `island_weight`
         alternative=None,
+        early_stopping=None,
+        plan=None,
+        simulations_path=None,
+        inference="permutation",
+        sites=None,
     ):
         e = np.asarray(e).flatten()
         b = np.asarray(b).flatten()
@@ -2307,6 +2687,11 @@ class Moran_Local_Rate(Moran_Local):
             keep_simulations=keep_simulations,
             seed=seed,
             alternative=alternative,
+            early_stopping=early_stopping,
+            plan=plan,
+            simulations_path=simulations_path,
+            inference=inference,
+            sites=sites,
         )
 
     @classmethod
@@ -2880,7 +3265,7 @@ def _wikh_fast(W, sokal_correction=False):
     )
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _wikh_numba(n, row, col, data, sokal_correction=False):
     """
     This is a fast implementation of the wi(kh) function from
@@ -2943,7 +3328,7 @@ def _wikh_slow(W, sokal_correction=False):
 # --------------------------------------------------------------
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _moran_local_bv_crand(i, z, permuted_ids, weights_i, scaling):
     self_weight = weights_i[0]
     other_weights = weights_i[1:]
@@ -2953,9 +3338,41 @@ def _moran_local_bv_crand(i, z, permuted_ids, weights_i, scaling):
     return zx[i] * (zyrand @ other_weights + self_weight * zyi) * scaling
 
 
-@_njit(fastmath=True)
+@_njit(cache=True, fastmath=True)
 def _moran_local_crand(i, z, permuted_ids, weights_i, scaling):
     self_weight = weights_i[0]
     other_weights = weights_i[1:]
     zi, zrand = _prepare_univariate(i, z, permuted_ids, other_weights)
     return zi * (zrand @ other_weights + self_weight * zi) * scaling
+
+
+@_njit(cache=True, fastmath=True)
+def _moran_local_columns_crand(i, z, permuted_ids, weights_i, scaling):
+    self_weight = weights_i[0]
+    other_weights = weights_i[1:]
+    zi, zrand = _prepare_columns(i, z, permuted_ids, other_weights)
+    lag = np.zeros((zrand.shape[0], zrand.shape[2]), dtype=zrand.dtype)
+    for j in range(other_weights.shape[0]):
+        lag += zrand[:, j] * other_weights[j]
+    return zi * (lag + self_weight * zi) * scaling
+
+
+@_register_block(_moran_local_bv_crand)
+def _moran_local_bv_block(i, z, zrand, weights, segments, self_weights, scaling):
+    zyi = z[i, 1][:, None]
+    lag = _block_lag(zrand[:, 1], weights, segments, len(i))
+    return z[i, 0][:, None] * (lag + self_weights[:, None] * zyi) * scaling
+
+
+@_register_block(_moran_local_crand)
+def _moran_local_block(i, z, zrand, weights, segments, self_weights, scaling):
+    zi = z[i][:, None]
+    lag = _block_lag(zrand, weights, segments, len(i))
+    return zi * (lag + self_weights[:, None] * zi) * scaling
+
+
+@_register_block(_moran_local_columns_crand)
+def _moran_local_columns_block(i, z, zrand, weights, segments, self_weights, scaling):
+    zi = z[i][:, None]
+    lag = _block_lag(zrand, weights, segments, len(i))
+    return zi * (lag + self_weights[:, None, None] * zi) * scaling
@@ -129,7 +129,7 @@ def get_angles(collection, return_indices=False):
         return angles
 
 
-@njit
+@njit(cache=True)
 def _get_angles(points, n_coords_per_geom):
     """
     Iterate over points in a set of geometries.
@@ -1059,7 +1059,7 @@ def _dump_rings(geoms):
             yield shapely.get_coordinates(interior)
 
 
-@njit
+@njit(cache=True)
 def _geometric_moments_ring(pts, shift_to_centroid=True):
     """
     Compute area, centroid, and second moments of a single polygon ring.
@@ -1,12 +1,16 @@
 import numpy as np
 
 try:
-    from numba import njit
+    from numba import njit, prange
 except (ImportError, ModuleNotFoundError):
     from libpysal.common import jit as njit
 
+    prange = range
 
-def calculate_significance(test_stat, reference_distribution, alternative="two-sided"):
+
+def calculate_significance(
+    test_stat, reference_distribution, alternative="two-sided", batch_size=None
+):
     """
     Calculate a pseudo p-value from a reference distribution.
 
@@ -38,6 +42,19 @@ def calculate_significance(test_stat, reference_distribution, alternative="two-s
             This is a directed alternative hypothesis, but the direction
             is chosen dependent on the data. This is not advised,
             and included solely to reproduce past results.
+    batch_size : None | int = None
+        Number of rows of `reference_distribution` to process at a time. Each
+        batch is copied into a contiguous array of the dtype of
+        `reference_distribution` (e.g. float32, which is not upcast), and its
+        rows are processed in parallel. Set this to bound memory use when
+        `reference_distribution` is a memory-mapped array. If None, all rows
+        are processed at once.
+
+    Returns
+    -------
+    p_value : float or numpy.ndarray
+        Pseudo p-value of the test statistic, or (n_samples,) array with the
+        pseudo p-value of every row of `reference_distribution`
 
     Notes
     -----
@@ -47,23 +64,98 @@ def calculate_significance(test_stat, reference_distribution, alternative="two-s
     """
     reference_distribution = np.atleast_2d(reference_distribution)
     n_samples, p_permutations = reference_distribution.shape
-    test_stat = np.atleast_2d(test_stat).reshape(n_samples, -1)
+    test_stat = np.asarray(test_stat, dtype=np.float64).reshape(n_samples)
     if alternative not in ("folded", "two-sided", "greater", "lesser", "directed"):
         raise ValueError(
             f"alternative='{alternative}' provided, but is not"
             " one of the supported options: 'two-sided', 'greater', "
             "'lesser', 'directed', 'folded')"
         )
-    result = _permutation_significance(
-        test_stat, reference_distribution, alternative=alternative
-    )
+    if batch_size is None:
+        batch_size = n_samples
+    result = np.empty((n_samples,))
+    for start in range(0, n_samples, batch_size):
+        stop = min(start + batch_size, n_samples)
+        result[start:stop] = _batched_significance(
+            test_stat[start:stop],
+            np.ascontiguousarray(reference_distribution[start:stop]),
+            alternative,
+        )
     if test_stat.size == 1:
         return result.item()
     else:
         return result
 
 
-@njit(parallel=False, fastmath=False)
+@njit(cache=True, parallel=True, fastmath=False)
+def _batched_significance(test_stat, reference_distribution, alternative):
+    """
+    Pseudo p-values of (n_samples,) `test_stat` against the rows of the
+    (n_samples, permutations) `reference_distribution`, computed row by row
+    across threads
+    """
+    n_samples = reference_distribution.shape[0]
+    p_value = np.empty((n_samples,))
+    for i in prange(n_samples):
+        p_value[i] = _row_significance(
+            test_stat[i], reference_distribution[i], alternative
+        )
+    return p_value
+
+
+@njit(cache=True, fastmath=False)
+def _row_significance(test_stat, reference, alternative):
+    """
+    Pseudo p-value of a single test statistic against its reference
+    distribution. Only temporaries of the size of one row are created, so the
+    full (n_samples, permutations) matrix is never traversed more than once.
+    """
+    p_permutations = reference.shape[0]
+    if alternative == "two-sided":
+        # find percentile p at which the test statistic sits
+        # find "synthetic" test statistic at 1-p
+        # count how many observations are outisde of (p, 1-p)
+        # including the test statistic and its synthetic pair
+        percentile = (reference <= test_stat).sum() / p_permutations * 100
+        p_low = min(percentile, 100 - percentile)
+        low = _percentile(reference, p_low)
+        high = _percentile(reference, 100 - p_low)
+        n_extreme = (reference <= low).sum() + (reference >= high).sum()
+    elif alternative == "folded":
+        mean = reference.mean()
+        n_extreme = (np.abs(reference - mean) >= abs(test_stat - mean)).sum()
+    elif alternative == "lesser":
+        n_extreme = (reference <= test_stat).sum()
+    elif alternative in ("greater", "directed"):
+        n_extreme = (reference >= test_stat).sum()
+        if alternative == "directed" and (p_permutations - n_extreme) < n_extreme:
+            n_extreme = p_permutations - n_extreme
+    else:
+        return np.nan
+    return (n_extreme + 1) / (p_permutations + 1)
+
+
+@njit(cache=True, fastmath=False)
+def _percentile(reference, q):
+    """
+    q-th percentile of `reference` with linear interpolation between the
+    closest ranks, as computed by numba's numpy.percentile, selecting the two
+    ranks with a partition rather than a full sort
+    """
+    if q == 0:
+        return reference.min()
+    if q == 100:
+        return reference.max()
+    rank = 1 + (reference.shape[0] - 1) * (q / 100.0)
+    f = int(np.floor(rank))
+    m = rank - f
+    partitioned = np.partition(reference, f - 1)
+    lower = partitioned[f - 1]
+    upper = partitioned[f:].min()
+    return lower * (1 - m) + upper * m
+
+
+@njit(cache=True, parallel=False, fastmath=False)
 def _permutation_significance(
     test_stat, reference_distribution, alternative="two-sided"
 ):
@@ -84,30 +176,13 @@ def _permutation_significance(
         p_value = (np.sum(reference_distribution >= test_stat, axis=1) + 1) / (
             p_permutations + 1
         )
-    elif alternative == "two-sided":
-        # find percentile p at which the test statistic sits
-        # find "synthetic" test statistic at 1-p
-        # count how many observations are outisde of (p, 1-p)
-        # including the test statistic and its synthetic pair
-        lows = np.empty(n_samples).astype(reference_distribution.dtype)
-        highs = np.empty(n_samples).astype(reference_distribution.dtype)
-        for i in range(n_samples):
-            percentile_i = (reference_distribution[i] <= test_stat[i]).mean() * 100
-            p_low = np.minimum(percentile_i, 100 - percentile_i)
-            lows[i] = np.percentile(reference_distribution[i], p_low)
-            highs[i] = np.percentile(reference_distribution[i], 100 - p_low)
-        n_outside = (reference_distribution <= lows[:, None]).sum(axis=1)
-        n_outside += (reference_distribution >= highs[:, None]).sum(axis=1)
-        p_value = (n_outside + 1) / (p_permutations + 1)
-    elif alternative == "folded":
-        means = np.empty((n_samples, 1)).astype(reference_distribution.dtype)
+    elif alternative in ("two-sided", "folded"):
+        test_stat = np.ravel(test_stat)
+        p_value = np.empty((n_samples,))
         for i in range(n_samples):
-            means[i] = reference_distribution[i].mean()
-        folded_test_stat = np.abs(test_stat - means)
-        folded_reference_distribution = np.abs(reference_distribution - means)
-        p_value = (
-            (folded_reference_distribution >= folded_test_stat).sum(axis=1) + 1
-        ) / (p_permutations + 1)
+            p_value[i] = _row_significance(
+                test_stat[i], reference_distribution[i], alternative
+            )
     else:
         p_value = np.ones((n_samples,)) * np.nan
     return p_value
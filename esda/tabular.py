@@ -18,6 +18,7 @@ def _univariate_handler(
     pvalue="sim",
     outvals=None,
     swapname="",
+    batch_stat=None,
     **kwargs,
 ):
     """
@@ -50,6 +51,12 @@ def _univariate_handler(
     swapname    : string
                   suffix to replace generic identifier with. Each caller of this
                   function should set this to a unique column suffix
+    batch_stat  : callable
+                  a function that takes a 2D array with one column per entry of
+                  `cols` and the same keyword arguments as `stat`, and returns
+                  one statistic object per column. If provided, it is used
+                  instead of calling `stat` column by column, so that the
+                  statistic can share work across columns
     **kwargs    : optional keyword arguments
                   options that are passed directly to the statistic
     """
@@ -65,6 +72,7 @@ def _univariate_handler(
             inplace=True,
             outvals=outvals,
             swapname=swapname,
+            batch_stat=batch_stat,
             **kwargs,
         )
         return new_df
@@ -104,7 +112,12 @@ def _univariate_handler(
     def column_stat(column):
         return stat(column.values, w=w, **kwargs)
 
-    stat_objs = df[cols].apply(column_stat)
+    if batch_stat is not None and kwargs.get("y") is None:
+        stat_objs = dict(
+            zip(cols, batch_stat(df[cols].to_numpy(), w=w, **kwargs), strict=True)
+        )
+    else:
+        stat_objs = df[cols].apply(column_stat)
 
     # Assign into dataframe
     for col in cols:
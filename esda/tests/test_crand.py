@@ -1,6 +1,29 @@
 import numpy as np
+import pytest
+from libpysal.weights import W, lat2W
 
-from esda.crand import vec_permutations
+from esda.crand import (
+    _PLAN_CACHE,
+    _PLANS_PER_WEIGHTS,
+    CrandPlan,
+    _chunk_starts,
+    _philox4x32,
+    _prepare_bivariate,
+    _prepare_univariate,
+    _simulation_summary,
+    _site_permutations,
+    crand,
+    vec_permutations,
+    warmup,
+)
+from esda.geary_local import _local_geary
+from esda.getisord import _g_local_star_crand
+from esda.moran import (
+    Moran_Local,
+    _moran_local_bv_crand,
+    _moran_local_columns_crand,
+    _moran_local_crand,
+)
 
 
 def test_vec_permutations_basic():
@@ -25,3 +48,476 @@ def test_vec_permutations_basic():
         ]
     )
     np.testing.assert_array_equal(result, expected)
+
+
+def test_prepare_univariate_matches_masked_sampling():
+    """Test that shifted ids gather the same values as masking out site i."""
+    z = np.random.default_rng(0).normal(size=24)
+    permuted_ids = vec_permutations(5, 24, 10, seed=12345)
+    weights_i = np.ones(4)
+    for i in (0, 7, 23):
+        zi, zrand = _prepare_univariate(i, z, permuted_ids, weights_i)
+        z_no_i = np.delete(z, i)
+        expected = z_no_i[permuted_ids[:, :4]]
+        assert zi == z[i]
+        np.testing.assert_array_equal(zrand, expected)
+
+
+def test_prepare_bivariate_keeps_column_order():
+    """Test that x is gathered from the first column and y from the second."""
+    rng = np.random.default_rng(0)
+    z = np.column_stack([rng.normal(size=24), rng.normal(size=24) + 10])
+    permuted_ids = vec_permutations(5, 24, 10, seed=12345)
+    weights_i = np.ones(4)
+    for i in (0, 7, 23):
+        zxi, zxrand, zyi, zyrand = _prepare_bivariate(i, z, permuted_ids, weights_i)
+        z_no_i = np.delete(z, i, axis=0)
+        assert zxi == z[i, 0] and zyi == z[i, 1]
+        np.testing.assert_array_equal(zxrand, z_no_i[permuted_ids[:, :4], 0])
+        np.testing.assert_array_equal(zyrand, z_no_i[permuted_ids[:, :4], 1])
+
+
+def test_threaded_backend_matches_serial():
+    """Test that the threaded backend reproduces the serial results."""
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(1).normal(size=36)
+    observed = z * (w.sparse @ z)
+    serial = crand(
+        z, w, observed, 49, True, 1, _moran_local_crand, seed=5, alternative="greater"
+    )
+    threaded = crand(
+        z,
+        w,
+        observed,
+        49,
+        True,
+        -1,
+        _moran_local_crand,
+        seed=5,
+        alternative="greater",
+        backend="threads",
+    )
+    np.testing.assert_array_equal(serial[0], threaded[0])
+    np.testing.assert_allclose(serial[1], threaded[1])
+
+
+def test_moments_without_keeping_simulations():
+    """Test that streamed moments match those of the kept simulations."""
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(2).normal(size=36)
+    observed = z * (w.sparse @ z)
+    p_keep, rlocals, _ = crand(
+        z,
+        w,
+        observed,
+        49,
+        True,
+        1,
+        _moran_local_crand,
+        seed=5,
+        alternative="two-sided",
+        moments=True,
+    )
+    p_stream, empty, sim_moments = crand(
+        z,
+        w,
+        observed,
+        49,
+        False,
+        1,
+        _moran_local_crand,
+        seed=5,
+        alternative="two-sided",
+        moments=True,
+    )
+    assert empty.shape == (1, 1)
+    np.testing.assert_array_equal(p_keep, p_stream)
+    np.testing.assert_allclose(sim_moments[:, 0], rlocals.mean(axis=1))
+    np.testing.assert_allclose(sim_moments[:, 1], rlocals.var(axis=1))
+
+
+def test_early_stopping():
+    """Test sequential early stopping against the full randomization."""
+    w = lat2W(8, 8)
+    w.transform = "r"
+    z = np.random.default_rng(3).normal(size=64)
+    observed = z * (w.sparse @ z)
+    kws = dict(seed=7, alternative="two-sided", moments=True)
+    p_full, _, _ = crand(z, w, observed, 999, False, 1, _moran_local_crand, **kws)
+    p_seq, rlocals, sim_moments = crand(
+        z, w, observed, 999, True, 1, _moran_local_crand, early_stopping=10, **kws
+    )
+    n_draws = sim_moments[:, 2].astype(int)
+    stopped = n_draws < 999
+    assert stopped.mean() > 0.5, "most sites should stop early on random data"
+    np.testing.assert_array_equal(p_seq[~stopped], p_full[~stopped])
+    assert (p_seq[stopped] >= 10 / n_draws[stopped] - 1e-6).all()
+    np.testing.assert_array_equal(np.isnan(rlocals).sum(axis=1), 999 - n_draws)
+
+
+def test_philox_known_answer():
+    """Test the Philox4x32-10 kernel against the Random123 known answers."""
+    zero = np.uint64(0)
+    ones = np.uint64(0xFFFFFFFF)
+    np.testing.assert_array_equal(
+        _philox4x32(zero, zero, zero, zero, zero, zero),
+        [0x6627E8D5, 0xE169C58D, 0xBC57AC4C, 0x9B00DBD8],
+    )
+    np.testing.assert_array_equal(
+        _philox4x32(ones, ones, ones, ones, ones, ones),
+        [0x408F276D, 0x41C83B0E, 0xA20BC7C6, 0x6D5451FD],
+    )
+
+
+def test_philox_streams_independent_of_parallelism():
+    """Test that per-site streams give the same results however sites are split."""
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(4).normal(size=36)
+    observed = z * (w.sparse @ z)
+    kws = dict(seed=11, alternative="two-sided", rng="philox")
+    serial = crand(z, w, observed, 99, True, 1, _moran_local_crand, **kws)
+    threaded = crand(z, w, observed, 99, True, -1, _moran_local_crand, **kws)
+    np.testing.assert_array_equal(serial[0], threaded[0])
+    np.testing.assert_array_equal(serial[1], threaded[1])
+    ids = _site_permutations(11, 5, 36, 99, 3)
+    assert ids.min() >= 0 and ids.max() < 35
+    assert all(len(set(row)) == 3 for row in ids)
+    np.testing.assert_array_equal(ids, _site_permutations(11, 5, 36, 99, 3))
+    assert not np.array_equal(ids, _site_permutations(11, 6, 36, 99, 3))
+
+
+def test_site_permutations_are_uniform():
+    """Test that every ordering of a small range is drawn equally often."""
+    ids = _site_permutations(3, 0, 4, 60000, 3)
+    orderings, counts = np.unique(ids, axis=0, return_counts=True)
+    assert len(orderings) == 6
+    np.testing.assert_allclose(counts / 60000, 1 / 6, atol=0.01)
+    ids = _site_permutations(1, 0, 10**6, 99, 500)
+    assert all(len(set(row)) == 500 for row in ids)
+
+
+def test_cardinality_balanced_chunks():
+    """Test that chunks balance neighbors and report per-chunk timings."""
+    cardinalities = np.array([40] * 5 + [2] * 95)
+    starts = _chunk_starts(cardinalities, 4)
+    cost = np.add.reduceat(cardinalities + 1, starts[:-1])
+    assert starts[0] == 0 and starts[-1] == 100
+    assert cost.max() < 1.5 * cost.min()
+    np.testing.assert_array_equal(
+        _chunk_starts(cardinalities, 4, schedule="sites"), [0, 25, 50, 75, 100]
+    )
+    with pytest.raises(ValueError, match="schedule"):
+        _chunk_starts(cardinalities, 4, schedule="dynamic")
+
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(6).normal(size=36)
+    observed = z * (w.sparse @ z)
+    kws = dict(seed=7, alternative="two-sided")
+    serial = crand(z, w, observed, 49, True, 1, _moran_local_crand, **kws)
+    threaded = crand(
+        z, w, observed, 49, True, 3, _moran_local_crand, timings=True, **kws
+    )
+    np.testing.assert_array_equal(serial[0], threaded[0])
+    timings = threaded[-1]
+    assert timings.n_sites.sum() == 36
+    assert timings.n_neighbors.sum() == w.sparse.nnz
+    assert list(timings.columns) == [
+        "start",
+        "stop",
+        "n_sites",
+        "n_neighbors",
+        "seconds",
+    ]
+
+
+def test_loky_backend_writes_shared_outputs():
+    """Test that process workers writing to shared files match the serial run."""
+    pytest.importorskip("joblib")
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(8).normal(size=36)
+    observed = z * (w.sparse @ z)
+    kws = dict(seed=9, alternative="two-sided", moments=True)
+    serial = crand(z, w, observed, 49, True, 1, _moran_local_crand, **kws)
+    loky = crand(z, w, observed, 49, True, 2, _moran_local_crand, backend="loky", **kws)
+    for expected, actual in zip(serial, loky, strict=True):
+        np.testing.assert_allclose(expected, actual)
+    unkept = crand(
+        z, w, observed, 49, False, 2, _moran_local_crand, backend="loky", **kws
+    )
+    np.testing.assert_array_equal(serial[0], unkept[0])
+    assert unkept[1].shape == (1, 1)
+
+
+def test_plan_reuse_and_invalidation():
+    """Test that cached and explicit plans reproduce a fresh randomization."""
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(5).normal(size=36)
+    observed = z * (w.sparse @ z)
+    CrandPlan.invalidate()
+    fresh = crand(
+        z, w, observed, 99, True, 1, _moran_local_crand, seed=3, alternative="greater"
+    )
+    plan = CrandPlan.from_weights(w, 99, seed=3)
+    assert CrandPlan.from_weights(w, 99, seed=3) is plan
+    assert w.sparse.diagonal().sum() == 0 and w.sparse.nnz == 120
+    reused = crand(
+        z,
+        w,
+        observed,
+        99,
+        True,
+        1,
+        _moran_local_crand,
+        alternative="greater",
+        plan=plan,
+    )
+    np.testing.assert_array_equal(fresh[0], reused[0])
+    np.testing.assert_array_equal(fresh[1], reused[1])
+
+    lm = Moran_Local(z, w, permutations=99, seed=3, alternative="two-sided")
+    lm_plan = Moran_Local(z, w, permutations=99, alternative="two-sided", plan=plan)
+    np.testing.assert_array_equal(lm.p_sim, lm_plan.p_sim)
+
+    CrandPlan.invalidate(w)
+    assert CrandPlan.from_weights(w, 99, seed=3) is not plan
+    w.transform = "b"
+    with pytest.raises(ValueError, match="transformation"):
+        crand(z, w, observed, 99, True, 1, _moran_local_crand, plan=plan)
+    with pytest.raises(ValueError, match="permutations"):
+        crand(z, w, observed, 999, True, 1, _moran_local_crand, plan=plan)
+
+
+def test_plan_cache_is_bounded():
+    """Test that looping over seeds keeps only the most recent plans."""
+    w = lat2W(4, 4)
+    w.transform = "r"
+    CrandPlan.invalidate()
+    plans = [CrandPlan.from_weights(w, 9, seed=seed) for seed in range(50)]
+    assert len(_PLAN_CACHE[id(w)][1]) == _PLANS_PER_WEIGHTS
+    assert CrandPlan.from_weights(w, 9, seed=49) is plans[49]
+    assert CrandPlan.from_weights(w, 9, seed=0) is not plans[0]
+    assert len(_PLAN_CACHE[id(w)][1]) == _PLANS_PER_WEIGHTS
+    del w
+    assert not _PLAN_CACHE
+
+
+def test_columns_match_one_column_at_a_time():
+    """Test that randomizing k columns at once matches k separate passes."""
+    w = lat2W(6, 6)
+    w.transform = "r"
+    Y = np.random.default_rng(6).normal(size=(36, 3))
+    Z = (Y - Y.mean(axis=0)) / Y.std(axis=0)
+    observed = Z * (w.sparse @ Z) * 35 / (Z * Z).sum(axis=0)
+    kws = dict(seed=9, alternative="two-sided", moments=True)
+    p_sims, rlocals, sim_moments = crand(
+        Z, w, observed, 99, True, 1, _moran_local_columns_crand, **kws
+    )
+    assert p_sims.shape == (36, 3) and rlocals.shape == (36, 3, 99)
+    for j in range(3):
+        p_sim, rlocal, sim_moment = crand(
+            Z[:, j], w, observed[:, j], 99, True, 1, _moran_local_crand, **kws
+        )
+        np.testing.assert_array_equal(p_sims[:, j], p_sim)
+        np.testing.assert_allclose(rlocals[:, j], rlocal)
+        np.testing.assert_allclose(sim_moments[:, j], sim_moment)
+
+    lisas = Moran_Local._from_columns(Y, w, permutations=99, seed=9)
+    for j, lisa in enumerate(lisas):
+        single = Moran_Local(Y[:, j], w, permutations=99, seed=9)
+        np.testing.assert_array_equal(lisa.p_sim, single.p_sim)
+        np.testing.assert_allclose(lisa.z_sim, single.z_sim)
+
+
+def test_columns_kernel_keeps_float32():
+    """Test that the columns kernel accumulates in the dtype of its input."""
+    Z = np.random.default_rng(6).normal(size=(10, 3)).astype(np.float32)
+    permuted_ids = np.random.default_rng(7).permuted(
+        np.tile(np.arange(9), (5, 1)), axis=1
+    )
+    weights_i = np.full(4, 1 / 3, dtype=np.float32)
+    weights_i[0] = 0
+    scaling = np.float32(1.0)
+    rlocals = _moran_local_columns_crand(0, Z, permuted_ids, weights_i, scaling)
+    assert rlocals.shape == (5, 3)
+    assert rlocals.dtype == np.float32
+
+
+def test_warmup():
+    """Test that warmup runs every statistic through the serial kernels."""
+    seconds = warmup(n_jobs=1)
+    assert "Moran_Local" in seconds and "Join_Counts_Local_MV" in seconds
+    assert all(elapsed >= 0 for elapsed in seconds.values())
+
+
+@pytest.mark.parametrize("rng", ["shared", "philox"])
+@pytest.mark.parametrize(
+    "stat_func", [_moran_local_crand, _g_local_star_crand, _local_geary]
+)
+def test_numpy_engine_matches_numba(stat_func, rng):
+    """Test that the vectorized engine reproduces the compiled kernels."""
+    # site 0 is an island
+    neighbors = {
+        i: [j for j in js if j != 0] if i else []
+        for i, js in lat2W(6, 6).neighbors.items()
+    }
+    w = W(neighbors, silence_warnings=True)
+    w.transform = "r"
+    z = np.random.default_rng(10).normal(size=36)
+    observed = z * (w.sparse @ z)
+    kws = dict(seed=12, alternative="two-sided", moments=True, rng=rng)
+    compiled = crand(z, w, observed, 49, True, 1, stat_func, **kws)
+    vectorized = crand(z, w, observed, 49, True, 1, stat_func, engine="numpy", **kws)
+    np.testing.assert_array_equal(compiled[0], vectorized[0])
+    np.testing.assert_allclose(compiled[1], vectorized[1])
+    np.testing.assert_allclose(compiled[2], vectorized[2])
+
+
+def test_numpy_engine_columns_and_early_stopping():
+    """Test the vectorized engine on bivariate, column and sequential runs."""
+    w = lat2W(6, 6)
+    w.transform = "r"
+    z = np.random.default_rng(11).normal(size=(36, 2))
+    observed = z * (w.sparse @ z)
+    kws = dict(seed=13, alternative="greater")
+    for args, extra in (
+        ((z, w, observed, 49, True, 1, _moran_local_columns_crand), {}),
+        ((z, w, observed[:, 0], 49, True, 1, _moran_local_bv_crand), {}),
+        (
+            (z[:, 0], w, observed[:, 0], 99, True, 1, _moran_local_crand),
+            dict(early_stopping=5),
+        ),
+    ):
+        compiled = crand(*args, **kws, **extra)
+        vectorized = crand(*args, engine="numpy", **kws, **extra)
+        np.testing.assert_array_equal(compiled[0], vectorized[0])
+        np.testing.assert_allclose(compiled[1], vectorized[1])
+    with pytest.raises(ValueError, match="vectorized"):
+        crand(z, w, observed, 49, True, 1, _philox4x32, engine="numpy", **kws)
+
+
+def test_float32_drift_is_bounded():
+    """Test that simulating in float32 stays close to float64."""
+    from esda.getisord import G_Local
+
+    w = lat2W(10, 10)
+    y = np.random.default_rng(14).lognormal(size=100)
+    kws = dict(permutations=199, seed=15, alternative="two-sided")
+    for estimator, simulations in (
+        (lambda **kw: Moran_Local(y, w, **kw), "rlisas"),
+        (lambda **kw: G_Local(y, w, n_jobs=1, **kw), "rGs"),
+    ):
+        double = estimator(**kws)
+        single = estimator(dtype=np.float32, **kws)
+        assert getattr(single, simulations).dtype == np.float32
+        np.testing.assert_allclose(
+            getattr(single, simulations),
+            getattr(double, simulations),
+            rtol=1e-4,
+            atol=1e-5,
+        )
+        # only ties broken differently may move a p-value, by one draw each
+        changed = single.p_sim != double.p_sim
+        assert changed.mean() <= 0.05
+        assert np.abs(single.p_sim - double.p_sim).max() <= 2 / 200
+    with pytest.raises(ValueError, match="dtype"):
+        Moran_Local(y, w, dtype=np.int64, **kws)
+
+
+def test_simulations_path(tmp_path):
+    """Test that simulations written to disk match those kept in memory."""
+    w = lat2W(8, 8)
+    y = np.random.default_rng(16).normal(size=64)
+    kws = dict(permutations=99, seed=17, alternative="two-sided")
+    expected = Moran_Local(y, w, **kws)
+    for n_jobs, backend in ((1, "threads"), (2, "threads"), (2, "loky")):
+        if backend == "loky":
+            pytest.importorskip("joblib")
+        path = tmp_path / f"rlisas_{n_jobs}_{backend}.npy"
+        lm = Moran_Local(y, w, n_jobs=n_jobs, simulations_path=path, **kws)
+        assert isinstance(lm.rlisas, np.memmap)
+        assert not lm.rlisas.flags.writeable
+        np.testing.assert_array_equal(lm.rlisas, expected.rlisas)
+        np.testing.assert_array_equal(np.load(path), expected.rlisas)
+        np.testing.assert_array_equal(lm.sim, expected.sim)
+        np.testing.assert_array_equal(lm.p_sim, expected.p_sim)
+        np.testing.assert_allclose(lm.EI_sim, expected.EI_sim)
+        np.testing.assert_allclose(lm.VI_sim, expected.VI_sim)
+    # streaming a few sites at a time gives the same summaries
+    larger, mean, std = _simulation_summary(lm.rlisas, lm.Is, block_elements=250)
+    np.testing.assert_array_equal(larger, (expected.sim >= expected.Is).sum(0))
+    np.testing.assert_allclose(mean, expected.EI_sim)
+    np.testing.assert_allclose(std, expected.seI_sim)
+    with pytest.raises(ValueError, match="keep=True"):
+        crand(
+            expected.z,
+            expected.w,
+            expected.Is,
+            99,
+            False,
+            1,
+            _moran_local_crand,
+            alternative="two-sided",
+            simulations_path=tmp_path / "unkept.npy",
+        )
+
+
+@pytest.mark.parametrize(
+    "n_jobs, backend, engine",
+    [
+        (1, "threads", "numba"),
+        (2, "threads", "numba"),
+        (2, "loky", "numba"),
+        (1, "threads", "numpy"),
+    ],
+)
+def test_sites_subset(n_jobs, backend, engine):
+    """Test that simulating a subset of sites matches a run over all sites."""
+    if backend == "loky":
+        pytest.importorskip("joblib")
+    w = lat2W(8, 8)
+    w.transform = "r"
+    z = np.random.default_rng(17).normal(size=64)
+    observed = z * (w.sparse @ z)
+    kws = dict(
+        seed=18,
+        alternative="two-sided",
+        moments=True,
+        backend=backend,
+        engine=engine,
+    )
+    full = crand(z, w, observed, 49, True, n_jobs, _moran_local_crand, **kws)
+    mask = np.zeros(64, dtype=bool)
+    mask[[0, 5, 6, 7, 30, 63]] = True
+    for sites in (mask, np.flatnonzero(mask)):
+        subset = crand(
+            z, w, observed, 49, True, n_jobs, _moran_local_crand, sites=sites, **kws
+        )
+        for expected, actual in zip(full, subset, strict=True):
+            np.testing.assert_allclose(actual[mask], expected[mask])
+        p_sims, rlocals, sim_moments = subset
+        assert np.isnan(p_sims[~mask]).all()
+        assert np.isnan(rlocals[~mask]).all()
+        assert np.isnan(sim_moments[~mask, :2]).all()
+        np.testing.assert_array_equal(sim_moments[~mask, 2], 0)
+    with pytest.raises(ValueError, match="one entry per site"):
+        crand(z, w, observed, 49, True, 1, _moran_local_crand, sites=mask[:10], **kws)
+
+
+def test_screen_then_simulate():
+    """Test a two-stage analytical screen followed by permutations."""
+    w = lat2W(10, 10)
+    y = np.random.default_rng(19).lognormal(size=100)
+    screen = Moran_Local(y, w, inference="analytic")
+    candidates = screen.p_z_c < 0.2
+    kws = dict(permutations=99, seed=20, alternative="two-sided")
+    full = Moran_Local(y, w, **kws)
+    lm = Moran_Local(y, w, sites=candidates, **kws)
+    np.testing.assert_array_equal(lm.p_sim[candidates], full.p_sim[candidates])
+    assert np.isnan(lm.p_sim[~candidates]).all()
+    np.testing.assert_array_equal(lm.n_draws[~candidates], 0)
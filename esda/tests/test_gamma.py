@@ -2,6 +2,7 @@ import libpysal
 import numpy as np
 import pytest
 
+from .. import gamma
 from ..gamma import Gamma
 
 parametrize_lat = pytest.mark.parametrize(
@@ -69,8 +70,6 @@ class TestGamma:
     @parametrize_lat
     def test_op(self, w):
         np.random.seed(12345)
-        if isinstance(w, libpysal.graph.Graph):
-            pytest.skip("Calleble not supported with Graph")
 
         def func(z, i, j):
             q = z[i] * z[j]
@@ -80,3 +79,41 @@ class TestGamma:
         np.testing.assert_allclose(g4.g, 20.0)
         np.testing.assert_allclose(g4.g_z, 3.1879280354548638)
         np.testing.assert_allclose(g4.p_sim_g, 0.0030000000000000001)
+
+    @parametrize_lat
+    def test_compiled_op(self, w):
+        numba = pytest.importorskip("numba")
+
+        @numba.njit
+        def func(z, i, j):
+            return z[i] * z[j]
+
+        np.random.seed(12345)
+        g = Gamma(self.y, w, operation=func)
+        np.testing.assert_allclose(g.g, 20.0)
+        np.testing.assert_allclose(g.g_z, 3.1879280354548638)
+        np.testing.assert_allclose(g.p_sim_g, 0.0030000000000000001)
+
+    @parametrize_lat
+    def test_batched_permutations(self, w):
+        g = Gamma(self.y, w, operation="s", permutations=99, seed=12345)
+        threaded = Gamma(
+            self.y, w, operation="s", permutations=99, seed=12345, n_jobs=2
+        )
+        assert g.sim_g.shape == (99,)
+        np.testing.assert_array_equal(g.sim_g, threaded.sim_g)
+        np.testing.assert_allclose(g.g, 8.0)
+
+    @pytest.mark.parametrize("operation", ["s", "a"])
+    def test_numpy_fallback(self, operation, monkeypatch):
+        w = libpysal.weights.util.lat2W(4, 4)
+        y = np.random.default_rng(12345).normal(size=16)
+        g = Gamma(y, w, operation=operation, permutations=99, seed=12345)
+        monkeypatch.setattr(gamma, "_HAS_NUMBA", False)
+        fallback = Gamma(y, w, operation=operation, permutations=99, seed=12345)
+        small = Gamma(
+            y, w, operation=operation, permutations=99, seed=12345, batch_size=7
+        )
+        np.testing.assert_allclose(fallback.g, g.g)
+        np.testing.assert_allclose(fallback.sim_g, g.sim_g)
+        np.testing.assert_array_equal(fallback.sim_g, small.sim_g)
@@ -59,3 +59,22 @@ class TestGeary:
         np.testing.assert_allclose(c.VC_sim, 0.010631247074115058)
         np.testing.assert_allclose(c.p_sim, 0.001)
         np.testing.assert_allclose(c.p_z_sim, 1.4207015378575605e-06)
+
+    @parametrize_w
+    def test_batched_permutations(self, w):
+        c = geary.Geary(self.y, w, permutations=99, seed=12345)
+        threaded = geary.Geary(self.y, w, permutations=99, seed=12345, n_jobs=2)
+        small = geary.Geary(self.y, w, permutations=99, seed=12345, batch_size=7)
+        assert c.sim.shape == (99,)
+        np.testing.assert_array_equal(c.sim, threaded.sim)
+        np.testing.assert_array_equal(c.sim, small.sim)
+        np.testing.assert_allclose(c.EC_sim, 1.0, atol=0.05)
+
+    @parametrize_w
+    def test_numpy_fallback(self, w, monkeypatch):
+        c = geary.Geary(self.y, w, permutations=99, seed=12345)
+        monkeypatch.setattr(geary, "_HAS_NUMBA", False)
+        fallback = geary.Geary(self.y, w, permutations=99, seed=12345)
+        small = geary.Geary(self.y, w, permutations=99, seed=12345, batch_size=7)
+        np.testing.assert_allclose(fallback.sim, c.sim)
+        np.testing.assert_array_equal(fallback.sim, small.sim)
@@ -3,6 +3,7 @@ import numpy as np
 import pytest
 from libpysal.common import ATOL, RTOL
 from libpysal.weights.distance import DistanceBand
+from scipy import stats
 
 from .. import getisord
 
@@ -46,6 +47,22 @@ class TestGetisG:
         np.testing.assert_allclose(g.G, 0.55709779, rtol=RTOL, atol=ATOL)
         np.testing.assert_allclose(g.p_norm, 0.172936, rtol=RTOL, atol=ATOL)
 
+    @parametrize_w
+    def test_batched_permutations(self, w):
+        g = getisord.G(self.y, w, permutations=99)
+        np.random.seed(10)
+        lag = g.w.sparse
+        expected = [
+            (p * (lag @ p)).sum() / g.den_sum
+            for p in (np.random.permutation(self.y) for _ in range(99))
+        ]
+        np.testing.assert_allclose(g.sim, expected, rtol=RTOL, atol=ATOL)
+
+        seeded = getisord.G(self.y, w, permutations=99, seed=10)
+        threaded = getisord.G(self.y, w, permutations=99, seed=10, n_jobs=2)
+        np.testing.assert_array_equal(seeded.sim, threaded.sim)
+        assert seeded.p_sim == threaded.p_sim
+
 
 class TestGLocal:
     def setup_method(self):
@@ -60,6 +77,13 @@ class TestGLocal:
         np.testing.assert_allclose(lg.p_sim[0], 0.102, rtol=RTOL, atol=ATOL)
         np.testing.assert_allclose(lg.p_z_sim[0], 0.153923, rtol=RTOL, atol=ATOL)
 
+    @parametrize_w
+    def test_analytic_inference(self, w):
+        lg = getisord.G_Local(self.y, w, transform="B", inference="analytic")
+        assert not hasattr(lg, "p_sim")
+        np.testing.assert_allclose(lg.Zs[0], -1.0136729, rtol=RTOL, atol=ATOL)
+        np.testing.assert_allclose(lg.p_norm, stats.norm.sf(np.abs(lg.Zs)))
+
     @parametrize_w
     def test_row_standardized(self, w):
         with pytest.WARN_ALT_HYPOTHESIS_DEPR:
@@ -49,3 +49,22 @@ class TestJoinCounts:
         np.testing.assert_allclose(1.0, jc.p_sim_autocorr_neg)
         np.testing.assert_allclose(0.001, jc.p_sim_autocorr_pos)
         np.testing.assert_allclose(0.2653504320039377, jc.sim_autocorr_chi2)
+
+    @parametrize_w
+    def test_closed_form(self, w):
+        np.random.seed(12345)
+        jc = Join_Counts(self.y, w, permutations=99)
+        np.random.seed(12345)
+        expected = np.array(
+            [jc.calc(np.random.permutation(self.y))[:4] for _ in range(99)],
+            dtype=float,
+        )
+        assert jc.sim_bb.dtype == np.float64
+        np.testing.assert_allclose(jc.sim_bb, expected[:, 0])
+        np.testing.assert_allclose(jc.sim_bw, expected[:, 2])
+        np.testing.assert_allclose(jc.sim_chi2, expected[:, 3])
+
+        seeded = Join_Counts(self.y, w, permutations=99, seed=12345)
+        threaded = Join_Counts(self.y, w, permutations=99, seed=12345, n_jobs=2)
+        np.testing.assert_array_equal(seeded.sim_chi2, threaded.sim_chi2)
+        assert seeded.p_sim_chi2 == threaded.p_sim_chi2
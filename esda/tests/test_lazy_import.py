@@ -0,0 +1,51 @@
+import subprocess
+import sys
+
+import pytest
+
+import esda
+
+
+def _modules_after(statement):
+    out = subprocess.run(
+        [sys.executable, "-c", f"import sys; {statement}; print(*sys.modules)"],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return set(out.stdout.split())
+
+
+def test_import_is_lazy():
+    modules = _modules_after("import esda")
+    for heavy in ("geopandas", "sklearn", "numba", "joblib", "esda.moran"):
+        assert heavy not in modules
+
+
+def test_attribute_loads_only_its_submodule():
+    modules = _modules_after("from esda import Moran")
+    assert "esda.moran" in modules
+    assert "esda.adbscan" not in modules
+
+
+def test_public_names():
+    assert esda.Moran is esda.moran.Moran
+    assert callable(esda.correlogram)
+    assert esda.shape.__name__ == "esda.shape"
+    assert set(esda.__all__) <= set(dir(esda))
+    with pytest.raises(AttributeError):
+        esda.not_a_statistic  # noqa: B018
+
+
+def test_function_shadows_submodule():
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            "import esda.correlogram; print(esda.correlogram.__name__)",
+        ],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    assert out.stdout.strip() == "correlogram"
@@ -44,6 +44,24 @@ class TestLee:
             known_significance, result.significance_, rtol=RTOL, atol=ATOL
         )
 
+    def test_global_batched(self):
+        kws = dict(connectivity=self.w.sparse, permutations=99, seed=2478879)
+        result = lee.Spatial_Pearson(**kws).fit(self.x, self.y)
+        threaded = lee.Spatial_Pearson(n_jobs=2, **kws).fit(self.x, self.y)
+        numpy.testing.assert_array_equal(
+            result.reference_distribution_, threaded.reference_distribution_
+        )
+        numpy.testing.assert_array_equal(result.significance_, threaded.significance_)
+        Z = numpy.column_stack(
+            [(v - v.mean()) / v.std() for v in (self.x[:, 0], self.y[:, 0])]
+        )
+        numpy.testing.assert_allclose(
+            lee.Spatial_Pearson._statistic(Z, self.w.sparse),
+            result.association_,
+            rtol=RTOL,
+            atol=ATOL,
+        )
+
     @pytest.mark.skipif(ON_WIN or ON_MAC_INTEL, reason="undiagnosed failure")
     def test_global_no_conn(self):
         numpy.random.seed(2478879)
@@ -63,7 +81,8 @@ class TestLee:
             second_rep, result.reference_distribution_[1], rtol=RTOL, atol=ATOL
         )
 
-        known_significance = numpy.array([[0.428, 0.22], [0.22, 0.329]])
+        # without connectivity, every permutation ties with the observed value
+        known_significance = numpy.ones((2, 2))
         numpy.testing.assert_allclose(
             known_significance, result.significance_, rtol=RTOL, atol=ATOL
         )
@@ -75,10 +94,9 @@ class TestLee:
         numpy.testing.assert_allclose(known, result.association_, rtol=RTOL, atol=ATOL)
 
     def test_local(self):
-        numpy.random.seed(2478879)
-        result = lee.Spatial_Pearson_Local(connectivity=self.w.sparse).fit(
-            self.x, self.y
-        )
+        result = lee.Spatial_Pearson_Local(
+            connectivity=self.w.sparse, seed=2478879, alternative="directed"
+        ).fit(self.x, self.y)
         known_locals = numpy.array(
             [
                 0.10246023,
@@ -135,62 +153,95 @@ class TestLee:
         numpy.testing.assert_allclose(
             known_locals, result.associations_, rtol=RTOL, atol=ATOL
         )
-        significances = numpy.array(
+        assert result.reference_distribution_.shape == (999, 49)
+        known_significance = numpy.array(
             [
-                0.154,
+                0.132,
+                0.284,
+                0.341,
+                0.248,
+                0.143,
+                0.344,
                 0.291,
-                0.358,
-                0.231,
-                0.146,
-                0.335,
-                0.325,
-                0.388,
-                0.244,
-                0.111,
-                0.019,
-                0.165,
-                0.136,
-                0.073,
-                0.014,
+                0.407,
+                0.23,
+                0.085,
+                0.015,
+                0.163,
+                0.14,
+                0.065,
+                0.013,
                 0.029,
-                0.002,
-                0.376,
                 0.003,
-                0.265,
-                0.449,
-                0.121,
-                0.072,
-                0.006,
-                0.036,
-                0.06,
-                0.355,
-                0.01,
-                0.017,
-                0.168,
+                0.397,
+                0.004,
+                0.258,
+                0.432,
+                0.131,
+                0.05,
+                0.018,
+                0.023,
+                0.058,
+                0.352,
+                0.014,
                 0.022,
+                0.176,
+                0.042,
                 0.003,
-                0.217,
-                0.016,
-                0.337,
-                0.137,
-                0.015,
-                0.128,
-                0.11,
-                0.09,
-                0.168,
-                0.031,
-                0.457,
-                0.44,
-                0.141,
-                0.249,
-                0.158,
-                0.018,
+                0.228,
+                0.017,
+                0.355,
+                0.121,
+                0.012,
+                0.16,
+                0.117,
+                0.091,
+                0.163,
                 0.031,
+                0.464,
+                0.421,
+                0.134,
+                0.244,
+                0.153,
+                0.037,
+                0.029,
             ]
         )
         numpy.testing.assert_allclose(
-            significances, result.significance_, rtol=RTOL, atol=ATOL
+            known_significance, result.significance_, rtol=RTOL, atol=ATOL
+        )
+
+        threaded = lee.Spatial_Pearson_Local(
+            connectivity=self.w.sparse,
+            seed=2478879,
+            alternative="directed",
+            n_jobs=2,
+        ).fit(self.x, self.y)
+        numpy.testing.assert_array_equal(result.significance_, threaded.significance_)
+
+    def test_local_sparse_standardization(self):
+        dense = self.w.sparse.toarray()
+        result = lee.Spatial_Pearson_Local(
+            connectivity=self.w.sparse, permutations=0
+        ).fit(self.x, self.y)
+        Z = numpy.column_stack(
+            [(v - v.mean()) / v.std() for v in (self.x[:, 0], self.y[:, 0])]
+        )
+        expected = lee.Spatial_Pearson_Local._statistic(
+            Z, dense / dense.sum(axis=1, keepdims=True)
+        )
+        numpy.testing.assert_allclose(
+            expected, result.associations_, rtol=RTOL, atol=ATOL
+        )
+
+    @pytest.mark.filterwarnings("error")
+    def test_local_default_alternative(self):
+        kws = dict(connectivity=self.w.sparse, permutations=99, seed=2478879)
+        default = lee.Spatial_Pearson_Local(**kws).fit(self.x, self.y)
+        directed = lee.Spatial_Pearson_Local(alternative="directed", **kws).fit(
+            self.x, self.y
         )
+        numpy.testing.assert_array_equal(default.significance_, directed.significance_)
 
     def test_local_no_perm(self):
         numpy.random.seed(2478879)
@@ -6,6 +6,7 @@ import pytest
 from libpysal.common import ATOL, RTOL
 from numpy.testing import assert_array_equal
 from packaging.version import Version
+from scipy import stats
 
 from .. import moran
 
@@ -107,6 +108,34 @@ class TestMoran:
         # m4 = moran.Moran_Local_BV(self.x, self.y, self.w)
         np.testing.assert_allclose(m1.z, m3.z, atol=ATOL, rtol=RTOL)
 
+    @parametrize_stl
+    def test_batched_permutations(self, w):
+        # without a seed, the same permutations as one at a time
+        np.random.seed(SEED)
+        mi = moran.Moran(self.y, w, permutations=99)
+        np.random.seed(SEED)
+        z = self.y - self.y.mean()
+        lag = mi.w.sparse
+        s0 = lag.sum()
+        expected = [
+            len(z) / s0 * (p * (lag @ p)).sum() / (z * z).sum()
+            for p in (np.random.permutation(z) for _ in range(99))
+        ]
+        np.testing.assert_allclose(mi.sim, expected, rtol=RTOL, atol=ATOL)
+
+        seeded = moran.Moran(self.y, w, permutations=99, seed=SEED)
+        threaded = moran.Moran(self.y, w, permutations=99, seed=SEED, n_jobs=2)
+        assert seeded.sim.shape == (99,)
+        assert_array_equal(seeded.sim, threaded.sim)
+        assert seeded.p_sim == threaded.p_sim
+
+        f = libpysal.io.open(libpysal.examples.get_path("stl_hom.txt"))
+        x = np.array(f.by_col["HR8488"])
+        bv = moran.Moran_BV(x, self.y, w, permutations=99, seed=SEED)
+        threaded = moran.Moran_BV(x, self.y, w, permutations=99, seed=SEED, n_jobs=2)
+        assert_array_equal(bv.sim, threaded.sim)
+        np.testing.assert_allclose(bv.EI_sim, 0, atol=0.05)
+
     @pytest.mark.skip("This function is being deprecated in the next release.")
     def test_by_col(self):
         from libpysal.io import geotable as pdio
@@ -314,6 +343,28 @@ class TestMoranBVmatrix:
         np.testing.assert_allclose(res[(0, 1)].I, 0.19362610652874668)
         np.testing.assert_allclose(res[(3, 0)].I, 0.37701382542927858)
 
+    @parametrize_sids
+    def test_shared_permutations(self, w):
+        res = moran.Moran_BV_matrix(
+            self.vars_, w, permutations=99, seed=SEED, varnames=self.names
+        )
+        assert len(res) == 12
+        assert res.I.shape == (4, 4)
+        assert res.sim.shape == (99, 4, 4)
+        pair = moran.Moran_BV(self.vars_[2], self.vars_[1], w, permutations=0)
+        np.testing.assert_allclose(res[(2, 1)].I, pair.I)
+        np.testing.assert_allclose(res.I[2, 1], pair.I)
+        assert res[(2, 1)].varnames == {"x": "NWR74", "y": "SIDR79"}
+        np.testing.assert_array_equal(res[(2, 1)].sim, res.sim[:, 2, 1])
+        assert res[(2, 1)].p_sim == res.p_sim[2, 1]
+        with pytest.raises(KeyError):
+            res[(1, 1)]
+
+        threaded = moran.Moran_BV_matrix(
+            self.vars_, w, permutations=99, seed=SEED, n_jobs=2
+        )
+        np.testing.assert_array_equal(res.sim, threaded.sim)
+
     @parametrize_sids
     def test_plot_moran_facet(self, w):
         plt = pytest.importorskip("matplotlib.pyplot")
@@ -656,6 +707,27 @@ class TestMoranLocal:
         np.testing.assert_allclose(lm.EI, EI, rtol=RTOL, atol=ATOL)
         np.testing.assert_allclose(lm.VI, VI, rtol=RTOL, atol=ATOL)
 
+    @parametrize_sac
+    def test_analytic_inference(self, w):
+        y = sac1.HSG_VAL.values
+        analytic = moran.Moran_Local(y, w, inference="analytic")
+        assert not hasattr(analytic, "p_sim")
+        assert not hasattr(analytic, "rlisas")
+        simulated = moran.Moran_Local(
+            y, w, permutations=999, seed=SEED, alternative="two-sided"
+        )
+        np.testing.assert_array_equal(analytic.Is, simulated.Is)
+        np.testing.assert_array_equal(analytic.z_c, simulated.z_c)
+        # the analytic moments, of n / (n - 1) times Is, match the simulated
+        # ones within several standard errors of 999 draws
+        scale = len(y) / (len(y) - 1)
+        bias = (simulated.EI_sim * scale - analytic.EIc) / np.sqrt(analytic.VIc)
+        np.testing.assert_allclose(bias, 0, atol=0.25)
+        np.testing.assert_allclose(simulated.VI_sim * scale**2, analytic.VIc, rtol=0.5)
+        np.testing.assert_allclose(analytic.p_z_c, stats.norm.sf(np.abs(analytic.z_c)))
+        with pytest.raises(ValueError, match="inference"):
+            moran.Moran_Local(y, w, inference="normal")
+
     @parametrize_sac
     def test_plot_combination(self, w):
         plt = pytest.importorskip("matplotlib.pyplot")
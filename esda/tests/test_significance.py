@@ -52,3 +52,36 @@ def test_alternative_relationships():
         "Directed p-values should tend to be much "
         "smaller than two_sided p-values or folded p-values."
     )
+
+
+def _reference_two_sided(test_stat, reference_distribution):
+    """Two-sided p-values as computed with numpy.percentile, row by row"""
+    out = []
+    for t, row in zip(test_stat, reference_distribution, strict=True):
+        percentile = (row <= t).mean() * 100
+        p_low = min(percentile, 100 - percentile)
+        low, high = numpy.percentile(row, [p_low, 100 - p_low])
+        n_outside = (row <= low).sum() + (row >= high).sum()
+        out.append((n_outside + 1) / (len(row) + 1))
+    return numpy.array(out)
+
+
+@pytest.mark.parametrize("dtype", [numpy.float64, numpy.float32])
+def test_batched_matches_percentile_reference(dtype):
+    rng = numpy.random.default_rng(0)
+    reference_distribution = rng.normal(size=(50, 99)).astype(dtype)
+    test_stat = rng.normal(scale=2, size=50)
+    expected = _reference_two_sided(test_stat, reference_distribution)
+    batched = calculate_significance(
+        test_stat, reference_distribution, alternative="two-sided", batch_size=7
+    )
+    numpy.testing.assert_allclose(batched, expected)
+    means = reference_distribution.mean(axis=1, keepdims=True)
+    folded = (
+        numpy.abs(reference_distribution - means)
+        >= numpy.abs(test_stat[:, None] - means)
+    ).sum(axis=1)
+    numpy.testing.assert_allclose(
+        calculate_significance(test_stat, reference_distribution, "folded"),
+        (folded + 1) / 100,
+    )
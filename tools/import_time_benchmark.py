@@ -0,0 +1,50 @@
+"""
+Import time of esda.
+
+Runs ``python -X importtime -c "import esda"`` in fresh processes and reports
+the best cumulative time of the ``esda`` package, together with the heavy
+dependencies that ``import esda`` pulled in. The submodules of esda are
+loaded lazily, so none of them should be listed.
+
+    python tools/import_time_benchmark.py [--repeats 5] [--statement "import esda"]
+"""
+
+import argparse
+import subprocess
+import sys
+
+HEAVY = ("geopandas", "sklearn", "numba", "joblib", "scipy.interpolate", "pandas")
+
+
+def import_times(statement):
+    """Cumulative import time in microseconds of every top-level import"""
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    times = {}
+    for line in out.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--statement", default="import esda")
+    args = parser.parse_args()
+
+    runs = [import_times(args.statement) for _ in range(args.repeats)]
+    best = min(run["esda"] for run in runs)
+    print(f"{args.statement!r}: {best / 1e3:.1f} ms (best of {args.repeats})")
+    loaded = [name for name in HEAVY if name in runs[0]]
+    print("heavy dependencies imported:", ", ".join(loaded) or "none")
+
+
+if __name__ == "__main__":
+    main()
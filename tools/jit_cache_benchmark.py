@@ -0,0 +1,58 @@
+"""
+Cold versus warm start of the numba kernels in esda.
+
+Every kernel is compiled with ``cache=True``. This script runs
+:func:`esda.warmup` in fresh processes that share an empty numba cache
+folder: the first process compiles every kernel and writes it to the cache
+(cold start), later processes only load the compiled code (warm start).
+
+    python tools/jit_cache_benchmark.py [--repeats 3] [--n-jobs 1]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+SNIPPET = """
+import json, time
+tic = time.perf_counter()
+import esda
+seconds = esda.warmup(n_jobs={n_jobs})
+seconds["total"] = time.perf_counter() - tic
+print(json.dumps(seconds))
+"""
+
+
+def run(cache_dir, n_jobs):
+    env = dict(os.environ, NUMBA_CACHE_DIR=cache_dir)
+    out = subprocess.run(
+        [sys.executable, "-c", SNIPPET.format(n_jobs=n_jobs)],
+        env=env,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--n-jobs", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="esda_numba_cache_") as cache_dir:
+        cold = run(cache_dir, args.n_jobs)
+        warm = [run(cache_dir, args.n_jobs) for _ in range(args.repeats)]
+
+    print(f"{'statistic':<24}{'cold (s)':>10}{'warm (s)':>10}")
+    for name in cold:
+        best = min(w[name] for w in warm)
+        print(f"{name:<24}{cold[name]:>10.3f}{best:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()